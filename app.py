@@ -9,7 +9,9 @@ from filelock import FileLock
 from config import config
 from controllers import api_router
 from middlewares import CustomerMiddleware
+from utils.cache_utils import close_cache, init_cache
 from utils.redis_utils import redis_client
+from utils.vector_db_utils import close_vector_db, init_vector_db
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +57,12 @@ def init_logging():
 async def lifespan(app: FastAPI):
     # some init operations
     init_logging()
+    await redis_client.get_client()
+    await init_cache()
+    await init_vector_db()
     yield
+    await close_vector_db()
+    await close_cache()
     await redis_client.aclose()
     # some atexit operations
 
@@ -61,12 +61,170 @@ class RedisConfig(_BasicConfig):
     REDIS_USERNAME: str
     REDIS_PASSWORD: str
     REDIS_DB: int
+    REDIS_MAX_CONNECTIONS: int = Field(
+        default=50,
+        description="max connections of the async client's pool",
+    )
+    REDIS_POOL_TIMEOUT: float | None = Field(
+        default=5.0,
+        description="seconds to wait for a free connection, None: forever",
+    )
+    REDIS_SOCKET_KEEPALIVE: bool = True
+    REDIS_HEALTH_CHECK_INTERVAL: int = Field(
+        default=30,
+        description="PING connections idle longer than this, 0: disabled",
+    )
+    REDIS_AUTO_PIPELINE: bool = Field(
+        default=False,
+        description="coalesce concurrent commands into one pipeline",
+    )
+    REDIS_AUTO_PIPELINE_WINDOW: float = Field(
+        default=0.0,
+        description="seconds to collect commands, 0: one loop iteration",
+    )
+    REDIS_AUTO_PIPELINE_MAX_COMMANDS: int = Field(
+        default=256,
+        description="flush immediately once this many commands are queued",
+    )
+    REDIS_CODEC_SERIALIZER: Literal["json", "msgpack", "pickle"] = Field(
+        default="json",
+        description="serializer of redis_client.set_value, json uses orjson "
+        "if installed, else the stdlib json",
+    )
+    REDIS_CODEC_COMPRESSION: Literal["none", "zlib", "lz4"] = "zlib"
+    REDIS_CODEC_COMPRESS_THRESHOLD: int = Field(
+        default=1024,
+        description="compress encoded values of at least this many bytes",
+    )
+    CACHE_REDIS_ENABLED: bool = Field(
+        default=True,
+        description="use redis as the L2 cache and invalidation bus of @cached",
+    )
+    CACHE_INVALIDATION_CHANNEL: str = "cache_invalidate"
 
 
 class VectorDBConfig(_BasicConfig):
     VDB_BASE_URL: str = "https://paas-api.helixlife.dev/vector/v1"
+    VDB_BACKEND: Literal["remote", "local"] = Field(
+        default="remote",
+        description="local: in-process vector db (requires numpy)",
+    )
+    VDB_LOCAL_EMBEDDING_DIM: int = 256
     VDB_TIMEOUT_SECONDS: int
     VDB_REQUEST_INTERVAL: float = 0.05
+    VDB_MAX_CONNECTIONS: int = 100
+    VDB_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    VDB_KEEPALIVE_EXPIRY: float = 30
+    VDB_POOL_TIMEOUT: float = Field(
+        default=10, description="seconds to wait for a free connection"
+    )
+    VDB_HTTP2: bool = Field(
+        default=False, description="use HTTP/2, requires `h2` installed"
+    )
+    VDB_PREWARM_CONNECTIONS: int = Field(
+        default=0, description="connections opened at startup"
+    )
+    VDB_REQUEST_RATE: float | None = Field(
+        default=None,
+        description="token bucket rate (requests/s), overrides interval, "
+        "<= 0 means unlimited",
+    )
+    VDB_REQUEST_BURST: int = Field(default=1, description="token bucket size")
+    VDB_MAX_IN_FLIGHT: int = Field(
+        default=-1, description="max running requests, -1 means unlimited"
+    )
+    VDB_QUEUE_SIZE: int = Field(
+        default=-1, description="max queued requests, -1 means unlimited"
+    )
+    VDB_QUEUE_PUT_TIMEOUT: float | None = Field(
+        default=None,
+        description="seconds to wait when queue is full, 0 rejects at once",
+    )
+    VDB_QUEUE_DEADLINE_SECONDS: float | None = Field(
+        default=None,
+        description="drop queued requests not started within these seconds",
+    )
+    VDB_LIMITER_BACKEND: Literal["local", "redis", "mmap"] = Field(
+        default="local",
+        description="share request budget across workers with redis/mmap",
+    )
+    VDB_LIMITER_MMAP_PATH: str = "/tmp/vector_db_limiter.mmap"
+    VDB_ADAPTIVE_CONCURRENCY: bool = Field(
+        default=False,
+        description="adjust max in flight requests by AIMD",
+    )
+    VDB_ADAPTIVE_MIN_LIMIT: int = 1
+    VDB_ADAPTIVE_MAX_LIMIT: int = 64
+    VDB_ADAPTIVE_INITIAL_LIMIT: int = 4
+    VDB_ADAPTIVE_LATENCY_TARGET: float = Field(
+        default=1.0, description="healthy latency (seconds) for AIMD"
+    )
+    VDB_RETRY_TIMES: int = Field(
+        default=3, description="retries of idempotent requests"
+    )
+    VDB_RETRY_BASE_DELAY: float = 0.2
+    VDB_RETRY_MAX_DELAY: float = 10
+    VDB_CIRCUIT_FAILURE_THRESHOLD: int = Field(
+        default=5, description="consecutive failures to open circuit"
+    )
+    VDB_CIRCUIT_RECOVERY_TIMEOUT: float = Field(
+        default=30, description="seconds before probing an open circuit"
+    )
+    VDB_HEDGE_ENABLED: bool = Field(
+        default=False, description="send hedged requests for searches"
+    )
+    VDB_HEDGE_PERCENTILE: float = Field(
+        default=0.95, description="latency percentile to send a hedge"
+    )
+    VDB_HEDGE_BUDGET_RATIO: float = Field(
+        default=0.05, description="max ratio of hedged requests"
+    )
+    VDB_BATCH_MAX_LINGER: float = Field(
+        default=0.05,
+        description="seconds batched add/update writers wait to fill a batch",
+    )
+    VDB_QUERY_COALESCE: bool = Field(
+        default=True,
+        description="share one request between identical concurrent searches",
+    )
+    VDB_QUERY_CACHE_ENABLED: bool = False
+    VDB_QUERY_CACHE_SIZE: int = 1024
+    VDB_QUERY_CACHE_TTL: float = 60
+    VDB_QUERY_CACHE_REDIS: bool = Field(
+        default=False,
+        description="share query cache and invalidation across workers",
+    )
+    VDB_FINGERPRINT_STORE: Literal["none", "redis", "postgres"] = Field(
+        default="none",
+        description="skip unchanged records in add_records by content hash",
+    )
+    VDB_DOC_ID_INDEX: Literal["none", "bloom", "redis"] = Field(
+        default="none",
+        description="route add_records to create or update before sending",
+    )
+    VDB_DOC_ID_INDEX_CAPACITY: int = Field(
+        default=1_000_000,
+        description="expected records per collection of the bloom index",
+    )
+    VDB_DOC_ID_INDEX_ERROR_RATE: float = 0.01
+    VDB_SPOOL_DIR: str | None = Field(
+        default=None,
+        description="enable the on-disk write spool for add/update/delete "
+        "with spool=True, one worker-N subdirectory per process",
+    )
+    VDB_SPOOL_SEGMENT_SIZE: int = 64 * 1024 * 1024
+    VDB_SPOOL_FSYNC: bool = Field(
+        default=True,
+        description="fsync the spool after every append",
+    )
+    VDB_SPOOL_DRAIN_ENTRIES: int = Field(
+        default=1000,
+        description="spool entries read and compacted per drain round",
+    )
+    VDB_SPOOL_MAX_ATTEMPTS: int = Field(
+        default=5,
+        description="failed replays before a spool entry is dead-lettered",
+    )
 
     TEST_ENV: str = Field(default="123", description="test env")
 
@@ -51,3 +51,15 @@ class ExampleTable(SQLModel, table=True):
 
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = AUTO_UPDATE
+
+
+class VectorDBFingerprint(SQLModel, table=True):
+    """向量数据库记录的内容哈希, 重复写入时跳过内容未变的记录"""
+
+    __tablename__ = "vector_db_fingerprints"  # type: ignore[assignment]
+
+    collection_name: str = Field(primary_key=True, max_length=255)
+    doc_id: str = Field(primary_key=True, max_length=255)
+    fingerprint: str = Field(max_length=64, nullable=False)
+
+    updated_at: datetime = AUTO_UPDATE
@@ -0,0 +1,2 @@
+# tests/benchmark/__init__.py
+# 压测: `python -m tests.benchmark.vector_db_benchmark --help`
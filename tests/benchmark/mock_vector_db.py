@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+from collections import Counter
+from typing import Literal
+
+from fastapi import APIRouter, FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+
+from utils.task_queue import TokenBucket
+from utils.vector_db_utils.local_backend import LocalVectorDB
+from utils.vector_db_utils.schemas import VectorDBStatusCode
+
+
+class MockVectorDBOptions(BaseModel):
+    """模拟向量数据库的延迟, 错误率和限流"""
+
+    latency_distribution: Literal[
+        "constant", "normal", "lognormal", "exponential"
+    ] = "lognormal"
+    latency_mean: float = Field(default=0.02, description="平均延迟 (秒)")
+    latency_stddev: float = Field(
+        default=0.01, description="normal, lognormal 分布的标准差 (秒)"
+    )
+    latency_max: float = Field(default=5, description="延迟上限 (秒)")
+    http_error_rate: float = Field(default=0, description="返回 500 的概率")
+    internal_error_rate: float = Field(
+        default=0, description="返回 code=3140 的概率"
+    )
+    duplicate_rate: float = Field(
+        default=0, description="create 时每条记录被标记为 duplicate_ids 的概率"
+    )
+    failed_rate: float = Field(
+        default=0, description="update 时每条记录被标记为 failed_ids 的概率"
+    )
+    rate_limit: float | None = Field(
+        default=None, description="每秒请求数上限, 超过时返回 429"
+    )
+    rate_limit_burst: int = 1
+    embedding_dim: int = 64
+    seed: int | None = None
+
+
+class MockVectorDB:
+    def __init__(self, options: MockVectorDBOptions | None = None) -> None:
+        """
+        向量数据库 API 的本地替身, 数据存储复用 `LocalVectorDB`,
+        在其之上注入延迟, 错误, duplicate_ids / failed_ids 和限流
+
+        Args:
+            options (MockVectorDBOptions | None, optional): 注入参数.
+                Defaults to None.
+
+        """
+        self.options = options or MockVectorDBOptions()
+        self.stats: Counter[str] = Counter()
+
+        self._random = random.Random(self.options.seed)
+        self._db = LocalVectorDB(embedding_dim=self.options.embedding_dim)
+        self._bucket = (
+            TokenBucket(
+                rate=self.options.rate_limit,
+                burst=self.options.rate_limit_burst,
+            )
+            if self.options.rate_limit
+            else None
+        )
+
+    def _latency(self) -> float:
+        opts = self.options
+        if opts.latency_mean <= 0:
+            return 0
+
+        if opts.latency_distribution == "constant":
+            latency = opts.latency_mean
+        elif opts.latency_distribution == "normal":
+            latency = self._random.gauss(opts.latency_mean, opts.latency_stddev)
+        elif opts.latency_distribution == "exponential":
+            latency = self._random.expovariate(1 / opts.latency_mean)
+        else:
+            # 由均值和标准差换算 lognormal 的参数
+            sigma2 = math.log1p((opts.latency_stddev / opts.latency_mean) ** 2)
+            mu = math.log(opts.latency_mean) - sigma2 / 2
+            latency = self._random.lognormvariate(mu, sigma2**0.5)
+        return min(max(latency, 0), opts.latency_max)
+
+    def _pick(self, doc_ids: list[str], rate: float) -> list[str]:
+        if rate <= 0:
+            return []
+        return [i for i in doc_ids if self._random.random() < rate]
+
+    async def handle(self, endpoint: str, request: Request) -> Response:
+        self.stats["requests"] += 1
+        self.stats[endpoint] += 1
+
+        if self._bucket is not None:
+            wait = self._bucket.take()
+            if wait > 0:
+                self.stats["rate_limited"] += 1
+                return JSONResponse(
+                    status_code=429,
+                    content={"detail": "too many requests"},
+                    headers={"Retry-After": f"{wait:.3f}"},
+                )
+
+        await asyncio.sleep(self._latency())
+
+        if self._random.random() < self.options.http_error_rate:
+            self.stats["http_error"] += 1
+            return JSONResponse(status_code=500, content={"detail": "mock"})
+        if self._random.random() < self.options.internal_error_rate:
+            self.stats["internal_error"] += 1
+            return JSONResponse(
+                content={
+                    "code": VectorDBStatusCode.internal_error.value,
+                    "msg": "mock internal error",
+                }
+            )
+
+        headers = dict(request.headers)
+        json_body = await request.json()
+        if endpoint == "/documents/create":
+            res = await self._create(headers, json_body)
+        elif endpoint == "/documents/update":
+            res = await self._update(headers, json_body)
+        else:
+            res = await self._db.request("post", endpoint, headers, json_body)
+        return JSONResponse(content=res)
+
+    async def _create(self, headers: dict, json_body: dict) -> dict:
+        items = json_body["data"]
+        duplicate_ids = set(
+            self._pick(
+                [item["properties"]["doc_id"] for item in items],
+                self.options.duplicate_rate,
+            )
+        )
+        if not duplicate_ids:
+            return await self._db.request(
+                "post", "/documents/create", headers, json_body
+            )
+
+        # 模拟记录已存在: 先写入这部分记录, 再返回 duplicate_ids
+        self.stats["duplicate_ids"] += len(duplicate_ids)
+        duplicates = [
+            item["properties"]
+            for item in items
+            if item["properties"]["doc_id"] in duplicate_ids
+        ]
+        res = await self._db.request(
+            "post",
+            "/documents/update",
+            headers,
+            {**json_body, "data": duplicates},
+        )
+        missing_ids = set(res.get("data", {}).get("failed_ids", []))
+        if missing_ids:
+            await self._db.request(
+                "post",
+                "/documents/create",
+                headers,
+                {
+                    **json_body,
+                    "data": [
+                        {"properties": properties}
+                        for properties in duplicates
+                        if properties["doc_id"] in missing_ids
+                    ],
+                },
+            )
+        return {
+            "code": VectorDBStatusCode.data_duplication.value,
+            "msg": "duplicate doc_id",
+            "data": {"duplicate_ids": sorted(duplicate_ids)},
+        }
+
+    async def _update(self, headers: dict, json_body: dict) -> dict:
+        items = json_body["data"]
+        failed_ids = set(
+            self._pick(
+                [item["doc_id"] for item in items],
+                self.options.failed_rate,
+            )
+        )
+        if not failed_ids:
+            return await self._db.request(
+                "post", "/documents/update", headers, json_body
+            )
+
+        self.stats["failed_ids"] += len(failed_ids)
+        res = await self._db.request(
+            "post",
+            "/documents/update",
+            headers,
+            {
+                **json_body,
+                "data": [
+                    item for item in items if item["doc_id"] not in failed_ids
+                ],
+            },
+        )
+        failed_ids.update(res.get("data", {}).get("failed_ids", []))
+        return {
+            "code": VectorDBStatusCode.data_error.value,
+            "msg": "mock failed",
+            "data": {"failed_ids": sorted(failed_ids)},
+        }
+
+
+def create_mock_vector_db_app(mock: MockVectorDB, prefix: str = "") -> FastAPI:
+    """
+    创建模拟向量数据库的 ASGI 应用, 配合 `httpx.ASGITransport` 使用,
+    或使用 uvicorn 启动供其他进程压测
+
+    Args:
+        mock (MockVectorDB):
+        prefix (str, optional): 路由前缀, 与 `VDB_BASE_URL` 的路径一致,
+            如 "/vector/v1". Defaults to "".
+
+    """
+    app = FastAPI()
+    router = APIRouter(prefix=prefix)
+
+    @router.head("/")
+    async def ping():
+        return Response()
+
+    @router.get("/stats")
+    async def stats():
+        return dict(mock.stats)
+
+    def route(endpoint: str):
+        async def handler(request: Request):
+            return await mock.handle(endpoint, request)
+
+        return handler
+
+    for endpoint in [
+        "/collection/create",
+        "/collection/delete",
+        "/documents/create",
+        "/documents/update",
+        "/documents/search",
+        "/documents/delete",
+    ]:
+        router.add_api_route(endpoint, route(endpoint), methods=["POST"])
+
+    app.include_router(router)
+
+    return app
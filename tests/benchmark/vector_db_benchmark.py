@@ -0,0 +1,338 @@
+"""
+向量数据库客户端压测
+
+通过 `httpx.ASGITransport` 把真实的 `VectorDBOperator` / `_RequestLimiter`
+接到 `MockVectorDB` 上, 测量写入和查询的吞吐量, 延迟分位数和峰值内存.
+
+限流器相关的配置 (`VDB_REQUEST_RATE`, `VDB_MAX_IN_FLIGHT`,
+`VDB_ADAPTIVE_CONCURRENCY` 等) 仍从环境变量读取, 修改后重新运行即可对比.
+
+运行: `python -m tests.benchmark.vector_db_benchmark --records 2000 --json out.json`
+对比: `python -m tests.benchmark.vector_db_benchmark --baseline out.json`
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from typing import Any
+from urllib.parse import urlparse
+
+import httpx
+
+from config import config
+from utils.vector_db_utils import (
+    Collection,
+    CollectionField,
+    QueryParam,
+    RecordPropertyABC,
+    VectorDBOperator,
+    get_limiter_metrics,
+)
+from utils.vector_db_utils.http_client import vector_db_http_client
+
+from .mock_vector_db import (
+    MockVectorDB,
+    MockVectorDBOptions,
+    create_mock_vector_db_app,
+)
+
+_WORDS = (
+    "vector database search index token bucket queue latency throughput "
+    "record collection filter query update delete retry circuit breaker "
+    "向 量 数 据 库 检 索 文 档 队 列 限 流"
+).split()
+
+
+class BenchmarkRecord(RecordPropertyABC):
+    def __init__(self, doc_id: str, text: str, tag: str):
+        super().__init__(doc_id, text)
+        self.tag = tag
+
+    def properties(self) -> dict:
+        return {"doc_id": self.doc_id, "text": self.text, "tag": self.tag}
+
+
+def _text(i: int, length: int = 32) -> str:
+    return " ".join(
+        _WORDS[(i * 7 + j * 13) % len(_WORDS)] for j in range(length)
+    )
+
+
+def _percentile(values: list[float], p: float) -> float | None:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def _run_phase(
+    name: str,
+    jobs: list[Callable[[], Awaitable[int]]],
+    concurrency: int,
+) -> dict:
+    """
+    以 `concurrency` 并发执行 `jobs`, 每个 job 返回处理的条数
+
+    Returns:
+        dict: 吞吐量, 延迟分位数, 错误数和峰值内存
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    items = 0
+
+    async def run(job: Callable[[], Awaitable[int]]):
+        nonlocal items
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                count = await job()
+                items += count
+            except Exception as e:
+                key = type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+    tracemalloc.reset_peak()
+    base_memory, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    await asyncio.gather(*[run(job) for job in jobs])
+    elapsed = time.perf_counter() - start
+    _, peak_memory = tracemalloc.get_traced_memory()
+
+    latencies.sort()
+    return {
+        "phase": name,
+        "operations": len(jobs),
+        "items": items,
+        "elapsed": elapsed,
+        "ops_per_second": len(jobs) / elapsed if elapsed else None,
+        "items_per_second": items / elapsed if elapsed else None,
+        "latency": {
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "errors": errors,
+        "peak_memory_mb": (peak_memory - base_memory) / 1024 / 1024,
+    }
+
+
+async def run_benchmark(
+    options: MockVectorDBOptions,
+    records: int = 2000,
+    batch_size: int = 50,
+    searches: int = 500,
+    concurrency: int = 16,
+    collection_name: str = "benchmark",
+) -> dict:
+    """
+    依次压测写入 (`add_records`), 更新 (`update_record`),
+    查询 (`query_record`), 返回各阶段的结果
+    """
+    if config.VDB_BACKEND != "remote":
+        raise RuntimeError("benchmark requires VDB_BACKEND=remote")
+
+    mock = MockVectorDB(options)
+    app = create_mock_vector_db_app(
+        mock, prefix=urlparse(config.VDB_BASE_URL).path.rstrip("/")
+    )
+    await vector_db_http_client.startup(transport=httpx.ASGITransport(app=app))
+
+    tracemalloc.start()
+    try:
+        await VectorDBOperator.create_collection(
+            Collection(
+                collection_name=collection_name,
+                extra_fields=[CollectionField(data_type="keyword", name="tag")],
+            )
+        )
+
+        all_records = [
+            BenchmarkRecord(doc_id=str(i), text=_text(i), tag=f"tag{i % 8}")
+            for i in range(records)
+        ]
+        batches = [
+            all_records[i : i + batch_size]
+            for i in range(0, records, batch_size)
+        ]
+
+        def add_job(batch: list[BenchmarkRecord]):
+            async def job() -> int:
+                res = await VectorDBOperator.add_records(
+                    "text", batch, collection_name
+                )
+                return sum(res)
+
+            return job
+
+        def update_job(batch: list[BenchmarkRecord]):
+            async def job() -> int:
+                res = await VectorDBOperator.update_record(
+                    "text", batch, collection_name
+                )
+                return sum(res)
+
+            return job
+
+        search_methods = [
+            "semantic_search",
+            "full_text_search",
+            "hybrid_search",
+        ]
+
+        def search_job(i: int):
+            async def job() -> int:
+                res = await VectorDBOperator.query_record(
+                    collection_name,
+                    QueryParam(
+                        query=_text(i, length=4),
+                        retrieval_config={
+                            "search_method": search_methods[i % 3],
+                            "limit": 10,
+                        },
+                    ),
+                )
+                return len(res)
+
+            return job
+
+        phases = [
+            await _run_phase(
+                "add_records", [add_job(b) for b in batches], concurrency
+            ),
+            await _run_phase(
+                "update_record", [update_job(b) for b in batches], concurrency
+            ),
+            await _run_phase(
+                "query_record",
+                [search_job(i) for i in range(searches)],
+                concurrency,
+            ),
+        ]
+    finally:
+        tracemalloc.stop()
+        await vector_db_http_client.aclose()
+
+    return {
+        "options": options.model_dump(),
+        "params": {
+            "records": records,
+            "batch_size": batch_size,
+            "searches": searches,
+            "concurrency": concurrency,
+        },
+        "phases": phases,
+        "server": dict(mock.stats),
+        "limiter": get_limiter_metrics(),
+    }
+
+
+def _format_seconds(value: float | None) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}ms"
+
+
+def _print_report(result: dict, baseline: dict | None = None) -> None:
+    baseline_phases = {
+        item["phase"]: item for item in (baseline or {}).get("phases", [])
+    }
+
+    print(
+        f"{'phase':<14}{'ops/s':>10}{'items/s':>10}{'p50':>10}"
+        f"{'p95':>10}{'p99':>10}{'mem':>10}  errors"
+    )
+    for phase in result["phases"]:
+        latency = phase["latency"]
+        print(
+            f"{phase['phase']:<14}"
+            f"{phase['ops_per_second'] or 0:>10.1f}"
+            f"{phase['items_per_second'] or 0:>10.1f}"
+            f"{_format_seconds(latency['p50']):>10}"
+            f"{_format_seconds(latency['p95']):>10}"
+            f"{_format_seconds(latency['p99']):>10}"
+            f"{phase['peak_memory_mb']:>8.1f}MB"
+            f"  {phase['errors'] or ''}"
+        )
+
+        old = baseline_phases.get(phase["phase"])
+        if old is None:
+            continue
+
+        def delta(new: float | None, old: float | None) -> str:
+            if not new or not old:
+                return "-"
+            return f"{(new - old) / old * 100:+.1f}%"
+
+        print(
+            f"{'  vs baseline':<14}"
+            f"{delta(phase['ops_per_second'], old['ops_per_second']):>10}"
+            f"{delta(phase['items_per_second'], old['items_per_second']):>10}"
+            f"{delta(latency['p50'], old['latency']['p50']):>10}"
+            f"{delta(latency['p95'], old['latency']['p95']):>10}"
+            f"{delta(latency['p99'], old['latency']['p99']):>10}"
+            f"{delta(phase['peak_memory_mb'], old['peak_memory_mb']):>10}"
+        )
+
+    print(f"server: {result['server']}")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--searches", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+
+    for name, field in MockVectorDBOptions.model_fields.items():
+        kw: dict[str, Any] = {
+            "default": field.default,
+            "help": field.description,
+        }
+        if name == "latency_distribution":
+            kw["choices"] = ["constant", "normal", "lognormal", "exponential"]
+        elif "float" in str(field.annotation):
+            kw["type"] = float
+        else:
+            kw["type"] = int
+        parser.add_argument(f"--{name.replace('_', '-')}", **kw)
+
+    parser.add_argument("--json", help="结果写入 json 文件")
+    parser.add_argument("--baseline", help="与之前 `--json` 输出的结果对比")
+    return parser.parse_args()
+
+
+async def main():
+    args = _parse_args()
+    options = MockVectorDBOptions(
+        **{
+            name: getattr(args, name)
+            for name in MockVectorDBOptions.model_fields
+        }
+    )
+    result = await run_benchmark(
+        options,
+        records=args.records,
+        batch_size=args.batch_size,
+        searches=args.searches,
+        concurrency=args.concurrency,
+    )
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    _print_report(result, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from utils.vector_db_utils import vector_db_utils as vdb
+from utils.vector_db_utils.batch_writer import BatchWriter
+
+from .test_vector_db_write import Record
+
+
+def test_callers_share_one_write():
+    writes = []
+
+    async def write(type_, records, collection_name):
+        writes.append([item.doc_id for item in records])
+        return [item.doc_id != "doc-1" for item in records]
+
+    async def main():
+        writer = BatchWriter(write, max_batch_size=3, max_linger=0.01)
+        return await asyncio.gather(
+            writer.submit("text", [Record("doc-0", "")], "test"),
+            writer.submit(
+                "text", [Record("doc-1", ""), Record("doc-2", "")], "test"
+            ),
+            writer.submit("text", [Record("doc-3", "")], "test"),
+        )
+
+    assert asyncio.run(main()) == [[True], [False, True], [True]]
+    assert writes == [["doc-0", "doc-1", "doc-2"], ["doc-3"]]
+
+
+def test_cancelled_write_cancels_waiters():
+    async def write(type_, records, collection_name):
+        await asyncio.sleep(10)
+
+    async def main():
+        writer = BatchWriter(write, max_batch_size=1)
+        caller = asyncio.create_task(
+            writer.submit("text", [Record("doc-0", "")], "test")
+        )
+        await asyncio.sleep(0.01)
+        for task in writer._flushing:
+            task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(caller, timeout=1)
+
+    asyncio.run(main())
+
+
+def test_adds_and_updates_are_batched_separately(mock_vector_db):
+    mock = mock_vector_db()
+    operator = vdb.VectorDBOperator
+
+    async def main():
+        await operator.create_collection(
+            vdb.Collection(collection_name="test", extra_fields=[])
+        )
+        await operator.add_records(
+            "text", [Record("doc-0", "old"), Record("doc-1", "old")], "test"
+        )
+        return await asyncio.gather(
+            operator.update_record_batched(
+                "text", [Record("doc-0", "new")], "test"
+            ),
+            operator.update_record_batched(
+                "text", [Record("doc-1", "new"), Record("doc-9", "")], "test"
+            ),
+            operator.add_records_batched(
+                "text", [Record("doc-2", "new")], "test"
+            ),
+        )
+
+    assert asyncio.run(main()) == [[True], [True, False], [True]]
+    # 两次更新合并为一个请求 (去掉失败的 doc-9 后重试一次),
+    # 添加单独一个请求
+    assert mock.stats["/documents/create"] == 2
+    assert mock.stats["/documents/update"] == 2
+    docs = mock._db._collections["test"].docs
+    assert [docs[f"doc-{i}"]["text"] for i in range(3)] == ["new"] * 3
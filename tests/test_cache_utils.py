@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from utils import cache_utils
+from utils.cache_utils import cached
+
+
+@pytest.fixture
+def redis(monkeypatch, make_redis_client):
+    client = make_redis_client()
+    monkeypatch.setattr(cache_utils, "redis_client", client)
+    monkeypatch.setattr(cache_utils.config, "CACHE_REDIS_ENABLED", True)
+    return client
+
+
+def _worker(calls: list, namespace: str, delay: float = 0, **kw):
+    """同一个函数在一个 worker 中的缓存, 多次调用模拟多个 worker"""
+
+    @cached(namespace=namespace, **kw)
+    async def load(x: int) -> dict:
+        calls.append(x)
+        await asyncio.sleep(delay)
+        return {"x": x, "version": len(calls)}
+
+    return load
+
+
+def test_concurrent_misses_load_once(redis):
+    calls = []
+    load = _worker(calls, "test_miss", delay=0.05)
+
+    async def main():
+        results = await asyncio.gather(*[load(1) for _ in range(10)])
+        remote = await redis.get_value("cache:test_miss:" + load.cache.key(1))
+        return results, remote
+
+    results, remote = asyncio.run(main())
+    assert calls == [1]
+    assert results == [{"x": 1, "version": 1}] * 10
+    assert remote[1] == {"x": 1, "version": 1}
+    assert load.cache.stats()["misses"] == 10
+
+
+def test_other_worker_waits_for_lock_holder(redis):
+    calls = []
+    worker_a = _worker(calls, "test_lock", delay=0.2)
+    worker_b = _worker(calls, "test_lock", delay=0.2)
+
+    async def main():
+        a = asyncio.create_task(worker_a(1))
+        await asyncio.sleep(0.05)
+        # worker_a 持有加载锁, worker_b 等待它写入 redis
+        return await asyncio.gather(a, worker_b(1))
+
+    results = asyncio.run(main())
+    assert calls == [1]
+    assert results == [{"x": 1, "version": 1}] * 2
+
+
+def test_stale_value_is_served_while_refreshing(redis):
+    calls = []
+    load = _worker(calls, "test_stale", ttl=0.1, stale_ttl=10)
+
+    async def main():
+        first = await load(1)
+        await asyncio.sleep(0.15)
+        # 过期但在 stale_ttl 内, 立即返回旧值, 后台刷新
+        stale = await load(1)
+        await asyncio.sleep(0.05)
+        refreshed = await load(1)
+        return first, stale, refreshed
+
+    first, stale, refreshed = asyncio.run(main())
+    assert first == stale == {"x": 1, "version": 1}
+    assert refreshed == {"x": 1, "version": 2}
+    assert load.cache.stats()["stale_hits"] == 1
+
+
+def test_invalidate_is_broadcast_to_other_workers(redis):
+    calls = []
+    worker_a = _worker(calls, "test_pubsub")
+    worker_b = _worker(calls, "test_pubsub")
+
+    async def main():
+        await cache_utils.init_cache()
+        try:
+            await asyncio.sleep(0.1)
+            await worker_a(1)
+            # 从 redis 读到后写入 worker_b 的进程内缓存
+            await worker_b(1)
+            assert worker_b.cache.stats()["remote_hits"] == 1
+
+            await worker_a.invalidate(1)
+            await asyncio.sleep(0.2)
+            return await worker_b(1)
+        finally:
+            await cache_utils.close_cache()
+
+    assert asyncio.run(main()) == {"x": 1, "version": 2}
+    assert calls == [1, 1]
+
+
+def test_invalidate_during_load_is_not_overwritten(redis):
+    calls = []
+    load = _worker(calls, "test_inflight", delay=0.1)
+
+    async def main():
+        stale = asyncio.create_task(load(1))
+        await asyncio.sleep(0.05)
+        await load.invalidate(1)
+        stale = await stale
+        remote = await redis.get_value(
+            "cache:test_inflight:" + load.cache.key(1)
+        )
+        return stale, remote, await load(1)
+
+    stale, remote, fresh = asyncio.run(main())
+    # 加载期间被 invalidate, 旧结果只返回给调用者, 不写入缓存
+    assert stale == {"x": 1, "version": 1}
+    assert remote is None
+    assert fresh == {"x": 1, "version": 2}
@@ -0,0 +1,56 @@
+import asyncio
+
+from utils.vector_db_utils import vector_db_utils as vdb
+
+
+def test_cancel_while_waiting_for_hedge_delay(monkeypatch):
+    monkeypatch.setattr(
+        vdb._RequestLimiter._latency_tracker, "percentile", lambda p: 10
+    )
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        primary = loop.create_future()
+
+        async def schedule():
+            return primary
+
+        task = asyncio.create_task(
+            vdb._RequestLimiter._hedged_request(schedule)
+        )
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return primary
+
+    primary = asyncio.run(main())
+    # 调用者在等待对冲延迟时被取消, 已发出的请求也被取消
+    assert primary.cancelled()
+
+
+def test_hedged_request_uses_first_result(monkeypatch):
+    monkeypatch.setattr(
+        vdb._RequestLimiter._latency_tracker, "percentile", lambda p: 0.01
+    )
+    monkeypatch.setattr(
+        vdb._RequestLimiter._hedge_budget, "try_spend", lambda: True
+    )
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        futures = []
+
+        async def schedule():
+            future = loop.create_future()
+            futures.append(future)
+            if len(futures) == 2:
+                loop.call_later(0.01, future.set_result, {"code": 0})
+            return future
+
+        res = await vdb._RequestLimiter._hedged_request(schedule)
+        return res, futures
+
+    res, (primary, hedged) = asyncio.run(main())
+    assert res == {"code": 0}
+    assert hedged.done() and not hedged.cancelled()
+    assert primary.cancelled()
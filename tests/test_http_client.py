@@ -0,0 +1,68 @@
+import asyncio
+
+import httpx
+
+from utils.vector_db_utils import close_vector_db, init_vector_db
+from utils.vector_db_utils.http_client import VectorDBHttpClient
+from utils.vector_db_utils.http_client import (
+    vector_db_http_client as http_client,
+)
+
+
+def _mock_transport(monkeypatch) -> list[httpx.AsyncClient]:
+    """创建的客户端都使用 `httpx.MockTransport`, 返回已创建的客户端"""
+    created: list[httpx.AsyncClient] = []
+    create_client = VectorDBHttpClient._create_client
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"path": request.url.path})
+
+    def _create_client(self, transport=None) -> httpx.AsyncClient:
+        client = create_client(self, transport=httpx.MockTransport(handler))
+        created.append(client)
+        return client
+
+    monkeypatch.setattr(VectorDBHttpClient, "_create_client", _create_client)
+    monkeypatch.setattr(http_client, "_client", None)
+    monkeypatch.setattr(http_client, "_total_requests", 0)
+    return created
+
+
+def test_lifespan_shares_one_client(monkeypatch):
+    created = _mock_transport(monkeypatch)
+
+    async def main():
+        await init_vector_db()
+        responses = await asyncio.gather(
+            *[
+                http_client.request("post", "/documents/search")
+                for _ in range(5)
+            ]
+        )
+        assert all(res.status_code == 200 for res in responses)
+        assert http_client.stats()["total_requests"] == 5
+
+        await close_vector_db()
+        assert not http_client.stats()["started"]
+
+    asyncio.run(main())
+    # 所有请求共用启动时创建的客户端, 退出时关闭
+    assert len(created) == 1
+    assert created[0].is_closed
+
+
+def test_request_after_close_reopens_client(monkeypatch):
+    created = _mock_transport(monkeypatch)
+
+    async def main():
+        await init_vector_db()
+        await close_vector_db()
+        res = await http_client.request("post", "/documents/search")
+        await http_client.aclose()
+        return res
+
+    res = asyncio.run(main())
+    assert res.json()["path"].endswith("/documents/search")
+    # 关闭后的请求按配置重新创建客户端, 不使用已关闭的客户端
+    assert len(created) == 2
+    assert all(client.is_closed for client in created)
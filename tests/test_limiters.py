@@ -0,0 +1,134 @@
+import asyncio
+import multiprocessing
+import struct
+
+import pytest
+
+from utils.task_queue import MmapTokenBucket, RedisTokenBucket
+from utils.vector_db_utils import vector_db_utils as vdb
+
+
+def test_redis_token_bucket_refill_and_consume(make_redis_client):
+    async def main():
+        client = make_redis_client()
+        bucket = RedisTokenBucket(client, "limiter:test", rate=10, burst=3)
+
+        waits = [await bucket.try_acquire() for _ in range(4)]
+        assert waits[:3] == [0, 0, 0]
+        # 令牌用完, 需要等待约 1 / rate 秒
+        assert 0 < waits[3] <= 0.1
+
+        # 状态保存在 redis 中, 而不是退化到进程内令牌桶
+        state = await client.hgetall("limiter:test")
+        assert set(state) == {b"tokens", b"ts"}
+
+        await asyncio.sleep(0.15)
+        assert await bucket.try_acquire() == 0
+
+    asyncio.run(main())
+
+
+def test_redis_token_bucket_burst_capacity(make_redis_client):
+    async def main():
+        client = make_redis_client()
+        bucket = RedisTokenBucket(client, "limiter:test", rate=100, burst=5)
+
+        # 空闲时令牌最多积攒到 burst
+        await asyncio.sleep(0.1)
+        assert await bucket.try_acquire(5) == 0
+        assert await bucket.try_acquire(5) > 0
+
+        await asyncio.sleep(0.1)
+        assert await bucket.try_acquire(5) == 0
+
+    asyncio.run(main())
+
+
+def test_redis_token_bucket_shared_budget(make_redis_client):
+    async def main():
+        buckets = [
+            RedisTokenBucket(
+                make_redis_client(), "limiter:shared", rate=0.01, burst=6
+            )
+            for _ in range(2)
+        ]
+        waits = await asyncio.gather(
+            *[buckets[i % 2].try_acquire() for i in range(10)]
+        )
+        # 两个客户端共用 burst 个令牌
+        assert sum(wait == 0 for wait in waits) == 6
+
+    asyncio.run(main())
+
+
+def test_redis_token_bucket_fallback(make_redis_client):
+    async def main():
+        client = make_redis_client()
+
+        async def eval_unavailable(*args, **kwargs):
+            raise ConnectionError("redis is down")
+
+        client.eval = eval_unavailable
+        bucket = RedisTokenBucket(client, "limiter:test", rate=0.01, burst=2)
+        waits = [await bucket.try_acquire() for _ in range(3)]
+        assert waits[:2] == [0, 0]
+        assert waits[2] > 0
+
+    asyncio.run(main())
+
+
+def _take_many(path: str, times: int, results) -> None:
+    bucket = MmapTokenBucket(path, rate=0.001, burst=1000)
+    try:
+        results.put(sum(bucket.take() == 0 for _ in range(times)))
+    finally:
+        bucket.close()
+
+
+def _run_processes(path: str, num: int, times: int) -> list[int]:
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_take_many, args=(path, times, results))
+        for _ in range(num)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+    return [results.get(timeout=5) for _ in processes]
+
+
+def test_mmap_token_bucket_shared_across_processes(tmp_path):
+    path = str(tmp_path / "bucket")
+
+    # 两个进程并发扣减, flock 保证没有丢失的更新
+    taken = _run_processes(path, num=2, times=300)
+    assert taken == [300, 300]
+    with open(path, "rb") as f:
+        tokens, _ = struct.unpack("dd", f.read(16))
+    assert tokens == pytest.approx(1000 - 600, abs=1)
+
+    # 令牌不足时, 两个进程合计只能取到剩余的令牌
+    taken = _run_processes(path, num=2, times=300)
+    assert sum(taken) == pytest.approx(400, abs=1)
+
+
+@pytest.mark.parametrize(
+    ("rate", "interval", "expected"),
+    [(0, 0.05, None), (-1, 0.05, None), (None, 0, None), (None, 0.05, 20)],
+)
+def test_limiter_backend_rate(monkeypatch, tmp_path, rate, interval, expected):
+    monkeypatch.setattr(vdb.config, "VDB_LIMITER_BACKEND", "mmap")
+    monkeypatch.setattr(
+        vdb.config, "VDB_LIMITER_MMAP_PATH", str(tmp_path / "limiter")
+    )
+    monkeypatch.setattr(vdb.config, "VDB_REQUEST_RATE", rate)
+    monkeypatch.setattr(vdb.config, "VDB_REQUEST_INTERVAL", interval)
+
+    limiter = vdb._create_limiter_backend()
+    if expected is None:
+        assert limiter is None
+    else:
+        assert limiter.rate == expected
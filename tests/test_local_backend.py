@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from utils.vector_db_utils.local_backend import (
+    HashingEmbedder,
+    LocalVectorDB,
+)
+from utils.vector_db_utils.schemas import VectorDBStatusCode
+
+
+def _request(db: LocalVectorDB, endpoint: str, json_body: dict):
+    return db.request("post", endpoint, {"collection-name": "test"}, json_body)
+
+
+def test_search_round_trip():
+    async def main():
+        db = LocalVectorDB(embedding_dim=64)
+        await _request(db, "/collection/create", {"collection_name": "test"})
+        await _request(
+            db,
+            "/documents/create",
+            {
+                "type": "text",
+                "data": [
+                    {"properties": {"doc_id": "a", "text": "token bucket"}},
+                    {"properties": {"doc_id": "b", "text": "circuit breaker"}},
+                ],
+            },
+        )
+        return await _request(
+            db,
+            "/documents/search",
+            {
+                "query": "circuit breaker",
+                "retrieval_config": {"search_method": "hybrid_search"},
+            },
+        )
+
+    res = asyncio.run(main())
+    assert res["code"] == VectorDBStatusCode.success.value
+    assert [hit["properties"]["doc_id"] for hit in res["data"]][0] == "b"
+
+
+def test_scoring_does_not_block_event_loop():
+    embedder = HashingEmbedder(dim=16)
+
+    def slow_embed(texts):
+        time.sleep(0.2)
+        return embedder(texts)
+
+    async def main():
+        db = LocalVectorDB(embed=slow_embed)
+        await _request(db, "/collection/create", {"collection_name": "test"})
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await _request(db, "/documents/search", {"query": "query"})
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 5
@@ -0,0 +1,96 @@
+import hashlib
+import json
+
+import httpx
+
+from utils.vector_db_utils import RecordBatch, RecordPropertyABC
+
+from .test_vector_db_write import Record
+
+
+class TaggedRecord(RecordPropertyABC):
+    def __init__(self, doc_id: str, text: str, tag: str) -> None:
+        super().__init__(doc_id, text)
+        self.tag = tag
+
+    def properties(self) -> dict:
+        # key 不按字母顺序
+        return {"text": self.text, "tag": self.tag, "doc_id": self.doc_id}
+
+
+def _records(num: int = 5) -> list[Record]:
+    return [Record(f"doc-{i}", f'文本 {i} "quoted"') for i in range(num)]
+
+
+def _old_create_body(records: list[RecordPropertyABC]) -> bytes:
+    """之前由 httpx 编码的 `/documents/create` 请求体"""
+    return httpx.Request(
+        "POST",
+        "http://vector-db/documents/create",
+        json={
+            "type": "text",
+            "data": [{"properties": item.properties()} for item in records],
+            "segmentation": {
+                "chunk_size": 0,
+                "chunk_overlap": 0,
+                "separators": ["(?!)"],
+            },
+        },
+    ).content
+
+
+def _old_update_body(records: list[RecordPropertyABC]) -> bytes:
+    return httpx.Request(
+        "POST",
+        "http://vector-db/documents/update",
+        json={"type": "text", "data": [item.properties() for item in records]},
+    ).content
+
+
+def test_select_exclude_and_slice():
+    records = _records()
+    batch = RecordBatch(records)
+
+    selected = batch.select({"doc-1", "doc-3", "unknown"})
+    assert selected.doc_ids == ["doc-1", "doc-3"]
+    assert list(selected) == [records[1], records[3]]
+    assert selected.encoded == [batch.encoded[1], batch.encoded[3]]
+
+    excluded = batch.exclude({"doc-1", "doc-3"})
+    assert excluded.doc_ids == ["doc-0", "doc-2", "doc-4"]
+    assert list(excluded) == [records[0], records[2], records[4]]
+
+    assert batch[1:3].doc_ids == ["doc-1", "doc-2"]
+    assert batch[0] is records[0]
+    assert not batch.select(set())
+    assert len(batch.compress([True, False] * 2 + [True])) == 3
+
+
+def test_bodies_match_old_json_body():
+    records = _records()
+    batch = RecordBatch(records)
+
+    # properties 的 key 有序时, 与之前 httpx 编码的请求体逐字节相同
+    assert batch.create_body("text") == _old_create_body(records)
+    assert batch.update_body("text") == _old_update_body(records)
+    # 分片后的请求体与分片前的记录单独编码相同
+    assert batch[1:3].create_body("text") == _old_create_body(records[1:3])
+
+    # key 无序时按 key 排序编码, 内容相同
+    tagged = [TaggedRecord(f"doc-{i}", f"text {i}", "tag") for i in range(3)]
+    body = RecordBatch(tagged).create_body("text")
+    assert json.loads(body) == json.loads(_old_create_body(tagged))
+
+
+def test_fingerprints_hash_the_encoding():
+    batch = RecordBatch(_records(2))
+    same = RecordBatch(_records(2))
+    changed = RecordBatch([Record("doc-0", "changed"), *_records(2)[1:]])
+
+    assert batch.fingerprints() == same.fingerprints()
+    assert batch.fingerprints()["doc-0"] != changed.fingerprints()["doc-0"]
+    assert batch.fingerprints()["doc-1"] == changed.fingerprints()["doc-1"]
+    assert (
+        batch.fingerprints()["doc-0"]
+        == hashlib.blake2b(batch.encoded[0], digest_size=16).hexdigest()
+    )
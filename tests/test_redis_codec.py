@@ -0,0 +1,106 @@
+import asyncio
+import random
+
+import pytest
+
+from utils.redis_codec import MAGIC, RedisCodec, lz4_frame, msgpack
+
+
+def test_unknown_codec_returns_raw_bytes():
+    codec = RedisCodec()
+    # 以 0xFF 开头, 但压缩方式 (高 4 位) 或序列化方式 (低 4 位) 未知
+    for data in [bytes((MAGIC, 0xF2)) + b"{}", bytes((MAGIC, 0x0F)) + b"{}"]:
+        assert codec.decode(data) == data
+
+    # 头有效但内容损坏时仍然抛出异常
+    with pytest.raises(ValueError):
+        codec.decode(codec.encode({"a": 1}) + b"x")
+
+
+VALUES = [
+    {"doc_id": "doc-0", "text": "文本", "scores": [0.5, 1.0], "ok": True},
+    [1, 2, 3],
+    123,
+    None,
+]
+
+SERIALIZERS = [
+    "json",
+    pytest.param(
+        "msgpack",
+        marks=pytest.mark.skipif(
+            msgpack is None, reason="msgpack not installed"
+        ),
+    ),
+    "pickle",
+]
+
+COMPRESSIONS = [
+    "none",
+    "zlib",
+    pytest.param(
+        "lz4",
+        marks=pytest.mark.skipif(lz4_frame is None, reason="lz4 not installed"),
+    ),
+]
+
+
+@pytest.mark.parametrize("serializer", SERIALIZERS)
+@pytest.mark.parametrize("compression", COMPRESSIONS)
+def test_round_trip(serializer, compression):
+    codec = RedisCodec(
+        serializer=serializer, compression=compression, compress_threshold=64
+    )
+    large = {"text": "vector database " * 100}
+    for value in [*VALUES, large, b"\x00\xffbytes", "字符串"]:
+        data = codec.encode(value)
+        assert data[0] == MAGIC
+        assert codec.decode(data) == value
+
+    # 大于阈值的值被压缩 (compression 为 none 时不压缩)
+    compressed = codec.encode(large)[1] >> 4 != 0
+    assert compressed == (compression != "none")
+
+
+def test_compress_threshold_boundary():
+    codec = RedisCodec(compress_threshold=100)
+    # ["a" * n] 序列化后为 n + 4 字节
+    below = codec.encode(["a" * 95])
+    at = codec.encode(["a" * 96])
+
+    assert below[1] >> 4 == 0
+    assert at[1] >> 4 == 1
+    assert codec.decode(below) == ["a" * 95]
+    assert codec.decode(at) == ["a" * 96]
+
+    # 压缩后没有变小时不压缩
+    noise = random.Random(0).randbytes(1024)
+    assert RedisCodec(compress_threshold=1).encode(noise)[1] >> 4 == 0
+
+
+def test_decode_other_values():
+    codec = RedisCodec()
+    assert codec.decode(None) is None
+    # 没有编码头的旧数据原样返回
+    assert codec.decode(b'{"a": 1}') == b'{"a": 1}'
+    assert codec.decode(b"\xff") == b"\xff"
+
+    # 默认不解码 pickle, 但可以读取其他 codec 写入的 json
+    pickled = RedisCodec(serializer="pickle").encode({"a": 1})
+    with pytest.raises(ValueError):
+        codec.decode(pickled)
+    assert RedisCodec(serializer="pickle").decode(codec.encode({"a": 1})) == {
+        "a": 1
+    }
+
+
+def test_client_values_round_trip(make_redis_client):
+    async def main():
+        client = make_redis_client()
+        await client.set_value("value", {"a": [1, 2]})
+        await client.mset_values({"x": "text", "y": b"raw"})
+        return await client.get_value("value"), await client.mget_values(
+            ["x", "y", "missing"]
+        )
+
+    assert asyncio.run(main()) == ({"a": [1, 2]}, ["text", b"raw", None])
@@ -0,0 +1,106 @@
+import asyncio
+
+SCRIPT = "return redis.call('INCR', KEYS[1])"
+
+
+def test_eval_after_reconnect(make_redis_client):
+    async def main():
+        client = make_redis_client()
+        assert await client.eval(SCRIPT, ["counter"], []) == 1
+
+        old = await client.get_client()
+        await client.aclose()
+
+        async def closed(*args, **kwargs):
+            raise ConnectionError("client is closed")
+
+        old.evalsha = closed
+        # 关闭后重新创建连接, 缓存的脚本使用新的连接执行
+        assert await client.eval(SCRIPT, ["counter"], []) == 2
+        await client.aclose()
+
+    asyncio.run(main())
+
+
+def test_sync_client_set_pubsub_and_eval(fake_redis_server):
+    import fakeredis
+
+    from utils.redis_utils import RedisClient
+
+    client = RedisClient("localhost", 6379, 0, "", "")
+    client._client = fakeredis.FakeRedis(server=fake_redis_server)
+
+    assert client.sadd("ids", "a", "b") == 2
+    assert client.smismember("ids", ["a", "c"]) == [1, 0]
+    assert client.srem("ids", "a") == 1
+    assert client.smismember("ids", ["a", "b"]) == [0, 1]
+
+    pubsub = client.subscribe("events")
+    assert client.publish("events", "hello") == 1
+    # 先读到被忽略的订阅确认, 返回 None
+    message = None
+    for _ in range(3):
+        message = message or pubsub.get_message(timeout=1)
+    assert message["channel"] == b"custom_prefix:events"
+    assert message["data"] == b"hello"
+    pubsub.close()
+
+    assert client.eval(SCRIPT, ["counter"], []) == 1
+    assert client.eval(SCRIPT, ["counter"], []) == 2
+    assert client.get("counter") == b"2"
+
+
+def test_auto_pipeline_merges_concurrent_commands(make_redis_client):
+    async def main():
+        client = make_redis_client(auto_pipeline=True)
+        redis = await client.get_client()
+        pipelines = 0
+        pipeline = redis.pipeline
+
+        def counting_pipeline(*args, **kwargs):
+            nonlocal pipelines
+            pipelines += 1
+            return pipeline(*args, **kwargs)
+
+        redis.pipeline = counting_pipeline
+        await client.set("text", "a")
+
+        results = await asyncio.gather(
+            *[client.set(f"key-{i}", i) for i in range(10)],
+            client.incr("text"),
+            *[client.get(f"key-{i}") for i in range(10)],
+            return_exceptions=True,
+        )
+        return results, pipelines, client._auto_pipeline.stats()
+
+    results, pipelines, stats = asyncio.run(main())
+    assert results[:10] == [True] * 10
+    # 出错的命令只影响它的调用者
+    assert isinstance(results[10], Exception)
+    assert results[11:] == [str(i).encode() for i in range(10)]
+    # 第一个 set 单独一次, 之后并发的 21 个命令合并为一次
+    assert pipelines == 2
+    assert stats == {"flushes": 2, "commands": 22, "pending": 0}
+
+
+def test_concurrent_get_client_creates_one_pool(make_redis_client):
+    async def main():
+        client = make_redis_client()
+        init_client = client.init_client
+        created = []
+
+        async def slow_init_client():
+            # 创建期间让出事件循环, 其他首次调用会在这里并发
+            await asyncio.sleep(0.01)
+            created.append(await init_client())
+            return created[-1]
+
+        client.init_client = slow_init_client
+        clients = await asyncio.gather(
+            *[client.get_client() for _ in range(10)]
+        )
+        return created, clients
+
+    created, clients = asyncio.run(main())
+    assert len(created) == 1
+    assert all(item is created[0] for item in clients)
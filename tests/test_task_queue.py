@@ -0,0 +1,255 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.task_queue import (
+    AIMDController,
+    FairQueue,
+    TaskDeadlineExceededError,
+    TaskPriority,
+    TaskQueue,
+    TaskQueueFullError,
+    TokenBucket,
+)
+
+
+async def _job(value):
+    return value
+
+
+def test_deadline_is_checked_after_acquiring_token():
+    async def main():
+        queue = TaskQueue(rate=10, burst=1)
+        scheduler = queue.schedule()
+        try:
+            first = queue.add_task(_job(1))
+            # 令牌桶在 0.1 秒后才有下一个令牌, 等待期间超过截止时间
+            second = queue.add_task(_job(2), deadline=time.monotonic() + 0.02)
+            assert await first == 1
+            with pytest.raises(TaskDeadlineExceededError):
+                await second
+            return queue.stats()
+        finally:
+            scheduler.cancel()
+
+    stats = asyncio.run(main())
+    assert stats["expired"] == 1
+
+
+def test_add_task_wait_without_timeout_does_not_wait():
+    async def main():
+        queue = TaskQueue(size=1)
+        scheduler = None
+        try:
+            # 队列有空位时直接放入
+            future = await queue.add_task_wait(_job(1), timeout=0)
+            with pytest.raises(TaskQueueFullError):
+                await queue.add_task_wait(_job(2), timeout=0)
+
+            scheduler = queue.schedule()
+            assert await future == 1
+            return queue.stats()
+        finally:
+            if scheduler is not None:
+                scheduler.cancel()
+
+    stats = asyncio.run(main())
+    assert stats["submitted"] == 1
+    assert stats["rejected"] == 1
+
+
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(rate=100, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0, 0, 0]
+    wait = bucket.take()
+    assert 0 < wait <= 0.01
+
+    time.sleep(wait + 0.005)
+    assert bucket.take() == 0
+    assert bucket.tokens < 1
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, burst=0)
+
+
+def test_rate_limits_task_starts():
+    async def main():
+        queue = TaskQueue(rate=50, burst=2)
+        scheduler = queue.schedule()
+        started = []
+
+        async def job():
+            started.append(time.monotonic())
+
+        try:
+            await asyncio.gather(*[queue.add_task(job()) for _ in range(6)])
+        finally:
+            scheduler.cancel()
+        return started
+
+    started = asyncio.run(main())
+    # 前 2 个为突发, 之后每 1 / rate 秒开始一个
+    elapsed = started[-1] - started[0]
+    assert 4 / 50 * 0.8 <= elapsed < 4 / 50 * 3
+
+
+def test_zero_rate_is_unlimited():
+    async def main():
+        # rate 优先于 interval, 不大于 0 时不限速
+        queue = TaskQueue(interval=1, rate=0)
+        scheduler = queue.schedule()
+        try:
+            start = time.monotonic()
+            await asyncio.gather(*[queue.add_task(_job(i)) for i in range(5)])
+            return queue.limiter, time.monotonic() - start
+        finally:
+            scheduler.cancel()
+
+    limiter, elapsed = asyncio.run(main())
+    assert limiter is None
+    assert elapsed < 0.5
+
+
+def test_max_in_flight():
+    async def main():
+        queue = TaskQueue(max_in_flight=2)
+        scheduler = queue.schedule()
+        running = peak = 0
+
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        try:
+            await asyncio.gather(*[queue.add_task(job()) for _ in range(8)])
+        finally:
+            scheduler.cancel()
+        return peak
+
+    assert asyncio.run(main()) == 2
+
+
+def test_raising_max_in_flight_wakes_scheduler():
+    async def main():
+        queue = TaskQueue(max_in_flight=1)
+        scheduler = queue.schedule()
+        release = asyncio.Event()
+        second_started = asyncio.Event()
+
+        async def blocker():
+            await release.wait()
+
+        async def second():
+            second_started.set()
+
+        try:
+            first = asyncio.ensure_future(queue.add_task(blocker()))
+            await asyncio.sleep(0.01)
+            pending = asyncio.ensure_future(queue.add_task(second()))
+            await asyncio.sleep(0.01)
+            assert not second_started.is_set()
+
+            # 第一个任务仍在运行, 调大上限后第二个任务立即开始
+            queue.max_in_flight = 2
+            await asyncio.wait_for(second_started.wait(), 0.5)
+            release.set()
+            await asyncio.gather(first, pending)
+        finally:
+            scheduler.cancel()
+
+    asyncio.run(main())
+
+
+def test_aimd_additive_increase():
+    changes = []
+    controller = AIMDController(
+        initial_limit=4,
+        max_limit=6,
+        latency_target=0.5,
+        on_limit_change=changes.append,
+    )
+
+    # 延迟超过目标时不增大
+    for _ in range(20):
+        controller.on_success(1.0)
+    assert controller.limit == 4
+
+    # 每个成功请求增加 1 / limit, 约一轮并发后增加 1
+    for _ in range(5):
+        controller.on_success(0.1)
+    assert controller.limit == 5
+    for _ in range(100):
+        controller.on_success(0.1)
+    assert controller.limit == 6
+    assert changes == [5, 6]
+
+
+def test_aimd_multiplicative_decrease():
+    controller = AIMDController(initial_limit=16, min_limit=2, cooldown=0.05)
+
+    controller.on_failure("timeout")
+    assert controller.limit == 8
+    # 冷却期内的失败不再减小
+    controller.on_failure("server_error")
+    assert controller.limit == 8
+
+    time.sleep(0.06)
+    controller.on_failure("internal_error")
+    assert controller.limit == 4
+    for _ in range(3):
+        time.sleep(0.06)
+        controller.on_failure("timeout")
+    assert controller.limit == 2
+
+    stats = controller.stats()
+    assert stats["failures"] == {
+        "timeout": 4,
+        "server_error": 1,
+        "internal_error": 1,
+    }
+    assert stats["error_rate"] == 1
+
+
+def test_aimd_first_failure_ignores_cooldown():
+    # 冷却时间远大于进程运行时间时, 第一次失败也要减小
+    controller = AIMDController(initial_limit=16, cooldown=1e9)
+    controller.on_failure("timeout")
+    assert controller.limit == 8
+
+
+def test_fair_queue_priority_and_round_robin():
+    queue = FairQueue()
+    for i in range(3):
+        queue.put_nowait(f"a{i}", priority=TaskPriority.low, fairness_key="a")
+    queue.put_nowait("b0", priority=TaskPriority.low, fairness_key="b")
+    queue.put_nowait("c0", priority=TaskPriority.low, fairness_key="c")
+    queue.put_nowait("n0", fairness_key="a")
+    queue.put_nowait("h0", priority=TaskPriority.high, fairness_key="b")
+
+    items = [queue.get_nowait() for _ in range(queue.qsize())]
+    # 先按优先级, 同一优先级内 key 之间轮流, 同一 key 内 FIFO
+    assert items == ["h0", "n0", "a0", "b0", "c0", "a1", "a2"]
+    assert queue.empty()
+
+
+def test_fair_queue_maxsize():
+    async def main():
+        queue = FairQueue(maxsize=1)
+        queue.put_nowait(1)
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait(2)
+
+        put = asyncio.create_task(queue.put(2))
+        await asyncio.sleep(0.01)
+        assert not put.done()
+        assert await queue.get() == 1
+        await asyncio.wait_for(put, timeout=1)
+        assert await queue.get() == 2
+
+    asyncio.run(main())
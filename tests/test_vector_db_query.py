@@ -0,0 +1,239 @@
+import asyncio
+
+import pytest
+
+from utils.vector_db_utils import QueryParam, RecordBatch
+from utils.vector_db_utils import vector_db_utils as vdb
+from utils.vector_db_utils.query_cache import QueryCache
+from utils.vector_db_utils.schemas import VectorDBStatusCode
+
+from .test_vector_db_write import Record
+
+
+class FakeVectorDB:
+    def __init__(self) -> None:
+        self.text = "v0"
+        self.searches = 0
+
+    async def request_vector_db(self, endpoint: str, **kw):
+        if endpoint == "/documents/search":
+            self.searches += 1
+            # 查询时的数据, 返回前发生的写入不可见
+            data = [{"doc_id": "doc-0", "text": self.text}]
+            await asyncio.sleep(0.05)
+            return {"code": VectorDBStatusCode.success.value, "data": data}
+
+        self.text = "v1"
+        return {"code": VectorDBStatusCode.success.value}
+
+
+@pytest.fixture
+def fake_db(monkeypatch) -> FakeVectorDB:
+    db = FakeVectorDB()
+    monkeypatch.setattr(
+        vdb._RequestLimiter, "request_vector_db", db.request_vector_db
+    )
+    monkeypatch.setattr(vdb, "_query_cache", None)
+    monkeypatch.setattr(vdb.config, "VDB_QUERY_COALESCE", True)
+    return db
+
+
+def _query() -> asyncio.Future:
+    return asyncio.ensure_future(
+        vdb.VectorDBOperator.query_record("test", QueryParam(query="q"))
+    )
+
+
+def test_concurrent_queries_share_one_request(fake_db):
+    async def main():
+        return await asyncio.gather(_query(), _query(), _query())
+
+    results = asyncio.run(main())
+    assert fake_db.searches == 1
+    assert results == [[{"doc_id": "doc-0", "text": "v0"}]] * 3
+    # 共享的结果互相独立
+    assert results[0] is not results[1]
+
+
+@pytest.mark.parametrize("tier", ["local", "redis"])
+def test_write_bumps_cache_version(
+    fake_db, monkeypatch, make_redis_client, tier
+):
+    cache = QueryCache(
+        redis_client=make_redis_client() if tier == "redis" else None
+    )
+    monkeypatch.setattr(vdb, "_query_cache", cache)
+
+    async def main():
+        first = await _query()
+        cached = await _query()
+        before = await cache._get_version("test")
+        await vdb.VectorDBOperator._try_update_record(
+            type_="text",
+            collection_name="test",
+            records=RecordBatch([Record("doc-0", "v1")]),
+        )
+        after = await cache._get_version("test")
+        return first, cached, before, after, await _query()
+
+    first, cached, before, after, fresh = asyncio.run(main())
+    assert first == cached == [{"doc_id": "doc-0", "text": "v0"}]
+    assert after == before + 1
+    # 写入后版本号变化, 下一次查询不命中缓存
+    assert fresh == [{"doc_id": "doc-0", "text": "v1"}]
+    assert fake_db.searches == 2
+
+
+def test_query_after_write_is_not_coalesced(fake_db):
+    async def main():
+        before = _query()
+        await asyncio.sleep(0.01)
+        await vdb.VectorDBOperator._try_update_record(
+            type_="text",
+            collection_name="test",
+            records=RecordBatch([Record("doc-0", "v1")]),
+        )
+        after = _query()
+        return await before, await after
+
+    before, after = asyncio.run(main())
+    assert fake_db.searches == 2
+    assert before == [{"doc_id": "doc-0", "text": "v0"}]
+    assert after == [{"doc_id": "doc-0", "text": "v1"}]
+
+
+class FakeCollection:
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.offsets: list[int] = []
+
+    async def request_vector_db(self, json_body: dict, **kw):
+        offset = int(json_body["retrieval_config"]["offset"])
+        limit = int(json_body["retrieval_config"]["limit"])
+        self.offsets.append(offset)
+        data = [
+            {"doc_id": f"doc-{i}"}
+            for i in range(offset, min(offset + limit, self.size))
+        ]
+        return {"code": VectorDBStatusCode.success.value, "data": data}
+
+
+def _scroll(monkeypatch, size: int, prefetch: int):
+    db = FakeCollection(size)
+    monkeypatch.setattr(
+        vdb._RequestLimiter, "request_vector_db", db.request_vector_db
+    )
+
+    async def main():
+        # 每条结果处理时, 已经发出的请求的 offset
+        seen = []
+        async for hit in vdb.VectorDBOperator.scroll_records(
+            "test", page_size=10, prefetch=prefetch
+        ):
+            await asyncio.sleep(0)
+            seen.append((hit["doc_id"], list(db.offsets)))
+        return seen
+
+    return asyncio.run(main())
+
+
+def test_scroll_without_prefetch(monkeypatch):
+    seen = _scroll(monkeypatch, size=25, prefetch=0)
+
+    assert [doc_id for doc_id, _ in seen] == [f"doc-{i}" for i in range(25)]
+    # 当前页处理完才请求下一页
+    assert all(offsets == [0] for _, offsets in seen[:10])
+    assert all(offsets == [0, 10] for _, offsets in seen[10:20])
+    assert seen[-1][1] == [0, 10, 20]
+
+
+def test_scroll_with_prefetch(monkeypatch):
+    seen = _scroll(monkeypatch, size=25, prefetch=1)
+
+    assert [doc_id for doc_id, _ in seen] == [f"doc-{i}" for i in range(25)]
+    # 处理第一页时已经预取第二页
+    assert seen[0][1] == [0, 10]
+    assert seen[-1][1] == [0, 10, 20]
+
+
+class RankedVectorDB:
+    def __init__(self, rankings: dict[str, list[str]]) -> None:
+        """按查询词返回 `rankings` 中的 doc_id 列表"""
+        self.rankings = rankings
+        self.running = 0
+        self.peak_running = 0
+
+    async def request_vector_db(self, json_body: dict, **kw):
+        self.running += 1
+        self.peak_running = max(self.peak_running, self.running)
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            self.running -= 1
+        data = [{"doc_id": i} for i in self.rankings[json_body["query"]]]
+        return {"code": VectorDBStatusCode.success.value, "data": data}
+
+
+def _query_many(monkeypatch, rankings: dict[str, list[str]], **kw):
+    db = RankedVectorDB(rankings)
+    monkeypatch.setattr(
+        vdb._RequestLimiter, "request_vector_db", db.request_vector_db
+    )
+    monkeypatch.setattr(vdb, "_query_cache", None)
+    results = asyncio.run(
+        vdb.VectorDBOperator.query_many(
+            "test", [QueryParam(query=query) for query in rankings], **kw
+        )
+    )
+    return db, results
+
+
+def test_query_many_merges_by_rrf(monkeypatch):
+    _, merged = _query_many(
+        monkeypatch,
+        {"a": ["doc-0", "doc-1", "doc-2"], "b": ["doc-2", "doc-1"]},
+        merge=True,
+        rrf_k=1,
+    )
+
+    # doc-1: 1/3 + 1/3, doc-2: 1/4 + 1/2, doc-0: 1/2
+    assert [hit["doc_id"] for hit in merged] == ["doc-2", "doc-1", "doc-0"]
+    assert merged[0]["rrf_score"] == pytest.approx(1 / 4 + 1 / 2)
+
+
+def test_query_many_bounds_concurrency(monkeypatch):
+    rankings = {f"q{i}": [f"doc-{i}"] for i in range(6)}
+    db, results = _query_many(monkeypatch, rankings, concurrency=2)
+
+    assert results == [[{"doc_id": f"doc-{i}"}] for i in range(6)]
+    assert db.peak_running == 2
+
+    for concurrency in (0, -1):
+        with pytest.raises(ValueError, match="concurrency"):
+            _query_many(monkeypatch, rankings, concurrency=concurrency)
+
+
+def test_bulk_delete_rejects_non_positive_concurrency(monkeypatch):
+    deleted = []
+
+    async def delete_record(collection_name, filters, spool=False):
+        deleted.append(filters[-1].value)
+
+    monkeypatch.setattr(vdb.VectorDBOperator, "delete_record", delete_record)
+
+    def bulk_delete(concurrency: int) -> int:
+        return asyncio.run(
+            vdb.VectorDBOperator.bulk_delete_records(
+                "test",
+                [f"doc-{i}" for i in range(5)],
+                chunk_size=2,
+                concurrency=concurrency,
+            )
+        )
+
+    with pytest.raises(ValueError, match="concurrency"):
+        bulk_delete(0)
+    assert deleted == []
+
+    assert bulk_delete(1) == 5
+    assert len(deleted) == 3
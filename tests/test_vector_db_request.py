@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utils.task_queue import TaskQueue
+from utils.vector_db_utils import VectorDBError, VectorDBRequestError
+from utils.vector_db_utils import vector_db_utils as vdb
+
+
+class FakeHttpClient:
+    def __init__(self, status_codes: list[int]) -> None:
+        """按顺序返回 `status_codes`, 之后都返回 200"""
+        self.status_codes = status_codes
+        self.calls = 0
+
+    async def request(self, method: str, endpoint: str, **kw):
+        self.calls += 1
+        status_code = self.status_codes.pop(0) if self.status_codes else 200
+        return httpx.Response(
+            status_code,
+            json={"code": 0} if status_code == 200 else {"detail": "mock"},
+            headers={"Retry-After": "0"} if status_code == 429 else {},
+        )
+
+
+@pytest.fixture
+def fake_http(monkeypatch):
+    def install(status_codes: list[int]) -> FakeHttpClient:
+        client = FakeHttpClient(status_codes)
+        monkeypatch.setattr(
+            vdb.vector_db_http_client, "request", client.request
+        )
+        # 每个测试使用新的事件循环, 队列和熔断器也重新创建
+        monkeypatch.setattr(vdb._RequestLimiter, "_task_queue", TaskQueue())
+        monkeypatch.setattr(vdb._RequestLimiter, "_circuit_breakers", {})
+        monkeypatch.setattr(
+            vdb._RequestLimiter, "_concurrency_controller", None
+        )
+        monkeypatch.setattr(vdb, "_local_vector_db", None)
+        monkeypatch.setattr(vdb.config, "VDB_RETRY_TIMES", 3)
+        monkeypatch.setattr(vdb.config, "VDB_RETRY_BASE_DELAY", 0.001)
+        return client
+
+    return install
+
+
+def _create(idempotent: bool = False) -> dict:
+    return asyncio.run(
+        vdb._RequestLimiter.request_vector_db(
+            method="post",
+            endpoint="/documents/create",
+            headers={"collection-name": "test"},
+            json_body={"data": []},
+            idempotent=idempotent,
+        )
+    )
+
+
+def test_rate_limited_create_is_retried(fake_http):
+    client = fake_http([429, 429])
+    assert _create() == {"code": 0}
+    assert client.calls == 3
+
+
+def test_server_error_on_create_is_not_retried(fake_http):
+    client = fake_http([500])
+    with pytest.raises(VectorDBRequestError) as e:
+        _create()
+    assert e.value.code == 500
+    assert client.calls == 1
+
+    # 幂等请求重试 5xx
+    client = fake_http([500])
+    assert _create(idempotent=True) == {"code": 0}
+    assert client.calls == 2
+
+
+@pytest.mark.parametrize("status_code", [400, 429])
+def test_client_errors_do_not_close_breaker(fake_http, status_code):
+    fake_http([status_code] * 10)
+    breaker = vdb._RequestLimiter._get_circuit_breaker("/documents/create")
+    breaker.state = "half_open"
+
+    # 探测请求返回 4xx, 不关闭熔断器 (重试时被熔断器拒绝)
+    with pytest.raises(VectorDBError):
+        _create()
+    assert breaker.state == "half_open"
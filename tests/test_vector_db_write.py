@@ -0,0 +1,227 @@
+import asyncio
+import json
+
+import pytest
+
+from utils.vector_db_utils import RecordBatch, RecordPropertyABC
+from utils.vector_db_utils import vector_db_utils as vdb
+from utils.vector_db_utils.doc_id_index import BloomDocIdIndex
+from utils.vector_db_utils.fingerprint import RedisFingerprintStore
+from utils.vector_db_utils.schemas import VectorDBStatusCode
+
+
+class Record(RecordPropertyABC):
+    def properties(self) -> dict:
+        return {"doc_id": self.doc_id, "text": self.text}
+
+
+def _batch(num: int) -> RecordBatch:
+    return RecordBatch([Record(f"doc-{i}", f"text {i}") for i in range(num)])
+
+
+class FakeVectorDB:
+    def __init__(self, duplicates) -> None:
+        """`duplicates(doc_ids)` 返回 create 请求的 duplicate_ids"""
+        self.duplicates = duplicates
+        self.calls: list[tuple[str, list[str]]] = []
+
+    async def request_vector_db(self, endpoint: str, content: bytes, **kw):
+        body = json.loads(content)
+        if endpoint == "/documents/create":
+            doc_ids = [item["properties"]["doc_id"] for item in body["data"]]
+        else:
+            doc_ids = [item["doc_id"] for item in body["data"]]
+        self.calls.append((endpoint, doc_ids))
+
+        duplicate_ids = (
+            self.duplicates(doc_ids) if endpoint == "/documents/create" else []
+        )
+        if not duplicate_ids:
+            return {"code": VectorDBStatusCode.success.value}
+        return {
+            "code": VectorDBStatusCode.data_duplication.value,
+            "msg": "duplicate doc_id",
+            "data": {"duplicate_ids": duplicate_ids},
+        }
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    def install(duplicates) -> FakeVectorDB:
+        db = FakeVectorDB(duplicates)
+        monkeypatch.setattr(
+            vdb._RequestLimiter, "request_vector_db", db.request_vector_db
+        )
+        monkeypatch.setattr(vdb, "_query_cache", None)
+        return db
+
+    return install
+
+
+def _add(records: RecordBatch) -> list[str]:
+    return asyncio.run(
+        vdb.VectorDBOperator._try_add_records(
+            collection_name="test", type_="text", records=records
+        )
+    )
+
+
+def test_duplicates_are_updated_and_rest_recreated(fake_db):
+    db = fake_db(lambda doc_ids: [i for i in doc_ids if i == "doc-1"])
+
+    assert _add(_batch(3)) == []
+    assert db.calls == [
+        ("/documents/create", ["doc-0", "doc-1", "doc-2"]),
+        ("/documents/update", ["doc-1"]),
+        ("/documents/create", ["doc-0", "doc-2"]),
+    ]
+
+
+def test_duplicates_outside_batch_do_not_resend(fake_db):
+    # duplicate_ids 不在批次中, 批次不会缩小
+    db = fake_db(lambda doc_ids: ["unknown"])
+
+    assert _add(_batch(3)) == ["doc-0", "doc-1", "doc-2"]
+    assert db.calls == [("/documents/create", ["doc-0", "doc-1", "doc-2"])]
+
+
+def test_duplicate_retries_are_bounded(fake_db):
+    # 每次都把第一条标记为重复
+    db = fake_db(lambda doc_ids: doc_ids[:1])
+
+    failed_ids = _add(_batch(10))
+
+    creates = [ids for endpoint, ids in db.calls if endpoint.endswith("create")]
+    assert len(creates) == vdb._DUPLICATE_RETRIES + 1
+    retried = vdb._DUPLICATE_RETRIES + 1
+    assert failed_ids == [f"doc-{i}" for i in range(retried, 10)]
+
+
+def _add_stream(records: list[Record], **kw) -> list:
+    async def main():
+        return [
+            progress
+            async for progress in vdb.VectorDBOperator.add_records_stream(
+                "text", records, "test", **kw
+            )
+        ]
+
+    return asyncio.run(main())
+
+
+def test_add_records_stream_rejects_non_positive_in_flight(fake_db):
+    db = fake_db(lambda doc_ids: [])
+    records = [Record(f"doc-{i}", f"text {i}") for i in range(3)]
+
+    with pytest.raises(ValueError, match="max_in_flight_chunks"):
+        _add_stream(records, max_in_flight_chunks=0)
+    assert db.calls == []
+
+    progress = _add_stream(records, max_in_flight_chunks=1)
+    assert [p.checkpoint for p in progress] == [3]
+
+
+def _mock_add(*batches: list[Record]) -> list[list[bool]]:
+    async def main():
+        await vdb.VectorDBOperator.create_collection(
+            vdb.Collection(collection_name="test", extra_fields=[])
+        )
+        return [
+            await vdb.VectorDBOperator.add_records(
+                "text", records, "test", retry_times=0
+            )
+            for records in batches
+        ]
+
+    return asyncio.run(main())
+
+
+def test_duplicates_against_mock_server(mock_vector_db):
+    mock = mock_vector_db()
+    records = [Record(f"doc-{i}", f"text {i}") for i in range(4)]
+
+    # 前两条已存在, 整批被拒绝后前两条更新, 其余重新创建
+    results = _mock_add(records[:2], records)
+    assert results == [[True] * 2, [True] * 4]
+    assert mock.stats["/documents/create"] == 3
+    assert mock.stats["/documents/update"] == 1
+    assert sorted(mock._db._collections["test"].docs) == [
+        f"doc-{i}" for i in range(4)
+    ]
+
+
+def test_duplicate_retries_are_capped_against_mock_server(mock_vector_db):
+    # 每次都把批次的第一条标记为重复, 批次每次只缩小一条
+    mock = mock_vector_db(duplicate_rate=1)
+    mock._pick = lambda doc_ids, rate: doc_ids[:1] if rate else []
+
+    [results] = _mock_add([Record(f"doc-{i}", f"text {i}") for i in range(10)])
+
+    retried = vdb._DUPLICATE_RETRIES + 1
+    assert mock.stats["/documents/create"] == retried
+    assert results == [True] * retried + [False] * (10 - retried)
+
+
+def test_unchanged_records_are_skipped(
+    mock_vector_db, make_redis_client, monkeypatch
+):
+    store = RedisFingerprintStore(make_redis_client())
+    monkeypatch.setattr(vdb, "_fingerprint_store", store)
+    mock = mock_vector_db()
+
+    records = [Record(f"doc-{i}", f"text {i}") for i in range(3)]
+    changed = [*records[:2], Record("doc-2", "changed")]
+    results = _mock_add(records, records, changed)
+
+    assert results == [[True] * 3] * 3
+    # 第二次全部跳过, 第三次只发送内容变化的 doc-2
+    assert mock.stats["/documents/create"] == 2
+    assert mock.stats["/documents/update"] == 1
+    assert store.stats()["skipped"] == 5
+    docs = mock._db._collections["test"].docs
+    assert docs["doc-2"]["text"] == "changed"
+
+
+def test_known_doc_ids_are_routed_to_update(mock_vector_db, monkeypatch):
+    index = BloomDocIdIndex(capacity=1000)
+    monkeypatch.setattr(vdb, "_doc_id_index", index)
+    mock = mock_vector_db()
+
+    records = [Record(f"doc-{i}", f"text {i}") for i in range(3)]
+    updated = [Record("doc-0", "new"), Record("doc-3", "text 3")]
+    assert _mock_add(records, updated) == [[True] * 3, [True] * 2]
+
+    # doc-0 已在索引中, 直接更新; doc-3 不在索引中, 创建
+    assert mock.stats["/documents/create"] == 2
+    assert mock.stats["/documents/update"] == 1
+    assert mock.stats["duplicate_ids"] == 0
+    assert index.stats()["predicted_exists"] == 1
+    docs = mock._db._collections["test"].docs
+    assert docs["doc-0"]["text"] == "new"
+
+
+def test_rebuild_doc_id_index_from_scroll(mock_vector_db, monkeypatch):
+    index = BloomDocIdIndex(capacity=1000)
+    monkeypatch.setattr(vdb, "_doc_id_index", index)
+    mock_vector_db()
+    operator = vdb.VectorDBOperator
+
+    async def main():
+        await operator.create_collection(
+            vdb.Collection(collection_name="test", extra_fields=[])
+        )
+        await operator.add_records(
+            "text", [Record(f"doc-{i}", f"text {i}") for i in range(5)], "test"
+        )
+        # 模拟进程重启后索引为空
+        await index.clear("test")
+        count = await operator.rebuild_doc_id_index(
+            "test",
+            (
+                hit["properties"]["doc_id"]
+                async for hit in operator.scroll_records("test", page_size=2)
+            ),
+        )
+        return count, await index.lookup("test", ["doc-0", "doc-4", "doc-9"])
+
+    assert asyncio.run(main()) == (5, [True, True, False])
@@ -0,0 +1,201 @@
+import asyncio
+import json
+import multiprocessing
+import os
+
+from utils.vector_db_utils import vector_db_utils as vdb
+from utils.vector_db_utils.write_spool import SpoolDrainer, WriteSpool
+
+
+def _entry(doc_id: str, op: str = "add") -> bytes:
+    return json.dumps(
+        {
+            "op": op,
+            "collection": "test",
+            "type": "text",
+            "records": [{"doc_id": doc_id, "text": doc_id}],
+        }
+    ).encode()
+
+
+def _open(directory: str) -> WriteSpool:
+    spool = WriteSpool(directory, fsync=False)
+    assert spool.open()
+    return spool
+
+
+async def _drain(drainer: SpoolDrainer) -> int:
+    """调用 `drain_once` 直到 spool 为空, 返回失败次数"""
+    errors = 0
+    while True:
+        try:
+            if not await drainer.drain_once():
+                return errors
+        except Exception:
+            errors += 1
+
+
+def test_failing_entry_moves_to_dead_letter(tmp_path):
+    spool = _open(str(tmp_path))
+    for i in range(5):
+        spool.append(_entry(f"doc-{i}"))
+
+    applied = []
+
+    async def apply(op: dict) -> None:
+        doc_ids = [item["doc_id"] for item in op["records"]]
+        if "doc-2" in doc_ids:
+            raise Exception("Vector Database error: bad request")
+        applied.extend(doc_ids)
+
+    drainer = SpoolDrainer(spool, apply, max_entries=10, max_attempts=2)
+    errors = asyncio.run(_drain(drainer))
+
+    # 整段失败 2 次, 逐条回放时 doc-2 再失败 2 次,
+    # 最后一次失败时移到 dead letter, 不再抛出异常
+    assert errors == 3
+    assert drainer.dead_letters == 1
+    assert spool.read_dead_letters() == [_entry("doc-2")]
+    assert sorted(set(applied)) == ["doc-0", "doc-1", "doc-3", "doc-4"]
+    assert spool.pending_bytes() == 0
+    spool.close()
+
+
+def test_transient_errors_are_not_dead_lettered(tmp_path):
+    spool = _open(str(tmp_path))
+    spool.append(_entry("doc-0"))
+
+    attempts = 0
+
+    async def apply(op: dict) -> None:
+        nonlocal attempts
+        attempts += 1
+        if attempts <= 5:
+            raise ConnectionError("vector db is down")
+
+    drainer = SpoolDrainer(
+        spool,
+        apply,
+        max_attempts=2,
+        is_transient=lambda e: isinstance(e, ConnectionError),
+    )
+    assert asyncio.run(_drain(drainer)) == 5
+    assert drainer.dead_letters == 0
+    assert spool.read_dead_letters() == []
+    spool.close()
+
+
+def test_partially_failed_replay_moves_to_dead_letter(tmp_path, mock_vector_db):
+    mock = mock_vector_db()
+    spool = _open(str(tmp_path))
+    # doc-1 不存在, 更新一直失败
+    spool.append(_entry("doc-0"))
+    spool.append(_entry("doc-0", op="update"))
+    spool.append(_entry("doc-1", op="update"))
+
+    async def main():
+        await vdb.VectorDBOperator.create_collection(
+            vdb.Collection(collection_name="test", extra_fields=[])
+        )
+        drainer = SpoolDrainer(spool, vdb._apply_spooled_op)
+        assert await _drain(drainer) == 0
+        return drainer
+
+    drainer = asyncio.run(main())
+    assert drainer.dropped_records == 1
+    assert [json.loads(e) for e in spool.read_dead_letters()] == [
+        json.loads(_entry("doc-1", op="update"))
+    ]
+    assert sorted(mock._db._collections["test"].docs) == ["doc-0"]
+    assert spool.pending_bytes() == 0
+    spool.close()
+
+
+def test_orphan_worker_dirs_are_drained(tmp_path):
+    base_dir = str(tmp_path)
+    for idx in range(3):
+        spool = _open(os.path.join(base_dir, f"worker-{idx}"))
+        if idx != 2:
+            spool.append(_entry(f"doc-{idx}"))
+        spool.close()
+
+    # worker 数减少为 1, worker-1 没有进程使用, worker-2 已回放完
+    own = WriteSpool.open_worker_dir(base_dir, fsync=False)
+    assert own.directory.endswith("worker-0")
+    orphans = WriteSpool.open_orphan_dirs(base_dir, fsync=False)
+    assert [os.path.basename(s.directory) for s in orphans] == ["worker-1"]
+
+    applied = []
+
+    async def apply(op: dict) -> None:
+        applied.extend(item["doc_id"] for item in op["records"])
+
+    async def main():
+        drainer = SpoolDrainer(
+            orphans[0], apply, idle_interval=0.01, stop_when_empty=True
+        )
+        drainer.start()
+        await asyncio.wait_for(drainer._task, timeout=5)
+
+    asyncio.run(main())
+    assert applied == ["doc-1"]
+    # 回放完后关闭, 目录可以再被打开
+    assert WriteSpool.open_orphan_dirs(base_dir, fsync=False) == []
+    own.close()
+
+
+def _crash_while_draining(directory: str, applied_path: str) -> None:
+    spool = _open(directory)
+    for i in range(10):
+        spool.append(_entry(f"doc-{i}"))
+
+    async def apply(op: dict) -> None:
+        doc_ids = [item["doc_id"] for item in op["records"]]
+        with open(applied_path, "a") as f:
+            f.write("".join(f"{doc_id}\n" for doc_id in doc_ids))
+        if "doc-5" in doc_ids:
+            # 在提交 offset 前被杀掉
+            os._exit(1)
+
+    drainer = SpoolDrainer(spool, apply, max_entries=2)
+    asyncio.run(_drain(drainer))
+
+
+def test_replay_after_crash(tmp_path):
+    directory = str(tmp_path / "spool")
+    applied_path = str(tmp_path / "applied")
+
+    ctx = multiprocessing.get_context("fork")
+    process = ctx.Process(
+        target=_crash_while_draining, args=(directory, applied_path)
+    )
+    process.start()
+    process.join(timeout=30)
+    assert process.exitcode == 1
+
+    # 模拟崩溃时写了一半的记录
+    segment = os.path.join(directory, f"{1:012d}.log")
+    with open(segment, "ab") as f:
+        f.write(b"\x10\x00\x00\x00partial")
+
+    spool = _open(directory)
+    # 提交了前两段 (doc-0 ~ doc-3)
+    assert spool.offset == (
+        1,
+        sum(8 + len(_entry(f"doc-{i}")) for i in range(4)),
+    )
+    replayed = []
+
+    async def apply(op: dict) -> None:
+        replayed.extend(item["doc_id"] for item in op["records"])
+
+    drainer = SpoolDrainer(spool, apply, max_entries=2)
+    assert asyncio.run(_drain(drainer)) == 0
+
+    with open(applied_path) as f:
+        before_crash = f.read().split()
+    # doc-4, doc-5 这段没有提交, 重新回放, 之前提交的不再回放
+    assert before_crash == [f"doc-{i}" for i in range(6)]
+    assert replayed == [f"doc-{i}" for i in range(4, 10)]
+    assert spool.pending_bytes() == 0
+    spool.close()
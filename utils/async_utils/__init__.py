@@ -1,8 +1,10 @@
 from .async_sort import async_sort
 from .call_coroutine import call_coroutine
+from .single_flight import SingleFlight
 from .task_group import TaskGroup
 
 __all__ = [
+    "SingleFlight",
     "TaskGroup",
     "async_sort",
     "call_coroutine",
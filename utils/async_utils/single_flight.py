@@ -0,0 +1,67 @@
+import asyncio
+from collections.abc import Callable, Coroutine, Hashable
+from typing import Any, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call(Generic[T]):
+    def __init__(self, task: asyncio.Task[T]) -> None:
+        self.task = task
+        self.callers = 1
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        """
+        合并相同 key 的并发调用, 同一时间每个 key 只有一个调用在执行
+
+        Usage
+        ```python
+            single_flight = SingleFlight()
+            res, shared = await single_flight.do(key, lambda: fetch(key))
+        ```
+
+        """
+        self._calls: dict[Hashable, _Call] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(
+        self,
+        key: Hashable,
+        func: Callable[[], Coroutine[Any, Any, T]],
+    ) -> tuple[T, bool]:
+        """
+        执行 `func()`, 如果相同 key 的调用正在执行, 则等待它的结果
+
+        取消其中一个等待者不会取消共享的调用, 其他等待者仍能拿到结果
+
+        Args:
+            key (Hashable): 调用的 key
+            func (Callable[[], Coroutine]): 创建实际调用的函数
+
+        Returns:
+            tuple[T, bool]: 调用结果, 以及结果是否被多个调用者共享.
+                共享的结果是同一个对象, 修改前需要自行复制
+
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda t: self._on_done(key, t))
+        else:
+            call.callers += 1
+
+        res = await asyncio.shield(call.task)
+        return res, call.callers > 1
+
+    def _on_done(self, key: Hashable, task: asyncio.Task) -> None:
+        call = self._calls.get(key)
+        if call is not None and call.task is task:
+            self._calls.pop(key)
+        # 所有等待者都被取消时, 避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
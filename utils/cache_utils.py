@@ -0,0 +1,557 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable, Hashable
+from typing import Any, TypeVar
+
+from config import config
+from utils.async_utils import SingleFlight
+from utils.lru_cache import LRUCache
+from utils.redis_utils import redis_client
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_MISSING = object()
+_LOCK_STRIPES = 64
+
+# 只删除自己持有的锁, 避免删掉过期后被其他 worker 拿到的锁
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+def default_cache_key(*args, **kwargs) -> str:
+    """参数 json 序列化后的哈希, 不能序列化的参数使用 `str()`"""
+    s = json.dumps(
+        [args, kwargs],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(s.encode()).hexdigest()
+
+
+class _CacheInvalidator:
+    def __init__(self) -> None:
+        """
+        通过 redis pub/sub 在 worker 之间同步进程内缓存的失效.
+        订阅断开期间的失效消息会丢失, 重新订阅后清空所有进程内缓存
+
+        """
+        self._caches: dict[str, list[_CachedFunction]] = {}
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    def register(self, cache: "_CachedFunction") -> None:
+        self._caches.setdefault(cache.namespace, []).append(cache)
+
+    def start(self) -> None:
+        if not config.CACHE_REDIS_ENABLED:
+            return
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self, timeout: float = 2) -> None:
+        if self._task is None:
+            return
+        # 读取消息时的取消可能被 redis 客户端吞掉, 同时用标志位退出循环
+        self._stopping = True
+        self._task.cancel()
+        await asyncio.wait([self._task], timeout=timeout)
+        self._task = None
+
+    async def publish(self, namespace: str, key: str | None) -> None:
+        try:
+            await redis_client.publish(
+                config.CACHE_INVALIDATION_CHANNEL,
+                json.dumps({"namespace": namespace, "key": key}),
+            )
+        except Exception as e:
+            logger.warning(f"publish cache invalidation failed: {type(e)}, {e}")
+
+    def _on_message(self, data: bytes) -> None:
+        try:
+            message = json.loads(data)
+        except ValueError:
+            logger.warning(f"invalid cache invalidation message: {data!r}")
+            return
+        for cache in self._caches.get(message.get("namespace"), []):
+            cache.invalidate_local(message.get("key"))
+
+    async def _listen(self) -> None:
+        reconnect = False
+        while not self._stopping:
+            pubsub = None
+            try:
+                pubsub = await redis_client.subscribe(
+                    config.CACHE_INVALIDATION_CHANNEL
+                )
+                if reconnect:
+                    for caches in self._caches.values():
+                        for cache in caches:
+                            cache.invalidate_local(None)
+                while not self._stopping:
+                    message = await pubsub.get_message(timeout=1)
+                    if message is not None and message["type"] == "message":
+                        self._on_message(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(
+                    f"cache invalidation subscriber failed: {type(e)}, {e}"
+                )
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            reconnect = True
+
+
+_invalidator = _CacheInvalidator()
+
+
+class _CachedFunction:
+    def __init__(
+        self,
+        func: Callable,
+        ttl: float,
+        maxsize: int,
+        local_ttl: float | None,
+        stale_ttl: float,
+        key: Callable[..., str],
+        namespace: str,
+        use_redis: bool,
+        lock_timeout: float,
+    ) -> None:
+        self.func = func
+        self.ttl = ttl
+        self.local_ttl = ttl if local_ttl is None else local_ttl
+        self.stale_ttl = stale_ttl
+        self.key = key
+        self.namespace = namespace
+        # remote: redis 二级缓存和加载锁, broadcast: pub/sub 失效通知
+        self.remote = use_redis and config.CACHE_REDIS_ENABLED
+        self.broadcast = self.remote
+        self.lock_timeout = lock_timeout
+
+        # key -> (fresh_until, value), fresh_until 为 time.time()
+        self._local = LRUCache(maxsize=maxsize)
+        self._local_lock = threading.Lock()
+        self._single_flight = SingleFlight()
+        self._refreshing: set[str] = set()
+        self._background: set[asyncio.Task] = set()
+        self._thread_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        # 正在加载的 key -> [加载数, 失效次数], 与 _clear_generation 一起
+        # 判断加载期间是否被 invalidate, 被 invalidate 时不写入缓存
+        self._loads: dict[str, list[int]] = {}
+        self._clear_generation = 0
+
+        self.hits = 0
+        self.remote_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        _invalidator.register(self)
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    def _lock_key(self, key: str) -> str:
+        return f"cache_lock:{self.namespace}:{key}"
+
+    def _get_local(self, key: str) -> Any:
+        with self._local_lock:
+            return self._local.get(key, _MISSING)
+
+    def _set_local(
+        self,
+        key: str,
+        entry: tuple[float, Any],
+        generation: tuple[int, int] | None = None,
+    ) -> None:
+        """`generation` 不为 None 时, 只在加载期间没有被 invalidate 时写入"""
+        ttl = min(self.local_ttl, entry[0] + self.stale_ttl - time.time())
+        if ttl <= 0:
+            return
+        with self._local_lock:
+            if generation is not None and generation != (
+                self._clear_generation,
+                self._loads[key][1],
+            ):
+                return
+            self._local.set(key, entry, ttl=ttl)
+
+    def invalidate_local(self, key: str | None) -> None:
+        """删除当前进程的缓存, `key` 为 None 时清空"""
+        with self._local_lock:
+            if key is None:
+                self._local.clear()
+                self._clear_generation += 1
+            else:
+                self._local.delete(key)
+                load = self._loads.get(key)
+                if load is not None:
+                    load[1] += 1
+
+    def _begin_load(self, key: str) -> tuple[int, int]:
+        """开始加载, 返回当前的失效次数"""
+        with self._local_lock:
+            load = self._loads.setdefault(key, [0, 0])
+            load[0] += 1
+            return self._clear_generation, load[1]
+
+    def _generation(self, key: str) -> tuple[int, int]:
+        with self._local_lock:
+            return self._clear_generation, self._loads[key][1]
+
+    def _end_load(self, key: str) -> None:
+        with self._local_lock:
+            load = self._loads[key]
+            load[0] -= 1
+            if load[0] == 0:
+                del self._loads[key]
+
+    async def _get_remote(self, key: str) -> Any:
+        try:
+            res = await redis_client.get_value(self._redis_key(key))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"get cache {self.namespace} failed: {type(e)}, {e}")
+            return _MISSING
+        if not isinstance(res, list | tuple) or len(res) != 2:
+            # 不存在, 或者是没有编码头的旧数据
+            return _MISSING
+        fresh_until, value = res
+        return fresh_until, value
+
+    async def _set_remote(self, key: str, entry: tuple[float, Any]) -> None:
+        try:
+            data = redis_client.codec.encode(list(entry))
+        except Exception as e:
+            logger.warning(
+                f"cache {self.namespace} value can not be encoded, "
+                f"only cached in process: {e}"
+            )
+            return
+        try:
+            await redis_client.set(
+                self._redis_key(key),
+                data,
+                ex=max(1, int(self.ttl + self.stale_ttl)),
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"set cache {self.namespace} failed: {type(e)}, {e}")
+
+    async def _delete_remote(self, key: str) -> None:
+        try:
+            await redis_client.delete(self._redis_key(key))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(
+                f"delete cache {self.namespace} failed: {type(e)}, {e}"
+            )
+
+    async def _acquire_lock(self, key: str) -> str | None:
+        """获取跨 worker 的加载锁, 返回锁的 token, redis 不可用时视为获取成功"""
+        token = uuid.uuid4().hex
+        try:
+            acquired = await redis_client.set(
+                self._lock_key(key),
+                token,
+                nx=True,
+                px=int(self.lock_timeout * 1000),
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(
+                f"lock cache {self.namespace} failed: {type(e)}, {e}"
+            )
+            return token
+        return token if acquired else None
+
+    async def _release_lock(self, key: str, token: str) -> None:
+        try:
+            await redis_client.eval(
+                _RELEASE_LOCK_SCRIPT, [self._lock_key(key)], [token]
+            )
+        except Exception as e:
+            logger.warning(
+                f"unlock cache {self.namespace} failed: {type(e)}, {e}"
+            )
+
+    async def _wait_remote(self, key: str) -> Any:
+        """其他 worker 正在加载, 等待它写入 redis, 超时返回 _MISSING"""
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            entry = await self._get_remote(key)
+            if entry is not _MISSING and entry[0] > time.time():
+                return entry
+        return _MISSING
+
+    async def _store(self, key: str, value: Any) -> None:
+        entry = (time.time() + self.ttl, value)
+        self._set_local(key, entry)
+        if self.remote:
+            await self._set_remote(key, entry)
+
+    async def _load(
+        self,
+        key: str,
+        args: tuple,
+        kwargs: dict,
+        wait: bool = True,
+    ) -> Any:
+        """
+        调用函数并写入缓存, 同一时间所有 worker 中只有一个在加载.
+        没拿到锁时, `wait=True` 等待其他 worker 的结果,
+        `wait=False` (后台刷新) 直接放弃
+
+        """
+        token = None
+        if self.remote and self.lock_timeout > 0:
+            token = await self._acquire_lock(key)
+            if token is None:
+                if not wait:
+                    return _MISSING
+                entry = await self._wait_remote(key)
+                if entry is not _MISSING:
+                    self._set_local(key, entry)
+                    return entry[1]
+
+        generation = self._begin_load(key)
+        try:
+            value = await self.func(*args, **kwargs)
+            # 加载期间被 invalidate, 结果可能是旧数据, 只返回不缓存
+            if self._generation(key) == generation:
+                await self._store(key, value)
+                if self.remote and self._generation(key) != generation:
+                    # 写入 redis 期间被 invalidate, 删除可能覆盖了失效的值
+                    await self._delete_remote(key)
+            return value
+        finally:
+            self._end_load(key)
+            if token is not None:
+                await self._release_lock(key, token)
+
+    def _refresh_in_background(self, key: str, args: tuple, kwargs: dict):
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await self._load(key, args, kwargs, wait=False)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(
+                    f"refresh cache {self.namespace} failed: {type(e)}, {e}"
+                )
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def acall(self, args: tuple, kwargs: dict) -> Any:
+        key = self.key(*args, **kwargs)
+        if self.broadcast:
+            _invalidator.start()
+
+        entry = self._get_local(key)
+        if entry is not _MISSING:
+            self.hits += 1
+        elif self.remote:
+            entry = await self._get_remote(key)
+            if entry is not _MISSING:
+                self.remote_hits += 1
+                self._set_local(key, entry)
+
+        if entry is not _MISSING:
+            fresh_until, value = entry
+            if fresh_until <= time.time():
+                self.stale_hits += 1
+                self._refresh_in_background(key, args, kwargs)
+            return value
+
+        self.misses += 1
+        value, _ = await self._single_flight.do(
+            key, lambda: self._load(key, args, kwargs)
+        )
+        return value
+
+    def call(self, args: tuple, kwargs: dict) -> Any:
+        key = self.key(*args, **kwargs)
+        entry = self._get_local(key)
+        if entry is not _MISSING:
+            fresh_until, value = entry
+            if fresh_until > time.time():
+                self.hits += 1
+                return value
+            # 过期但在 stale_ttl 内, 只有拿到锁的线程刷新, 其他线程返回旧值
+            self.stale_hits += 1
+            lock = self._thread_locks[hash(key) % _LOCK_STRIPES]
+            if not lock.acquire(blocking=False):
+                return value
+            try:
+                return self._sync_load(key, args, kwargs)
+            finally:
+                lock.release()
+
+        self.misses += 1
+        with self._thread_locks[hash(key) % _LOCK_STRIPES]:
+            entry = self._get_local(key)
+            if entry is not _MISSING and entry[0] > time.time():
+                return entry[1]
+            return self._sync_load(key, args, kwargs)
+
+    def _sync_load(self, key: str, args: tuple, kwargs: dict) -> Any:
+        generation = self._begin_load(key)
+        try:
+            value = self.func(*args, **kwargs)
+            # 其他线程收到失效通知时, 检查和写入需要在同一个锁中
+            self._set_local(key, (time.time() + self.ttl, value), generation)
+            return value
+        finally:
+            self._end_load(key)
+
+    async def invalidate(self, *args, **kwargs) -> None:
+        """删除这组参数在所有 worker 和 redis 中的缓存"""
+        key = self.key(*args, **kwargs)
+        self.invalidate_local(key)
+        if self.remote:
+            await self._delete_remote(key)
+        if self.broadcast:
+            await _invalidator.publish(self.namespace, key)
+
+    async def invalidate_all(self) -> None:
+        """清空所有 worker 的进程内缓存, redis 中的缓存等待过期"""
+        self.invalidate_local(None)
+        if self.broadcast:
+            await _invalidator.publish(self.namespace, None)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._local),
+            "hits": self.hits,
+            "remote_hits": self.remote_hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+def cached(
+    ttl: float = 60,
+    *,
+    maxsize: int = 1024,
+    local_ttl: float | None = None,
+    stale_ttl: float = 0,
+    key: Callable[..., Hashable] | None = None,
+    namespace: str | None = None,
+    redis: bool = True,
+    lock_timeout: float = 10,
+) -> Callable[[F], F]:
+    """
+    两级缓存装饰器, 一级为进程内 LRU, 二级为 redis, 支持同步和异步函数
+
+    - 缓存未命中时, 同一进程内相同参数的并发调用只执行一次,
+      所有 worker 之间通过 redis 锁只有一个在执行, 其他等待它写入 redis
+    - 过期后 `stale_ttl` 秒内仍返回旧值, 同时在后台刷新
+    - `invalidate` 删除 redis 中的缓存, 并通过 pub/sub 通知所有 worker
+      删除进程内缓存
+
+    同步函数没有事件循环, 只使用进程内缓存, 但仍能收到其他 worker 的失效通知
+    (需要 `init_cache`). redis 中的值用 `redis_client.codec` 编码,
+    不能编码的返回值只缓存在进程内.
+    缓存的返回值是共享的同一个对象, 修改前需要自行复制
+
+    Usage
+    ```python
+        @cached(ttl=300, stale_ttl=60)
+        async def get_user(user_id: int) -> dict: ...
+
+        await get_user.invalidate(user_id)
+    ```
+
+    Args:
+        ttl (float, optional): 缓存有效秒数. Defaults to 60.
+        maxsize (int, optional): 进程内缓存的最大条目数. Defaults to 1024.
+        local_ttl (float | None, optional): 进程内缓存的最长秒数,
+            None 时同 `ttl`. Defaults to None.
+        stale_ttl (float, optional): 过期后仍可返回旧值的秒数. Defaults to 0.
+        key (Callable[..., Hashable] | None, optional): 由参数生成缓存 key,
+            默认为 `default_cache_key`, 方法需要自定义以排除 self.
+            Defaults to None.
+        namespace (str | None, optional): 缓存 key 的前缀, 默认为函数的
+            `__module__.__qualname__`. Defaults to None.
+        redis (bool, optional): 是否使用 redis, `CACHE_REDIS_ENABLED`
+            为 False 时不使用. Defaults to True.
+        lock_timeout (float, optional): 跨 worker 加载锁的秒数, 也是等待其他
+            worker 加载的最长时间, 0 为不加锁. Defaults to 10.
+
+    """
+
+    def decorator(func: F) -> F:
+        cache = _CachedFunction(
+            func,
+            ttl=ttl,
+            maxsize=maxsize,
+            local_ttl=local_ttl,
+            stale_ttl=stale_ttl,
+            key=(
+                (lambda *args, **kwargs: str(key(*args, **kwargs)))
+                if key is not None
+                else default_cache_key
+            ),
+            namespace=namespace or f"{func.__module__}.{func.__qualname__}",
+            use_redis=redis,
+            lock_timeout=lock_timeout,
+        )
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                return await cache.acall(args, kwargs)
+
+        else:
+            cache.remote = False
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return cache.call(args, kwargs)
+
+        wrapper.cache = cache  # type: ignore[attr-defined]
+        wrapper.invalidate = cache.invalidate  # type: ignore[attr-defined]
+        wrapper.invalidate_all = cache.invalidate_all  # type: ignore[attr-defined]
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+async def init_cache() -> None:
+    """开始接收其他 worker 的缓存失效通知"""
+    _invalidator.start()
+
+
+async def close_cache() -> None:
+    await _invalidator.stop()
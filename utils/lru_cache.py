@@ -0,0 +1,57 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None) -> None:
+        """
+        进程内 LRU 缓存, 超过 `maxsize` 时淘汰最久未使用的条目
+
+        Args:
+            maxsize (int, optional): 最大条目数. Defaults to 1024.
+            ttl (float | None, optional): 过期秒数, None 代表不过期.
+                Defaults to None.
+
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expire_at, value)
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            return default
+
+        expire_at, value = item
+        if expire_at is not None and expire_at <= time.monotonic():
+            self._data.pop(key, None)
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        """`ttl` 为 None 时使用默认的 `self.ttl`"""
+        ttl = self.ttl if ttl is None else ttl
+        expire_at = time.monotonic() + ttl if ttl is not None else None
+
+        self._data[key] = (expire_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
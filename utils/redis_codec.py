@@ -0,0 +1,168 @@
+import json
+import pickle
+import zlib
+from enum import IntEnum
+from typing import Any, Literal
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+# 编码后的值以 MAGIC + 1 字节的编码方式开头, 0xFF 不会出现在 utf-8 文本中,
+# 没有这个前缀的值 (旧数据或其他程序写入的) 原样返回 bytes
+MAGIC = 0xFF
+
+
+class Serializer(IntEnum):
+    RAW = 0
+    STR = 1
+    JSON = 2
+    MSGPACK = 3
+    PICKLE = 4
+
+
+class Compression(IntEnum):
+    NONE = 0
+    ZLIB = 1
+    LZ4 = 2
+
+
+SerializerName = Literal["json", "msgpack", "pickle"]
+CompressionName = Literal["none", "zlib", "lz4"]
+
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _json_loads(data: bytes | memoryview) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(bytes(data))
+
+
+class RedisCodec:
+    def __init__(
+        self,
+        serializer: SerializerName = "json",
+        compression: CompressionName = "zlib",
+        compress_threshold: int = 1024,
+        compress_level: int = 1,
+        allow_pickle: bool = False,
+    ) -> None:
+        """
+        redis 值的编解码, 编码结果带有 2 字节的头, 标明序列化和压缩方式,
+        解码时根据头自动选择, 修改配置后旧数据仍能读取
+
+        bytes 和 str 原样保存, 其他值按 `serializer` 序列化,
+        超过 `compress_threshold` 字节且压缩后更小时压缩.
+        orjson, msgpack 和 lz4 为可选依赖 (`poetry install -E codec`)
+
+        Args:
+            serializer (SerializerName, optional): json 在安装了 orjson 时
+                使用 orjson, msgpack 需要安装 `msgpack`. Defaults to "json".
+            compression (CompressionName, optional): lz4 需要安装 `lz4`.
+                Defaults to "zlib".
+            compress_threshold (int, optional): 压缩的最小字节数.
+                Defaults to 1024.
+            compress_level (int, optional): zlib 的压缩级别. Defaults to 1.
+            allow_pickle (bool, optional): 是否解码 pickle 的值, pickle
+                可以执行任意代码, 只在 redis 可信时开启, `serializer="pickle"`
+                时总是开启. Defaults to False.
+
+        """
+        if serializer == "msgpack" and msgpack is None:
+            raise ImportError("msgpack serializer requires `msgpack` installed")
+        if compression == "lz4" and lz4_frame is None:
+            raise ImportError("lz4 compression requires `lz4` installed")
+
+        self.serializer = Serializer[serializer.upper()]
+        self.compression = Compression[compression.upper()]
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.allow_pickle = allow_pickle or serializer == "pickle"
+
+    def _serialize(self, value: Any) -> tuple[Serializer, bytes]:
+        if isinstance(value, bytes | bytearray | memoryview):
+            return Serializer.RAW, bytes(value)
+        if isinstance(value, str):
+            return Serializer.STR, value.encode()
+        if self.serializer == Serializer.JSON:
+            return Serializer.JSON, _json_dumps(value)
+        if self.serializer == Serializer.MSGPACK:
+            return Serializer.MSGPACK, msgpack.packb(value, use_bin_type=True)
+        return Serializer.PICKLE, pickle.dumps(
+            value, protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+    def _compress(self, data: bytes) -> tuple[Compression, bytes]:
+        if (
+            self.compression == Compression.NONE
+            or len(data) < self.compress_threshold
+        ):
+            return Compression.NONE, data
+
+        if self.compression == Compression.ZLIB:
+            compressed = zlib.compress(data, self.compress_level)
+        else:
+            compressed = lz4_frame.compress(data)
+        if len(compressed) >= len(data):
+            return Compression.NONE, data
+        return self.compression, compressed
+
+    def encode(self, value: Any) -> bytes:
+        serializer, data = self._serialize(value)
+        compression, data = self._compress(data)
+        return bytes((MAGIC, compression << 4 | serializer)) + data
+
+    def decode(self, data: bytes | None) -> Any:
+        """
+        解码 `encode` 的结果, None 原样返回,
+        没有头或头中的编码方式未知的值返回原始 bytes
+        """
+        if data is None or len(data) < 2 or data[0] != MAGIC:
+            return data
+
+        try:
+            compression = Compression(data[1] >> 4)
+            serializer = Serializer(data[1] & 0x0F)
+        except ValueError:
+            # 以 0xFF 开头的其他二进制数据, 或更新版本写入的编码方式
+            return data
+        payload = memoryview(data)[2:]
+
+        if compression == Compression.ZLIB:
+            payload = zlib.decompress(payload)
+        elif compression == Compression.LZ4:
+            if lz4_frame is None:
+                raise ImportError("lz4 compression requires `lz4` installed")
+            payload = lz4_frame.decompress(payload)
+
+        if serializer == Serializer.RAW:
+            return bytes(payload)
+        if serializer == Serializer.STR:
+            return bytes(payload).decode()
+        if serializer == Serializer.JSON:
+            return _json_loads(payload)
+        if serializer == Serializer.MSGPACK:
+            if msgpack is None:
+                raise ImportError(
+                    "msgpack serializer requires `msgpack` installed"
+                )
+            return msgpack.unpackb(payload, raw=False)
+        if not self.allow_pickle:
+            raise ValueError("decoding pickled values is not allowed")
+        return pickle.loads(payload)
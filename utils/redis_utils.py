@@ -1,9 +1,198 @@
+import asyncio
+from collections.abc import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Mapping,
+    Sequence,
+)
+from contextlib import asynccontextmanager
 from typing import Any
 
 import redis
 from redis import asyncio as aioredis
+from redis.asyncio.client import PubSub
 
 from config import config
+from utils.redis_codec import RedisCodec
+
+
+class RedisPipeline:
+    def __init__(self, pipeline: Any, prefix: str):
+        """
+        自动加前缀的 pipeline, 命令先在本地排队, `execute` 时一次发送,
+        结果按命令顺序返回. `transaction=True` 时以 MULTI/EXEC 原子执行
+
+        同步/异步客户端共用, 异步时 `execute` 需要 await:
+
+        ```python
+        async with redis_client.pipeline() as pipe:
+            pipe.get("a").hget("b", "field")
+            a, field = await pipe.execute()
+        ```
+
+        """
+        self._pipe = pipeline
+        self._prefix = prefix
+
+    def __len__(self) -> int:
+        return len(self._pipe)
+
+    def __enter__(self) -> "RedisPipeline":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._pipe.reset()
+
+    async def __aenter__(self) -> "RedisPipeline":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self._pipe.reset()
+
+    def execute(self, raise_on_error: bool = True) -> Any:
+        return self._pipe.execute(raise_on_error=raise_on_error)
+
+    def get(self, key: str) -> "RedisPipeline":
+        self._pipe.get(self._prefix + key)
+        return self
+
+    def set(self, key: str, value, ex=None) -> "RedisPipeline":
+        self._pipe.set(self._prefix + key, value, ex=ex)
+        return self
+
+    def delete(self, *keys: str) -> "RedisPipeline":
+        self._pipe.delete(*[self._prefix + key for key in keys])
+        return self
+
+    def expire(self, key: str, seconds: int) -> "RedisPipeline":
+        self._pipe.expire(self._prefix + key, seconds)
+        return self
+
+    def incr(self, key: str, amount: int = 1) -> "RedisPipeline":
+        self._pipe.incr(self._prefix + key, amount)
+        return self
+
+    def mget(self, keys: Sequence[str]) -> "RedisPipeline":
+        self._pipe.mget([self._prefix + key for key in keys])
+        return self
+
+    def mset(
+        self,
+        mapping: Mapping[str, Any],
+        ex: int | Mapping[str, int] | None = None,
+    ) -> "RedisPipeline":
+        """`ex` 为 dict 时为每个 key 单独设置过期时间, 不在其中的 key 不过期"""
+        if ex is None:
+            self._pipe.mset(
+                {self._prefix + key: value for key, value in mapping.items()}
+            )
+            return self
+
+        for key, value in mapping.items():
+            key_ex = ex.get(key) if isinstance(ex, Mapping) else ex
+            self._pipe.set(self._prefix + key, value, ex=key_ex)
+        return self
+
+    def hget(self, key: str, field: str) -> "RedisPipeline":
+        self._pipe.hget(self._prefix + key, field)
+        return self
+
+    def hmget(self, key: str, fields: Sequence[str]) -> "RedisPipeline":
+        self._pipe.hmget(self._prefix + key, fields)
+        return self
+
+    def hgetall(self, key: str) -> "RedisPipeline":
+        self._pipe.hgetall(self._prefix + key)
+        return self
+
+    def hset(self, key: str, mapping: Mapping) -> "RedisPipeline":
+        self._pipe.hset(self._prefix + key, mapping=mapping)
+        return self
+
+    def hdel(self, key: str, *fields: str) -> "RedisPipeline":
+        self._pipe.hdel(self._prefix + key, *fields)
+        return self
+
+    def hincrby(self, key: str, field: str, amount: int = 1) -> "RedisPipeline":
+        self._pipe.hincrby(self._prefix + key, field, amount)
+        return self
+
+    def sadd(self, key: str, *members: str) -> "RedisPipeline":
+        self._pipe.sadd(self._prefix + key, *members)
+        return self
+
+    def srem(self, key: str, *members: str) -> "RedisPipeline":
+        self._pipe.srem(self._prefix + key, *members)
+        return self
+
+    def smismember(self, key: str, members: Sequence[str]) -> "RedisPipeline":
+        self._pipe.smismember(self._prefix + key, members)
+        return self
+
+    def zadd(
+        self,
+        key: str,
+        mapping: Mapping[str, float],
+        nx: bool = False,
+        xx: bool = False,
+    ) -> "RedisPipeline":
+        self._pipe.zadd(self._prefix + key, mapping, nx=nx, xx=xx)
+        return self
+
+    def zrem(self, key: str, *members: str) -> "RedisPipeline":
+        self._pipe.zrem(self._prefix + key, *members)
+        return self
+
+    def zscore(self, key: str, member: str) -> "RedisPipeline":
+        self._pipe.zscore(self._prefix + key, member)
+        return self
+
+    def zincrby(self, key: str, amount: float, member: str) -> "RedisPipeline":
+        self._pipe.zincrby(self._prefix + key, amount, member)
+        return self
+
+    def zcard(self, key: str) -> "RedisPipeline":
+        self._pipe.zcard(self._prefix + key)
+        return self
+
+    def zrange(
+        self,
+        key: str,
+        start: int,
+        end: int,
+        desc: bool = False,
+        withscores: bool = False,
+    ) -> "RedisPipeline":
+        self._pipe.zrange(
+            self._prefix + key, start, end, desc=desc, withscores=withscores
+        )
+        return self
+
+    def zrangebyscore(
+        self,
+        key: str,
+        min_score: float | str,
+        max_score: float | str,
+        start: int | None = None,
+        num: int | None = None,
+        withscores: bool = False,
+    ) -> "RedisPipeline":
+        self._pipe.zrangebyscore(
+            self._prefix + key,
+            min_score,
+            max_score,
+            start=start,
+            num=num,
+            withscores=withscores,
+        )
+        return self
+
+    def zremrangebyscore(
+        self, key: str, min_score: float | str, max_score: float | str
+    ) -> "RedisPipeline":
+        self._pipe.zremrangebyscore(self._prefix + key, min_score, max_score)
+        return self
 
 
 class RedisClient:
@@ -14,7 +203,16 @@ class RedisClient:
         db: int,
         username: str,
         password: str,
+        codec: RedisCodec | None = None,
     ):
+        """
+        Args:
+            codec (RedisCodec | None, optional): `*_value` 方法使用的编解码,
+                None 时为 `RedisCodec()`. Defaults to None.
+
+        """
+        self.codec = codec or RedisCodec()
+        self._scripts: dict[str, Any] = {}
         self._client = redis.Redis()
         self._client.connection_pool = redis.ConnectionPool(
             host=host,
@@ -33,6 +231,12 @@ class RedisClient:
     def prefix(self):
         return "custom_prefix:"
 
+    def pipeline(self, transaction: bool = False) -> RedisPipeline:
+        """见 `RedisPipeline`, 用 `with` 使用"""
+        return RedisPipeline(
+            self._client.pipeline(transaction=transaction), self.prefix()
+        )
+
     def get(self, key) -> Any | None:
         return self._client.get(self.prefix() + key)
 
@@ -42,6 +246,252 @@ class RedisClient:
     def delete(self, key):
         return self._client.delete(self.prefix() + key)
 
+    def expire(self, key, seconds: int) -> bool:
+        return self._client.expire(self.prefix() + key, seconds)
+
+    def incr(self, key, amount: int = 1) -> int:
+        return self._client.incr(self.prefix() + key, amount)
+
+    def mget(self, keys: Sequence[str]) -> list[bytes | None]:
+        if not keys:
+            return []
+        return self._client.mget([self.prefix() + key for key in keys])
+
+    def mset(
+        self,
+        mapping: Mapping[str, Any],
+        ex: int | Mapping[str, int] | None = None,
+    ) -> None:
+        """
+        一次写入多个 key
+
+        Args:
+            mapping (Mapping[str, Any]): key -> value
+            ex (int | Mapping[str, int] | None, optional): 过期秒数,
+                为 dict 时为每个 key 单独设置, 不在其中的 key 不过期.
+                Defaults to None.
+
+        """
+        if not mapping:
+            return
+        with self.pipeline() as pipe:
+            pipe.mset(mapping, ex=ex)
+            pipe.execute()
+
+    def get_value(self, key) -> Any | None:
+        """读取 `set_value` 写入的值, 按值的头自动解码"""
+        return self.codec.decode(self.get(key))
+
+    def set_value(self, key, value, ex=None) -> None:
+        """用 `self.codec` 编码后写入, 可以是任意可序列化的值"""
+        self.set(key, self.codec.encode(value), ex=ex)
+
+    def mget_values(self, keys: Sequence[str]) -> list[Any | None]:
+        return [self.codec.decode(item) for item in self.mget(keys)]
+
+    def mset_values(
+        self,
+        mapping: Mapping[str, Any],
+        ex: int | Mapping[str, int] | None = None,
+    ) -> None:
+        self.mset(
+            {key: self.codec.encode(value) for key, value in mapping.items()},
+            ex=ex,
+        )
+
+    def hget(self, key, field: str) -> bytes | None:
+        return self._client.hget(self.prefix() + key, field)
+
+    def hmget(self, key, fields: Sequence[str]) -> list[bytes | None]:
+        return self._client.hmget(self.prefix() + key, fields)
+
+    def hgetall(self, key) -> dict[bytes, bytes]:
+        return self._client.hgetall(self.prefix() + key)
+
+    def hset(self, key, mapping: Mapping) -> int:
+        return self._client.hset(self.prefix() + key, mapping=mapping)
+
+    def hdel(self, key, *fields: str) -> int:
+        return self._client.hdel(self.prefix() + key, *fields)
+
+    def hincrby(self, key, field: str, amount: int = 1) -> int:
+        return self._client.hincrby(self.prefix() + key, field, amount)
+
+    def sadd(self, key, *members: str) -> int:
+        return self._client.sadd(self.prefix() + key, *members)
+
+    def srem(self, key, *members: str) -> int:
+        return self._client.srem(self.prefix() + key, *members)
+
+    def smismember(self, key, members: Sequence[str]) -> list[int]:
+        return self._client.smismember(self.prefix() + key, members)
+
+    def zadd(
+        self,
+        key,
+        mapping: Mapping[str, float],
+        nx: bool = False,
+        xx: bool = False,
+    ) -> int:
+        return self._client.zadd(self.prefix() + key, mapping, nx=nx, xx=xx)
+
+    def zrem(self, key, *members: str) -> int:
+        return self._client.zrem(self.prefix() + key, *members)
+
+    def zscore(self, key, member: str) -> float | None:
+        return self._client.zscore(self.prefix() + key, member)
+
+    def zincrby(self, key, amount: float, member: str) -> float:
+        return self._client.zincrby(self.prefix() + key, amount, member)
+
+    def zcard(self, key) -> int:
+        return self._client.zcard(self.prefix() + key)
+
+    def zrange(
+        self,
+        key,
+        start: int,
+        end: int,
+        desc: bool = False,
+        withscores: bool = False,
+    ) -> list:
+        return self._client.zrange(
+            self.prefix() + key, start, end, desc=desc, withscores=withscores
+        )
+
+    def zrangebyscore(
+        self,
+        key,
+        min_score: float | str,
+        max_score: float | str,
+        start: int | None = None,
+        num: int | None = None,
+        withscores: bool = False,
+    ) -> list:
+        return self._client.zrangebyscore(
+            self.prefix() + key,
+            min_score,
+            max_score,
+            start=start,
+            num=num,
+            withscores=withscores,
+        )
+
+    def zremrangebyscore(
+        self, key, min_score: float | str, max_score: float | str
+    ) -> int:
+        return self._client.zremrangebyscore(
+            self.prefix() + key, min_score, max_score
+        )
+
+    def publish(self, channel: str, message: str | bytes) -> int:
+        return self._client.publish(self.prefix() + channel, message)
+
+    def subscribe(self, *channels: str) -> redis.client.PubSub:
+        """同 `AsyncRedisClient.subscribe`, 不再使用时需要 `close`"""
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(*[self.prefix() + item for item in channels])
+        return pubsub
+
+    def eval(self, script: str, keys: list[str], args: list) -> Any:
+        """执行 lua 脚本, `keys` 会自动加上前缀, 脚本通过 EVALSHA 缓存"""
+        if script not in self._scripts:
+            self._scripts[script] = self._client.register_script(script)
+
+        return self._scripts[script](
+            keys=[self.prefix() + key for key in keys],
+            args=args,
+            client=self._client,
+        )
+
+
+class _AutoPipeline:
+    def __init__(
+        self,
+        get_client: Callable[[], Awaitable[aioredis.Redis]],
+        window: float = 0.0,
+        max_commands: int = 256,
+    ):
+        """
+        自动 pipeline, 把短时间内各协程发出的命令合并为一次 pipeline 发送,
+        结果按顺序分发给各调用者
+
+        Args:
+            get_client (Callable[[], Awaitable[aioredis.Redis]]):
+            window (float, optional): 收集命令的秒数, 0 为只收集当前事件循环
+                迭代内的命令. Defaults to 0.0.
+            max_commands (int, optional): 每次最多合并的命令数, 达到后立即发送.
+                Defaults to 256.
+
+        """
+        self._get_client = get_client
+        self.window = window
+        self.max_commands = max_commands
+        self._commands: list[tuple[str, tuple, dict, asyncio.Future]] = []
+        self._handle: asyncio.Handle | None = None
+        self._flushing: set[asyncio.Task] = set()
+        self.flushes = 0
+        self.commands = 0
+
+    async def execute(self, name: str, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._commands.append((name, args, kwargs, future))
+        if len(self._commands) >= self.max_commands:
+            self._flush()
+        elif self._handle is None:
+            self._handle = (
+                loop.call_later(self.window, self._flush)
+                if self.window > 0
+                else loop.call_soon(self._flush)
+            )
+        return await future
+
+    def _flush(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        commands, self._commands = self._commands, []
+        if not commands:
+            return
+
+        task = asyncio.create_task(self._send(commands))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _send(
+        self,
+        commands: list[tuple[str, tuple, dict, asyncio.Future]],
+    ) -> None:
+        self.flushes += 1
+        self.commands += len(commands)
+        try:
+            client = await self._get_client()
+            async with client.pipeline(transaction=False) as pipe:
+                for name, args, kwargs, _ in commands:
+                    getattr(pipe, name)(*args, **kwargs)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            for *_, future in commands:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (*_, future), res in zip(commands, results, strict=True):
+            if future.done():
+                continue
+            if isinstance(res, Exception):
+                future.set_exception(res)
+            else:
+                future.set_result(res)
+
+    def stats(self) -> dict:
+        return {
+            "flushes": self.flushes,
+            "commands": self.commands,
+            "pending": len(self._commands),
+        }
+
 
 # Singleton
 class AsyncRedisClient:
@@ -52,48 +502,324 @@ class AsyncRedisClient:
         db: int,
         username: str,
         password: str,
+        auto_pipeline: bool = False,
+        auto_pipeline_window: float = 0.0,
+        auto_pipeline_max_commands: int = 256,
+        max_connections: int = 50,
+        pool_timeout: float | None = 5.0,
+        socket_keepalive: bool = True,
+        health_check_interval: int = 30,
+        codec: RedisCodec | None = None,
     ):
-        self._client = None
+        """
+        连接池在第一次使用时创建 (加锁, 并发的首次调用只会创建一个),
+        也可以在启动时调用 `get_client` 提前创建
+
+        Args:
+            auto_pipeline (bool, optional): 是否开启自动 pipeline, 见
+                `_AutoPipeline`, `eval` 和显式的 `pipeline` 不受影响.
+                Defaults to False.
+            auto_pipeline_window (float, optional): 同 `_AutoPipeline.window`.
+                Defaults to 0.0.
+            auto_pipeline_max_commands (int, optional):
+                同 `_AutoPipeline.max_commands`. Defaults to 256.
+            max_connections (int, optional): 连接池最大连接数. Defaults to 50.
+            pool_timeout (float | None, optional): 连接用尽时等待空闲连接的
+                秒数, 超时抛出 `redis.ConnectionError`, None 为一直等待.
+                Defaults to 5.0.
+            socket_keepalive (bool, optional): 是否开启 TCP keepalive.
+                Defaults to True.
+            health_check_interval (int, optional): 连接空闲超过该秒数后,
+                使用前先 PING 检查, 0 为不检查. Defaults to 30.
+            codec (RedisCodec | None, optional): 同 `RedisClient`.
+                Defaults to None.
+
+        """
+        self._client: aioredis.Redis | None = None
+        self._init_lock = asyncio.Lock()
+        self._scripts: dict[str, Any] = {}
+        self.codec = codec or RedisCodec()
         self.host = host
         self.port = port
         self.db = db
         self.username = username
         self.password = password
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.socket_keepalive = socket_keepalive
+        self.health_check_interval = health_check_interval
+        self._auto_pipeline = (
+            _AutoPipeline(
+                self.get_client,
+                window=auto_pipeline_window,
+                max_commands=auto_pipeline_max_commands,
+            )
+            if auto_pipeline
+            else None
+        )
 
     async def init_client(self) -> aioredis.Redis:
-        return await aioredis.from_url(
-            f"redis://{self.host}:{self.port}/{self.db}",
-            username=self.username,
-            password=self.password,
+        pool = aioredis.BlockingConnectionPool(
+            host=self.host,
+            port=self.port,
+            db=self.db,
+            username=self.username or None,
+            password=self.password or None,
+            max_connections=self.max_connections,
+            timeout=self.pool_timeout,
+            socket_keepalive=self.socket_keepalive,
+            health_check_interval=self.health_check_interval,
             encoding="utf-8",
             decode_responses=False,
         )
+        return aioredis.Redis(connection_pool=pool)
+
+    async def get_client(self) -> aioredis.Redis:
+        if self._client is None:
+            async with self._init_lock:
+                if self._client is None:
+                    self._client = await self.init_client()
+
+        return self._client
+
+    async def _execute(self, name: str, *args, **kwargs) -> Any:
+        """执行 `aioredis.Redis` 的 `name` 命令, key 需已加前缀"""
+        if self._auto_pipeline is not None:
+            return await self._auto_pipeline.execute(name, *args, **kwargs)
+
+        client = await self.get_client()
+        return await getattr(client, name)(*args, **kwargs)
+
+    def stats(self) -> dict:
+        pool = (
+            self._client.connection_pool if self._client is not None else None
+        )
+        return {
+            "pool": (
+                {
+                    "max_connections": pool.max_connections,
+                    "in_use": len(getattr(pool, "_in_use_connections", ())),
+                    "available": len(
+                        getattr(pool, "_available_connections", ())
+                    ),
+                }
+                if pool is not None
+                else None
+            ),
+            "auto_pipeline": (
+                self._auto_pipeline.stats()
+                if self._auto_pipeline is not None
+                else None
+            ),
+        }
 
     async def aclose(self):
-        if self._client is not None:
-            await self._client.aclose()
+        async with self._init_lock:
+            if self._client is not None:
+                await self._client.aclose(close_connection_pool=True)
+                self._client = None
 
     # TODO: update prefix
     def prefix(self):
         return "custom_prefix:"
 
+    @asynccontextmanager
+    async def pipeline(
+        self, transaction: bool = False
+    ) -> AsyncIterator[RedisPipeline]:
+        """见 `RedisPipeline`"""
+        client = await self.get_client()
+        async with RedisPipeline(
+            client.pipeline(transaction=transaction), self.prefix()
+        ) as pipe:
+            yield pipe
+
     async def get(self, key) -> bytes | None:
-        if self._client is None:
-            self._client = await self.init_client()
+        return await self._execute("get", self.prefix() + key)
 
-        return await self._client.get(self.prefix() + key)
+    async def set(
+        self, key, value, ex=None, px=None, nx: bool = False
+    ) -> bool | None:
+        """`nx=True` 时只在 key 不存在时写入, 返回是否写入"""
+        return await self._execute(
+            "set", self.prefix() + key, value, ex=ex, px=px, nx=nx
+        )
 
-    async def set(self, key, value, ex=None) -> None:
-        if self._client is None:
-            self._client = await self.init_client()
+    async def delete(self, key):
+        return await self._execute("delete", self.prefix() + key)
 
-        await self._client.set(self.prefix() + key, value, ex=ex)
+    async def expire(self, key, seconds: int) -> bool:
+        return await self._execute("expire", self.prefix() + key, seconds)
 
-    async def delete(self, key):
-        if self._client is None:
-            self._client = await self.init_client()
+    async def mget(self, keys: Sequence[str]) -> list[bytes | None]:
+        if not keys:
+            return []
+        return await self._execute(
+            "mget", [self.prefix() + key for key in keys]
+        )
 
-        return self._client.delete(self.prefix() + key)
+    async def mset(
+        self,
+        mapping: Mapping[str, Any],
+        ex: int | Mapping[str, int] | None = None,
+    ) -> None:
+        """同 `RedisClient.mset`, 设置过期时间时用 pipeline, 仍只有一次往返"""
+        if not mapping:
+            return
+        async with self.pipeline() as pipe:
+            pipe.mset(mapping, ex=ex)
+            await pipe.execute()
+
+    async def get_value(self, key) -> Any | None:
+        """同 `RedisClient.get_value`"""
+        return self.codec.decode(await self.get(key))
+
+    async def set_value(self, key, value, ex=None) -> None:
+        """同 `RedisClient.set_value`"""
+        await self.set(key, self.codec.encode(value), ex=ex)
+
+    async def mget_values(self, keys: Sequence[str]) -> list[Any | None]:
+        return [self.codec.decode(item) for item in await self.mget(keys)]
+
+    async def mset_values(
+        self,
+        mapping: Mapping[str, Any],
+        ex: int | Mapping[str, int] | None = None,
+    ) -> None:
+        await self.mset(
+            {key: self.codec.encode(value) for key, value in mapping.items()},
+            ex=ex,
+        )
+
+    async def hget(self, key, field: str) -> bytes | None:
+        return await self._execute("hget", self.prefix() + key, field)
+
+    async def hmget(self, key, fields: Sequence[str]) -> list[bytes | None]:
+        return await self._execute("hmget", self.prefix() + key, fields)
+
+    async def hgetall(self, key) -> dict[bytes, bytes]:
+        return await self._execute("hgetall", self.prefix() + key)
+
+    async def hset(self, key, mapping: Mapping) -> int:
+        return await self._execute("hset", self.prefix() + key, mapping=mapping)
+
+    async def hdel(self, key, *fields: str) -> int:
+        return await self._execute("hdel", self.prefix() + key, *fields)
+
+    async def hincrby(self, key, field: str, amount: int = 1) -> int:
+        return await self._execute(
+            "hincrby", self.prefix() + key, field, amount
+        )
+
+    async def sadd(self, key, *members: str) -> int:
+        return await self._execute("sadd", self.prefix() + key, *members)
+
+    async def srem(self, key, *members: str) -> int:
+        return await self._execute("srem", self.prefix() + key, *members)
+
+    async def smismember(self, key, members: Sequence[str]) -> list[int]:
+        return await self._execute("smismember", self.prefix() + key, members)
+
+    async def zadd(
+        self,
+        key,
+        mapping: Mapping[str, float],
+        nx: bool = False,
+        xx: bool = False,
+    ) -> int:
+        return await self._execute(
+            "zadd", self.prefix() + key, mapping, nx=nx, xx=xx
+        )
+
+    async def zrem(self, key, *members: str) -> int:
+        return await self._execute("zrem", self.prefix() + key, *members)
+
+    async def zscore(self, key, member: str) -> float | None:
+        return await self._execute("zscore", self.prefix() + key, member)
+
+    async def zincrby(self, key, amount: float, member: str) -> float:
+        return await self._execute(
+            "zincrby", self.prefix() + key, amount, member
+        )
+
+    async def zcard(self, key) -> int:
+        return await self._execute("zcard", self.prefix() + key)
+
+    async def zrange(
+        self,
+        key,
+        start: int,
+        end: int,
+        desc: bool = False,
+        withscores: bool = False,
+    ) -> list:
+        return await self._execute(
+            "zrange",
+            self.prefix() + key,
+            start,
+            end,
+            desc=desc,
+            withscores=withscores,
+        )
+
+    async def zrangebyscore(
+        self,
+        key,
+        min_score: float | str,
+        max_score: float | str,
+        start: int | None = None,
+        num: int | None = None,
+        withscores: bool = False,
+    ) -> list:
+        return await self._execute(
+            "zrangebyscore",
+            self.prefix() + key,
+            min_score,
+            max_score,
+            start=start,
+            num=num,
+            withscores=withscores,
+        )
+
+    async def zremrangebyscore(
+        self, key, min_score: float | str, max_score: float | str
+    ) -> int:
+        return await self._execute(
+            "zremrangebyscore", self.prefix() + key, min_score, max_score
+        )
+
+    async def incr(self, key, amount: int = 1) -> int:
+        return await self._execute("incr", self.prefix() + key, amount)
+
+    async def publish(self, channel: str, message: str | bytes) -> int:
+        return await self._execute("publish", self.prefix() + channel, message)
+
+    async def subscribe(self, *channels: str) -> PubSub:
+        """
+        订阅 `channels` (自动加前缀), 返回的 `PubSub` 独占一个连接,
+        不再使用时需要 `aclose`
+
+        """
+        client = await self.get_client()
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(*[self.prefix() + item for item in channels])
+        return pubsub
+
+    async def eval(self, script: str, keys: list[str], args: list) -> Any:
+        """
+        执行 lua 脚本, `keys` 会自动加上前缀, 脚本通过 EVALSHA 缓存.
+        `aclose` 后会重新创建连接, 执行时传入当前的连接, 不使用注册时的连接
+
+        """
+        client = await self.get_client()
+        if script not in self._scripts:
+            self._scripts[script] = client.register_script(script)
+
+        return await self._scripts[script](
+            keys=[self.prefix() + key for key in keys],
+            args=args,
+            client=client,
+        )
 
 
 # redis_client = RedisClient(
@@ -103,4 +829,16 @@ redis_client = AsyncRedisClient(
     db=config.REDIS_DB,
     username=config.REDIS_USERNAME,
     password=config.REDIS_PASSWORD,
+    auto_pipeline=config.REDIS_AUTO_PIPELINE,
+    auto_pipeline_window=config.REDIS_AUTO_PIPELINE_WINDOW,
+    auto_pipeline_max_commands=config.REDIS_AUTO_PIPELINE_MAX_COMMANDS,
+    max_connections=config.REDIS_MAX_CONNECTIONS,
+    pool_timeout=config.REDIS_POOL_TIMEOUT,
+    socket_keepalive=config.REDIS_SOCKET_KEEPALIVE,
+    health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+    codec=RedisCodec(
+        serializer=config.REDIS_CODEC_SERIALIZER,
+        compression=config.REDIS_CODEC_COMPRESSION,
+        compress_threshold=config.REDIS_CODEC_COMPRESS_THRESHOLD,
+    ),
 )
@@ -1,6 +1,22 @@
+from .aimd import AIMDController
+from .exceptions import TaskDeadlineExceededError, TaskQueueFullError
+from .fair_queue import FairQueue, TaskPriority
+from .limiter_backend import LimiterBackend
+from .mmap_limiter import MmapTokenBucket
+from .redis_limiter import RedisTokenBucket
 from .task_queue import TaskQueue, get_global_task_queue
+from .token_bucket import TokenBucket
 
 __all__ = [
+    "AIMDController",
+    "FairQueue",
+    "LimiterBackend",
+    "MmapTokenBucket",
+    "RedisTokenBucket",
+    "TaskPriority",
+    "TaskDeadlineExceededError",
     "TaskQueue",
+    "TaskQueueFullError",
+    "TokenBucket",
     "get_global_task_queue",
 ]
@@ -0,0 +1,114 @@
+import math
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import Literal
+
+FailureKind = Literal["timeout", "server_error", "internal_error"]
+
+
+class AIMDController:
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target: float = 1.0,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+        window_size: int = 100,
+        history_size: int = 256,
+        on_limit_change: Callable[[int], None] | None = None,
+    ) -> None:
+        """
+        AIMD 并发控制: 延迟正常时加性增大并发上限, 超时或服务端错误时乘性减小
+
+        Args:
+            initial_limit (int, optional): 初始并发上限. Defaults to 4.
+            min_limit (int, optional): 并发上限的最小值. Defaults to 1.
+            max_limit (int, optional): 并发上限的最大值. Defaults to 64.
+            latency_target (float, optional): 健康延迟阈值 (秒),
+                超过时不再增大并发. Defaults to 1.0.
+            increase (float, optional): 每一轮 (约 `limit` 个成功请求)
+                增加的并发数. Defaults to 1.0.
+            decrease_factor (float, optional): 失败时并发上限乘以的系数.
+                Defaults to 0.5.
+            cooldown (float, optional): 两次减小之间的最小间隔 (秒),
+                避免同一批失败连续减小. Defaults to 1.0.
+            window_size (int, optional): 统计错误率的最近请求数. Defaults to 100.
+            history_size (int, optional): 保留的并发上限变化记录数.
+                Defaults to 256.
+            on_limit_change (Callable[[int], None] | None, optional):
+                并发上限变化时的回调. Defaults to None.
+
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.on_limit_change = on_limit_change
+
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        # 第一次失败总是减小, 与 monotonic 时钟的起点无关
+        self._last_decrease_at = -math.inf
+        self._latency_ewma: float | None = None
+        self._outcomes: deque[bool] = deque(maxlen=window_size)
+        self._failures: dict[str, int] = {}
+        self.history: deque[tuple[float, int]] = deque(maxlen=history_size)
+        self.history.append((time.time(), self.limit))
+
+    @property
+    def limit(self) -> int:
+        """当前允许的并发数"""
+        return int(self._limit)
+
+    def _set_limit(self, value: float) -> None:
+        old_limit = self.limit
+        self._limit = min(max(value, self.min_limit), self.max_limit)
+        if self.limit == old_limit:
+            return
+
+        self.history.append((time.time(), self.limit))
+        if self.on_limit_change is not None:
+            self.on_limit_change(self.limit)
+
+    def on_success(self, latency: float) -> None:
+        """记录一次成功请求"""
+        self._outcomes.append(True)
+        if self._latency_ewma is None:
+            self._latency_ewma = latency
+        else:
+            self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+
+        if latency <= self.latency_target:
+            # 每个成功请求增加 increase / limit, 约一轮并发后增加 increase
+            self._set_limit(self._limit + self.increase / self._limit)
+
+    def on_failure(self, kind: FailureKind) -> None:
+        """记录一次失败请求 (超时, 5xx, internal_error)"""
+        self._outcomes.append(False)
+        self._failures[kind] = self._failures.get(kind, 0) + 1
+
+        now = time.monotonic()
+        if now - self._last_decrease_at < self.cooldown:
+            return
+        self._last_decrease_at = now
+        self._set_limit(self._limit * self.decrease_factor)
+
+    def stats(self) -> dict:
+        """当前并发上限, 延迟和错误率, 用于监控"""
+        error_rate = (
+            self._outcomes.count(False) / len(self._outcomes)
+            if self._outcomes
+            else 0.0
+        )
+        return {
+            "limit": self.limit,
+            "latency_ewma": self._latency_ewma,
+            "error_rate": error_rate,
+            "failures": dict(self._failures),
+            "history": list(self.history),
+        }
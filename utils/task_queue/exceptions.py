@@ -0,0 +1,6 @@
+class TaskQueueFullError(Exception):
+    """队列已满, 任务被拒绝"""
+
+
+class TaskDeadlineExceededError(Exception):
+    """任务开始执行前已超过截止时间, 任务被丢弃"""
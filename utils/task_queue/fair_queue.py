@@ -0,0 +1,95 @@
+import asyncio
+from collections import deque
+from collections.abc import Hashable
+from enum import IntEnum
+from typing import Any
+
+
+class TaskPriority(IntEnum):
+    """任务优先级, 值越小越先执行"""
+
+    high = 0
+    normal = 1
+    low = 2
+
+
+class FairQueue:
+    def __init__(self, maxsize: int = -1) -> None:
+        """
+        按优先级分道, 同一优先级内按 `fairness_key` 轮询出队的队列
+
+        - 不同优先级之间严格按优先级出队, 高优先级有任务时不会取低优先级任务
+        - 同一优先级内, 每个 `fairness_key` 各自 FIFO, key 之间轮流各取一个,
+          避免某个 key 的大量任务阻塞其他 key
+
+        Args:
+            maxsize (int, optional): 最大任务数, `<= 0` 代表不限制. Defaults to -1.
+
+        """
+        self._maxsize = maxsize
+        self._size = 0
+        # priority -> {fairness_key -> tasks}, dict 保持插入顺序, 用于轮询
+        self._lanes: dict[int, dict[Hashable, deque]] = {}
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def full(self) -> bool:
+        return 0 < self._maxsize <= self._size
+
+    def put_nowait(
+        self,
+        item: Any,
+        priority: int = TaskPriority.normal,
+        fairness_key: Hashable = None,
+    ) -> None:
+        if self.full():
+            raise asyncio.QueueFull
+
+        lane = self._lanes.setdefault(priority, {})
+        lane.setdefault(fairness_key, deque()).append(item)
+        self._size += 1
+        self._not_empty.set()
+
+    async def put(
+        self,
+        item: Any,
+        priority: int = TaskPriority.normal,
+        fairness_key: Hashable = None,
+    ) -> None:
+        """队列已满时等待, 直到有空位"""
+        while self.full():
+            self._not_full.clear()
+            await self._not_full.wait()
+        self.put_nowait(item, priority=priority, fairness_key=fairness_key)
+
+    def get_nowait(self) -> Any:
+        if self._size == 0:
+            raise asyncio.QueueEmpty
+
+        priority = min(self._lanes)
+        lane = self._lanes[priority]
+
+        # 取出第一个 key 的任务后, 把该 key 移到末尾
+        fairness_key = next(iter(lane))
+        items = lane.pop(fairness_key)
+        item = items.popleft()
+        if items:
+            lane[fairness_key] = items
+        if not lane:
+            self._lanes.pop(priority)
+
+        self._size -= 1
+        self._not_full.set()
+        return item
+
+    async def get(self) -> Any:
+        while self._size == 0:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self.get_nowait()
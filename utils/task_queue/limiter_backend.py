@@ -0,0 +1,24 @@
+import asyncio
+from abc import ABC, abstractmethod
+
+
+class LimiterBackend(ABC):
+    """限流后端, `TaskQueue` 每启动一个任务前调用 `acquire()`"""
+
+    @abstractmethod
+    async def try_acquire(self, tokens: int = 1) -> float:
+        """
+        尝试取出令牌
+
+        Returns:
+            float: 取到令牌返回 0, 否则返回还需等待的秒数
+
+        """
+
+    async def acquire(self, tokens: int = 1) -> None:
+        """等待直到取到令牌"""
+        while True:
+            wait_seconds = await self.try_acquire(tokens)
+            if wait_seconds == 0:
+                return
+            await asyncio.sleep(wait_seconds)
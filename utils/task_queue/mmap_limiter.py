@@ -0,0 +1,69 @@
+import fcntl
+import mmap
+import os
+import struct
+import time
+
+from .limiter_backend import LimiterBackend
+
+# tokens (double), updated_at (double)
+_STATE_FORMAT = "dd"
+_STATE_SIZE = struct.calcsize(_STATE_FORMAT)
+
+
+class MmapTokenBucket(LimiterBackend):
+    def __init__(self, path: str, rate: float, burst: int = 1) -> None:
+        """
+        基于共享内存文件的令牌桶, 同一台机器上的多个进程共享同一个限流额度
+
+        状态文件通过 `flock` 加锁读写, 时间使用墙上时间 `time.time()`,
+        `time.monotonic()` 在重启后归零, 不能持久化到文件中.
+        时钟回拨时不补充令牌
+
+        Args:
+            path (str): 状态文件路径, 不存在时自动创建
+            rate (float): 持续速率, 每秒补充的令牌数
+            burst (int, optional): 桶容量. Defaults to 1.
+
+        """
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < _STATE_SIZE:
+                os.ftruncate(fd, _STATE_SIZE)
+            self._mmap = mmap.mmap(fd, _STATE_SIZE)
+        finally:
+            os.close(fd)
+        self._lock_file = open(path, "rb")
+
+    def take(self, tokens: int = 1) -> float:
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            stored_tokens, updated_at = struct.unpack_from(
+                _STATE_FORMAT, self._mmap
+            )
+            now = time.time()
+            # 新建的文件全为 0, 经过的时间足够长, 会直接填满令牌桶
+            elapsed = max(0.0, now - updated_at)
+            current = min(self.burst, stored_tokens + elapsed * self.rate)
+
+            wait_seconds = 0.0
+            if current >= tokens:
+                current -= tokens
+            else:
+                wait_seconds = (tokens - current) / self.rate
+
+            struct.pack_into(_STATE_FORMAT, self._mmap, 0, current, now)
+            return wait_seconds
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    async def try_acquire(self, tokens: int = 1) -> float:
+        return self.take(tokens)
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._lock_file.close()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from .limiter_backend import LimiterBackend
+from .token_bucket import TokenBucket
+
+if TYPE_CHECKING:
+    from utils.redis_utils import AsyncRedisClient
+
+logger = logging.getLogger(__name__)
+
+# 令牌桶状态保存在 hash 中, 使用 redis 服务端时间, 避免各节点时钟不一致
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+
+local redis_time = redis.call("TIME")
+local now = tonumber(redis_time[1]) + tonumber(redis_time[2]) / 1000000
+
+local state = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucket(LimiterBackend):
+    def __init__(
+        self,
+        client: AsyncRedisClient,
+        key: str,
+        rate: float,
+        burst: int = 1,
+    ) -> None:
+        """
+        基于 redis 的令牌桶, 多进程/多节点共享同一个限流额度
+
+        redis 不可用时退化为进程内令牌桶, 保证请求不会因为限流后端故障而中断
+
+        Args:
+            client (AsyncRedisClient): redis 客户端, 测试时可传入 fake 实现
+            key (str): 令牌桶状态的 key
+            rate (float): 持续速率, 每秒补充的令牌数
+            burst (int, optional): 桶容量. Defaults to 1.
+
+        """
+        self._client = client
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self._fallback = TokenBucket(rate=rate, burst=burst)
+
+    async def try_acquire(self, tokens: int = 1) -> float:
+        try:
+            res = await self._client.eval(
+                _TOKEN_BUCKET_SCRIPT,
+                keys=[self.key],
+                args=[self.rate, self.burst, tokens],
+            )
+        except Exception as e:
+            logger.warning(
+                f"redis limiter unavailable, use local limiter. "
+                f"error: {type(e)}, {e}"
+            )
+            return self._fallback.take(tokens)
+
+        return float(res)
@@ -1,68 +1,296 @@
 import asyncio
 import logging
+import time
 from asyncio import Event, Future, Task
-from asyncio.queues import Queue
-from collections.abc import Awaitable
+from collections import deque
+from collections.abc import Awaitable, Hashable
 from dataclasses import dataclass
 
+from .exceptions import TaskDeadlineExceededError, TaskQueueFullError
+from .fair_queue import FairQueue, TaskPriority
+from .limiter_backend import LimiterBackend
+from .token_bucket import TokenBucket
+
 logger = logging.getLogger(__name__)
 
 
 @dataclass
 class _CustomTask:
-    def __init__(self, coro: Awaitable, future: Future) -> None:
+    def __init__(
+        self,
+        coro: Awaitable,
+        future: Future,
+        deadline: float | None = None,
+    ) -> None:
         self.coro = coro
         self.future = future
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+
+    def close(self) -> None:
+        """不再执行任务, 关闭协程, 避免 never awaited 警告"""
+        if asyncio.iscoroutine(self.coro):
+            self.coro.close()
+
+    def discard(self, exc: Exception) -> None:
+        """不执行任务, 直接以 `exc` 结束"""
+        self.close()
+        if not self.future.done():
+            self.future.set_exception(exc)
 
 
 class TaskQueue:
-    def __init__(self, interval: float, size: int = -1) -> None:
-        self._task_queue = Queue(size)
+    def __init__(
+        self,
+        interval: float = 0,
+        size: int = -1,
+        rate: float | None = None,
+        burst: int = 1,
+        max_in_flight: int = -1,
+        limiter: LimiterBackend | None = None,
+    ) -> None:
+        """
+        按固定间隔或令牌桶调度执行任务的队列
+
+        Args:
+            interval (float, optional): 固定间隔模式下, 两个任务开始执行的间隔秒数.
+                设置了 `rate` 时忽略. Defaults to 0.
+            size (int, optional): 队列长度, `-1` 代表不限制.
+                队列满时 `add_task` 抛出 `TaskQueueFullError`,
+                `add_task_wait` 等待空位. Defaults to -1.
+            rate (float | None, optional): 令牌桶模式的持续速率 (任务数/秒),
+                为 None 时使用固定间隔模式, 不大于 0 时不限速. Defaults to None.
+            burst (int, optional): 令牌桶容量, 空闲后允许突发开始的任务数.
+                Defaults to 1.
+            max_in_flight (int, optional): 同时运行的最大任务数,
+                `-1` 代表不限制. Defaults to -1.
+            limiter (LimiterBackend | None, optional): 自定义限流后端
+                (如跨进程共享的令牌桶), 设置后忽略 `rate` 和 `burst`.
+                Defaults to None.
+
+        """
+        self._task_queue = FairQueue(size)
         self._interval = interval
+        if rate is not None:
+            self._interval = 0
+            if limiter is None and rate > 0:
+                limiter = TokenBucket(rate=rate, burst=burst)
+        self.limiter = limiter
         self.running = False
 
         self._finish_task_event = Event()
+        self._slot_released_event = Event()
+        self.max_in_flight = max_in_flight
         self._running_task_num = 0
         self._running_task = set()
 
-    def add_task(self, coro: Awaitable) -> Future:
-        future = Future()
-        new_task = _CustomTask(
-            coro=coro,
-            future=future,
+        self._submitted_num = 0
+        self._rejected_num = 0
+        self._expired_num = 0
+        self._wait_times: deque[float] = deque(maxlen=1024)
+
+    @property
+    def max_in_flight(self) -> int:
+        """同时运行的最大任务数, `-1` 代表不限制"""
+        return self._max_in_flight
+
+    @max_in_flight.setter
+    def max_in_flight(self, value: int) -> None:
+        # 唤醒等待空位的调度, 上限增大时立即使用新的空位
+        self._max_in_flight = value
+        self._slot_released_event.set()
+
+    def add_task(
+        self,
+        coro: Awaitable,
+        priority: int = TaskPriority.normal,
+        fairness_key: Hashable = None,
+        deadline: float | None = None,
+    ) -> Future:
+        """
+        添加任务, 队列已满时立即抛出 `TaskQueueFullError`
+
+        Args:
+            coro (Awaitable): 要执行的任务
+            priority (int, optional): 优先级, 值越小越先执行.
+                Defaults to TaskPriority.normal.
+            fairness_key (Hashable, optional): 同一优先级内按该 key 轮流执行,
+                如 collection 名. Defaults to None.
+            deadline (float | None, optional): 截止时间 (`time.monotonic()`),
+                开始执行前已超过截止时间的任务会被丢弃,
+                future 抛出 `TaskDeadlineExceededError`. Defaults to None.
+
+        Returns:
+            Future: 任务结果
+
+        """
+        new_task = _CustomTask(coro=coro, future=Future(), deadline=deadline)
+        try:
+            self._task_queue.put_nowait(
+                new_task,
+                priority=priority,
+                fairness_key=fairness_key,
+            )
+        except asyncio.QueueFull:
+            self._rejected_num += 1
+            new_task.close()
+            raise TaskQueueFullError(
+                f"task queue is full ({self._task_queue.qsize()})"
+            )
+
+        self._submitted_num += 1
+        return new_task.future
+
+    async def add_task_wait(
+        self,
+        coro: Awaitable,
+        priority: int = TaskPriority.normal,
+        fairness_key: Hashable = None,
+        deadline: float | None = None,
+        timeout: float | None = None,
+    ) -> Future:
+        """
+        添加任务, 队列已满时等待空位 (背压)
+
+        Args:
+            timeout (float | None, optional): 等待空位的最长秒数,
+                超时抛出 `TaskQueueFullError`, None 代表一直等待,
+                不大于 0 时不等待, 同 `add_task()`. Defaults to None.
+
+            其他参数同 `add_task()`
+
+        Returns:
+            Future: 任务结果
+
+        """
+        if timeout is not None and timeout <= 0:
+            # wait_for(timeout=0) 会在放入前取消, 即使队列有空位
+            return self.add_task(
+                coro,
+                priority=priority,
+                fairness_key=fairness_key,
+                deadline=deadline,
+            )
+
+        new_task = _CustomTask(coro=coro, future=Future(), deadline=deadline)
+        put = self._task_queue.put(
+            new_task,
+            priority=priority,
+            fairness_key=fairness_key,
         )
-        self._task_queue.put_nowait(new_task)
+        try:
+            await asyncio.wait_for(put, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._rejected_num += 1
+            new_task.close()
+            raise TaskQueueFullError(
+                f"task queue is full ({self._task_queue.qsize()}), "
+                f"wait {timeout} seconds"
+            )
 
-        return future
+        self._submitted_num += 1
+        return new_task.future
 
     def schedule(self) -> Task:
         self.running = True
         return asyncio.create_task(self._schedule())
 
+    async def _wait_for_slot(self) -> None:
+        """等待正在运行的任务数低于 `max_in_flight`"""
+        while 0 < self.max_in_flight <= self._running_task_num:
+            self._slot_released_event.clear()
+            await self._slot_released_event.wait()
+
+    def _drop_if_stale(self, task: _CustomTask) -> bool:
+        """排队期间 future 已被取消, 或已超过截止时间时丢弃任务"""
+        if task.future.cancelled():
+            task.close()
+            return True
+        if task.deadline is not None and time.monotonic() > task.deadline:
+            self._expired_num += 1
+            task.discard(TaskDeadlineExceededError())
+            return True
+        return False
+
     async def _schedule(self) -> None:
         while True:
             task: _CustomTask = await self._task_queue.get()
 
+            await self._wait_for_slot()
+            if self._drop_if_stale(task):
+                continue
+            if self.limiter is not None:
+                await self.limiter.acquire()
+                # 等待令牌期间可能已被取消或超过截止时间
+                if self._drop_if_stale(task):
+                    continue
+
+            self._wait_times.append(time.monotonic() - task.enqueued_at)
             self._running_task_num += 1
             asyncio_task = asyncio.create_task(self._execute_task(task))
             self._running_task.add(asyncio_task)
-            asyncio_task.add_done_callback(self._running_task.discard)
+            asyncio_task.add_done_callback(
+                lambda t, task=task: self._on_task_done(t, task)
+            )
+            # 取消 future 时同时取消正在执行的任务
+            task.future.add_done_callback(
+                lambda f, t=asyncio_task: t.cancel() if f.cancelled() else None
+            )
 
-            await asyncio.sleep(self._interval)
+            if self.limiter is None:
+                await asyncio.sleep(self._interval)
 
     async def _execute_task(self, task: _CustomTask):
         try:
             res = await task.coro
-            task.future.set_result(res)
+            if not task.future.done():
+                task.future.set_result(res)
         except Exception as e:
             logger.error(
                 f"got a error: {type(e)}, {e}\ntask: {task.coro.__qualname__}\n"
             )
-            task.future.set_exception(e)
+            if not task.future.done():
+                task.future.set_exception(e)
 
+    def _on_task_done(self, asyncio_task: Task, task: _CustomTask) -> None:
+        # 在回调中计数, 任务开始前被取消时也能正确释放
+        if asyncio_task.cancelled():
+            task.close()
+        self._running_task.discard(asyncio_task)
         self._running_task_num -= 1
+        self._slot_released_event.set()
         self._finish_task_event.set()
 
+    def stats(self) -> dict:
+        """队列深度, 运行中任务数, 拒绝/过期任务数, 以及最近任务的排队等待时间"""
+        wait_times = sorted(self._wait_times)
+        avg_wait_time = (
+            sum(wait_times) / len(wait_times) if wait_times else None
+        )
+
+        def percentile(p: float) -> float | None:
+            if not wait_times:
+                return None
+            return wait_times[
+                min(len(wait_times) - 1, int(len(wait_times) * p))
+            ]
+
+        return {
+            "queued": self._task_queue.qsize(),
+            "running": self._running_task_num,
+            "max_in_flight": self.max_in_flight,
+            "submitted": self._submitted_num,
+            "rejected": self._rejected_num,
+            "expired": self._expired_num,
+            "wait_time": {
+                "avg": avg_wait_time,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": wait_times[-1] if wait_times else None,
+            },
+        }
+
     async def wait_until_finish(self):
         while True:
             await self._finish_task_event.wait()
@@ -0,0 +1,53 @@
+import time
+
+from .limiter_backend import LimiterBackend
+
+
+class TokenBucket(LimiterBackend):
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """
+        令牌桶, 以 `rate` 个/秒 的速度补充令牌, 最多积攒 `burst` 个
+
+        Args:
+            rate (float): 持续速率, 每秒补充的令牌数
+            burst (int, optional): 桶容量, 即允许的最大突发数. Defaults to 1.
+
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must > 0 ({rate})")
+        if burst < 1:
+            raise ValueError(f"burst must >= 1 ({burst})")
+
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    @property
+    def tokens(self) -> float:
+        """当前可用令牌数"""
+        self._refill()
+        return self._tokens
+
+    def take(self, tokens: int = 1) -> float:
+        """
+        尝试取出令牌 (同步版本)
+
+        Returns:
+            float: 取到令牌返回 0, 否则返回还需等待的秒数
+
+        """
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0
+        return (tokens - self._tokens) / self.rate
+
+    async def try_acquire(self, tokens: int = 1) -> float:
+        return self.take(tokens)
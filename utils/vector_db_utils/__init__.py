@@ -1,17 +1,37 @@
+from .exceptions import (
+    VectorDBCircuitOpenError,
+    VectorDBError,
+    VectorDBRequestError,
+)
+from .record_batch import RecordBatch
 from .schemas import (
     Collection,
     CollectionField,
     Filter,
+    IngestProgress,
     QueryParam,
     RecordPropertyABC,
 )
-from .vector_db_utils import VectorDBOperator
+from .vector_db_utils import (
+    VectorDBOperator,
+    close_vector_db,
+    get_limiter_metrics,
+    init_vector_db,
+)
 
 __all__ = [
+    "VectorDBError",
+    "VectorDBRequestError",
+    "VectorDBCircuitOpenError",
     "VectorDBOperator",
     "QueryParam",
     "RecordPropertyABC",
+    "RecordBatch",
     "Collection",
     "CollectionField",
     "Filter",
+    "IngestProgress",
+    "close_vector_db",
+    "get_limiter_metrics",
+    "init_vector_db",
 ]
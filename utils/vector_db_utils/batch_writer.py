@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from collections.abc import Callable, Coroutine
+from typing import Any, Literal
+
+from .schemas import RecordPropertyABC
+
+logger = logging.getLogger(__name__)
+
+RecordType = Literal["text", "text_json", "text_html"]
+WriteFunc = Callable[
+    [RecordType, list[RecordPropertyABC], str],
+    Coroutine[Any, Any, list[bool]],
+]
+
+
+class _PendingBatch:
+    def __init__(self) -> None:
+        self.records: list[RecordPropertyABC] = []
+        self.doc_ids: set[str] = set()
+        # (future, start, end), 调用者的记录在 records 中的位置
+        self.waiters: list[tuple[asyncio.Future, int, int]] = []
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class BatchWriter:
+    def __init__(
+        self,
+        write: WriteFunc,
+        max_batch_size: int = 100,
+        max_linger: float = 0.05,
+    ) -> None:
+        """
+        跨请求合并写入, 按 (collection_name, type_) 收集各调用者的记录,
+        达到 `max_batch_size` 条或等待超过 `max_linger` 秒时一次写入.
+        每个实例只负责一种写操作, 添加和更新使用不同的实例, 批次互不混合
+
+        Args:
+            write (WriteFunc): 实际的写入函数, 如 `VectorDBOperator.add_records`
+                或 `VectorDBOperator.update_record`,
+                参数为 (type_, records, collection_name), 返回每条记录是否成功
+            max_batch_size (int, optional): 每批最大记录数. Defaults to 100.
+            max_linger (float, optional): 批次最长等待秒数. Defaults to 0.05.
+
+        """
+        self._write = write
+        self.max_batch_size = max_batch_size
+        self.max_linger = max_linger
+        self._batches: dict[tuple[str, RecordType], _PendingBatch] = {}
+        self._flushing: set[asyncio.Task] = set()
+
+    async def submit(
+        self,
+        type_: RecordType,
+        records: list[RecordPropertyABC],
+        collection_name: str,
+    ) -> list[bool]:
+        """
+        提交记录, 等待记录所在的批次写入完成
+
+        Returns:
+            list[bool]: 与 `records` 一一对应, 是否写入成功
+
+        """
+        key = (collection_name, type_)
+        futures: list[asyncio.Future] = []
+
+        start = 0
+        while start < len(records):
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._new_batch(key)
+
+            end = start
+            while (
+                end < len(records)
+                and len(batch.records) < self.max_batch_size
+                # 同一批次内 doc_id 不能重复, 重复时放到下一批
+                and records[end].doc_id not in batch.doc_ids
+            ):
+                batch.doc_ids.add(records[end].doc_id)
+                batch.records.append(records[end])
+                end += 1
+
+            if end > start:
+                future = asyncio.get_running_loop().create_future()
+                batch_end = len(batch.records)
+                batch.waiters.append(
+                    (future, batch_end - (end - start), batch_end)
+                )
+                futures.append(future)
+
+            if end == start or len(batch.records) >= self.max_batch_size:
+                self._flush(key)
+            start = end
+
+        results: list[bool] = []
+        for future in futures:
+            results.extend(await future)
+        return results
+
+    def _new_batch(self, key: tuple[str, RecordType]) -> _PendingBatch:
+        batch = _PendingBatch()
+        batch.timer = asyncio.get_running_loop().call_later(
+            self.max_linger, self._flush, key
+        )
+        self._batches[key] = batch
+        return batch
+
+    def _flush(self, key: tuple[str, RecordType]) -> None:
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        if not batch.records:
+            return
+
+        task = asyncio.create_task(self._write_batch(key, batch))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _write_batch(
+        self,
+        key: tuple[str, RecordType],
+        batch: _PendingBatch,
+    ) -> None:
+        collection_name, type_ = key
+        logger.debug(
+            f"flush {len(batch.records)} records to {collection_name}, "
+            f"callers: {len(batch.waiters)}"
+        )
+        try:
+            flags = await self._write(type_, batch.records, collection_name)
+        except Exception as e:
+            for future, _, _ in batch.waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except BaseException:
+            # 写入被取消 (如关闭时), 同时取消等待的调用者, 避免一直等待
+            for future, _, _ in batch.waiters:
+                future.cancel()
+            raise
+
+        for future, start, end in batch.waiters:
+            if not future.done():
+                future.set_result(flags[start:end])
+
+    async def flush(self) -> None:
+        """立即写入所有等待中的批次, 并等待写入完成"""
+        for key in list(self._batches):
+            self._flush(key)
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import math
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils.redis_utils import AsyncRedisClient
+
+logger = logging.getLogger(__name__)
+
+
+async def _aiter(items: Iterable[str]) -> AsyncIterator[str]:
+    for item in items:
+        yield item
+
+
+class DocIdIndex(ABC):
+    def __init__(self) -> None:
+        """
+        按 collection 记录已写入的 doc_id, `add_records` 据此在发送前
+        把记录分为创建和更新, 省去 create -> duplicate_ids -> update 的往返
+
+        只用于预测, 预测错误时退回原来的流程:
+        - 误判为已存在: update 返回 failed_ids, 这部分改为 create
+        - 误判为不存在: create 返回 duplicate_ids, 这部分改为 update
+        """
+        self.predicted_exists = 0
+        self.predicted_new = 0
+        self.false_positives = 0
+        self.errors = 0
+
+    @abstractmethod
+    async def contains_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> list[bool]: ...
+
+    @abstractmethod
+    async def add_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None: ...
+
+    @abstractmethod
+    async def remove_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None: ...
+
+    @abstractmethod
+    async def clear(self, collection_name: str) -> None: ...
+
+    async def lookup(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> list[bool]:
+        """预测 `doc_ids` 是否已存在, 索引不可用时全部视为不存在"""
+        try:
+            res = await self.contains_many(collection_name, doc_ids)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"lookup doc id index failed: {type(e)}, {e}")
+            return [False] * len(doc_ids)
+
+        exists = sum(res)
+        self.predicted_exists += exists
+        self.predicted_new += len(res) - exists
+        return res
+
+    async def record(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None:
+        """记录写入成功的 doc_id"""
+        if not doc_ids:
+            return
+        try:
+            await self.add_many(collection_name, doc_ids)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"update doc id index failed: {type(e)}, {e}")
+
+    async def forget(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str] | None = None,
+    ) -> None:
+        """删除记录后调用, `doc_ids` 为 None 时清空整个 collection"""
+        try:
+            if doc_ids is None:
+                await self.clear(collection_name)
+            elif doc_ids:
+                await self.remove_many(collection_name, doc_ids)
+        except Exception as e:
+            self.errors += 1
+            logger.error(
+                f"delete doc id index of {collection_name} failed: "
+                f"{type(e)}, {e}"
+            )
+
+    async def rebuild(
+        self,
+        collection_name: str,
+        doc_ids: Iterable[str] | AsyncIterable[str],
+        chunk_size: int = 1000,
+    ) -> int:
+        """
+        用 collection 中实际存在的 doc_id 重建索引,
+        `doc_ids` 可以是异步迭代器, 边读边写入
+
+        Returns:
+            int: 写入索引的 doc_id 数
+        """
+        await self.clear(collection_name)
+        if not isinstance(doc_ids, AsyncIterable):
+            doc_ids = _aiter(doc_ids)
+
+        count = 0
+        chunk: list[str] = []
+        async for doc_id in doc_ids:
+            chunk.append(doc_id)
+            if len(chunk) >= chunk_size:
+                await self.add_many(collection_name, chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            await self.add_many(collection_name, chunk)
+            count += len(chunk)
+        return count
+
+    def stats(self) -> dict:
+        return {
+            "predicted_exists": self.predicted_exists,
+            "predicted_new": self.predicted_new,
+            "false_positives": self.false_positives,
+            "errors": self.errors,
+        }
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        """
+        布隆过滤器, 只有误判为存在, 没有误判为不存在, 不支持删除
+
+        Args:
+            capacity (int): 预计元素数, 超过后误判率上升
+            error_rate (float, optional): 达到 `capacity` 时的误判率.
+                Defaults to 0.01.
+
+        """
+        self.size = max(
+            8, int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_num = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_num)]
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(item)
+        )
+
+
+class BloomDocIdIndex(DocIdIndex):
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        """
+        进程内的布隆过滤器索引, 每个 collection 一个.
+        删除记录不会从过滤器中移除, 只会增加误判;
+        进程重启后为空, 需要 `rebuild` 或随写入逐渐补全
+
+        Args:
+            capacity (int, optional): 每个 collection 预计的记录数.
+                Defaults to 1_000_000.
+            error_rate (float, optional): 误判率. Defaults to 0.01.
+
+        """
+        super().__init__()
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filters: dict[str, BloomFilter] = {}
+
+    def _get_filter(self, collection_name: str) -> BloomFilter:
+        bloom = self._filters.get(collection_name)
+        if bloom is None:
+            bloom = BloomFilter(self.capacity, self.error_rate)
+            self._filters[collection_name] = bloom
+        return bloom
+
+    async def contains_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> list[bool]:
+        bloom = self._filters.get(collection_name)
+        if bloom is None:
+            return [False] * len(doc_ids)
+        return [doc_id in bloom for doc_id in doc_ids]
+
+    async def add_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None:
+        bloom = self._get_filter(collection_name)
+        for doc_id in doc_ids:
+            bloom.add(doc_id)
+
+    async def remove_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None:
+        return
+
+    async def clear(self, collection_name: str) -> None:
+        self._filters.pop(collection_name, None)
+
+
+class RedisDocIdIndex(DocIdIndex):
+    def __init__(self, redis_client: AsyncRedisClient) -> None:
+        """每个 collection 一个 redis set, 所有 worker 共享, 删除时同步移除"""
+        super().__init__()
+        self._redis = redis_client
+
+    @staticmethod
+    def _key(collection_name: str) -> str:
+        return f"vdb_doc_ids:{collection_name}"
+
+    async def contains_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> list[bool]:
+        if not doc_ids:
+            return []
+        res = await self._redis.smismember(self._key(collection_name), doc_ids)
+        return [bool(item) for item in res]
+
+    async def add_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None:
+        await self._redis.sadd(self._key(collection_name), *doc_ids)
+
+    async def remove_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None:
+        await self._redis.srem(self._key(collection_name), *doc_ids)
+
+    async def clear(self, collection_name: str) -> None:
+        await self._redis.delete(self._key(collection_name))
@@ -3,5 +3,20 @@ class VectorDBError(Exception):
     detail: str
 
     def __init__(self, detail, code=0):
+        super().__init__(detail)
         self.code = code
         self.detail = detail
+
+
+class VectorDBRequestError(VectorDBError):
+    """向量数据库返回非 200 响应, `code` 为 http 状态码"""
+
+    retry_after: float | None
+
+    def __init__(self, detail, code=0, retry_after: float | None = None):
+        super().__init__(detail, code)
+        self.retry_after = retry_after
+
+
+class VectorDBCircuitOpenError(VectorDBError):
+    """熔断器打开, 请求未发送"""
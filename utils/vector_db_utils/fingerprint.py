@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from utils.redis_utils import AsyncRedisClient
+
+logger = logging.getLogger(__name__)
+
+
+class FingerprintStore(ABC):
+    def __init__(self) -> None:
+        """
+        按 collection 保存 `doc_id -> 内容哈希`, 重复写入时跳过内容未变的记录
+
+        存储不可用时不跳过任何记录, 只会多发请求, 不会漏写
+        """
+        self.checked = 0
+        self.skipped = 0
+        self.errors = 0
+
+    @abstractmethod
+    async def get_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> list[str | None]:
+        """返回与 `doc_ids` 一一对应的哈希, 不存在时为 None"""
+
+    @abstractmethod
+    async def set_many(
+        self,
+        collection_name: str,
+        fingerprints: dict[str, str],
+    ) -> None: ...
+
+    @abstractmethod
+    async def delete_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None: ...
+
+    @abstractmethod
+    async def clear(self, collection_name: str) -> None: ...
+
+    async def filter_changed(
+        self,
+        collection_name: str,
+        fingerprints: dict[str, str],
+    ) -> dict[str, str]:
+        """
+        过滤掉内容未变的记录
+
+        Args:
+            collection_name (str):
+            fingerprints (dict[str, str]): 要写入的记录的 `doc_id -> 哈希`
+
+        Returns:
+            dict[str, str]: 需要写入的记录的哈希, 写入成功后传给 `commit`
+
+        """
+        self.checked += len(fingerprints)
+        try:
+            stored = await self.get_many(collection_name, list(fingerprints))
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"get record fingerprints failed: {type(e)}, {e}")
+            return fingerprints
+
+        changed = {
+            doc_id: fingerprint
+            for (doc_id, fingerprint), old in zip(
+                fingerprints.items(), stored, strict=True
+            )
+            if old != fingerprint
+        }
+        self.skipped += len(fingerprints) - len(changed)
+        return changed
+
+    async def commit(
+        self,
+        collection_name: str,
+        fingerprints: dict[str, str],
+    ) -> None:
+        """保存写入成功的记录的哈希"""
+        if not fingerprints:
+            return
+        try:
+            await self.set_many(collection_name, fingerprints)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"set record fingerprints failed: {type(e)}, {e}")
+
+    async def forget(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str] | None = None,
+    ) -> None:
+        """删除记录后调用, `doc_ids` 为 None 时清空整个 collection"""
+        try:
+            if doc_ids is None:
+                await self.clear(collection_name)
+            elif doc_ids:
+                await self.delete_many(collection_name, doc_ids)
+        except Exception as e:
+            self.errors += 1
+            logger.error(
+                f"delete record fingerprints of {collection_name} failed: "
+                f"{type(e)}, {e}"
+            )
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
+
+
+class RedisFingerprintStore(FingerprintStore):
+    def __init__(self, redis_client: AsyncRedisClient) -> None:
+        """每个 collection 一个 redis hash, field 为 doc_id, value 为哈希"""
+        super().__init__()
+        self._redis = redis_client
+
+    @staticmethod
+    def _key(collection_name: str) -> str:
+        return f"vdb_fingerprint:{collection_name}"
+
+    async def get_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> list[str | None]:
+        if not doc_ids:
+            return []
+        res = await self._redis.hmget(self._key(collection_name), doc_ids)
+        return [item.decode() if item is not None else None for item in res]
+
+    async def set_many(
+        self,
+        collection_name: str,
+        fingerprints: dict[str, str],
+    ) -> None:
+        await self._redis.hset(self._key(collection_name), mapping=fingerprints)
+
+    async def delete_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None:
+        await self._redis.hdel(self._key(collection_name), *doc_ids)
+
+    async def clear(self, collection_name: str) -> None:
+        await self._redis.delete(self._key(collection_name))
+
+
+class SQLFingerprintStore(FingerprintStore):
+    def __init__(self) -> None:
+        """
+        保存在 postgres 的 `vector_db_fingerprints` 表中,
+        使用同步的 `db`, 在线程池中执行
+        """
+        super().__init__()
+
+    @staticmethod
+    def _get_many(collection_name: str, doc_ids: list[str]) -> list[str | None]:
+        from sqlmodel import col, select
+
+        from db import db
+        from db.models import VectorDBFingerprint
+
+        with db.session_ctx() as session:
+            rows = session.exec(
+                select(VectorDBFingerprint).where(
+                    VectorDBFingerprint.collection_name == collection_name,
+                    col(VectorDBFingerprint.doc_id).in_(doc_ids),
+                )
+            ).all()
+        stored = {row.doc_id: row.fingerprint for row in rows}
+        return [stored.get(doc_id) for doc_id in doc_ids]
+
+    @staticmethod
+    def _set_many(collection_name: str, fingerprints: dict[str, str]) -> None:
+        from datetime import datetime
+
+        from sqlalchemy.dialects.postgresql import insert
+
+        from db import db
+        from db.models import VectorDBFingerprint
+
+        stmt = insert(VectorDBFingerprint).values(
+            [
+                {
+                    "collection_name": collection_name,
+                    "doc_id": doc_id,
+                    "fingerprint": fingerprint,
+                    "updated_at": datetime.now(),
+                }
+                for doc_id, fingerprint in fingerprints.items()
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["collection_name", "doc_id"],
+            set_={
+                "fingerprint": stmt.excluded.fingerprint,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        with db.session_ctx() as session:
+            session.execute(stmt)
+            session.commit()
+
+    @staticmethod
+    def _delete(collection_name: str, doc_ids: list[str] | None) -> None:
+        from sqlmodel import col, delete
+
+        from db import db
+        from db.models import VectorDBFingerprint
+
+        stmt = delete(VectorDBFingerprint).where(
+            col(VectorDBFingerprint.collection_name) == collection_name
+        )
+        if doc_ids is not None:
+            stmt = stmt.where(col(VectorDBFingerprint.doc_id).in_(doc_ids))
+        with db.session_ctx() as session:
+            session.execute(stmt)
+            session.commit()
+
+    async def get_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> list[str | None]:
+        if not doc_ids:
+            return []
+        return await asyncio.to_thread(
+            self._get_many, collection_name, list(doc_ids)
+        )
+
+    async def set_many(
+        self,
+        collection_name: str,
+        fingerprints: dict[str, str],
+    ) -> None:
+        await asyncio.to_thread(self._set_many, collection_name, fingerprints)
+
+    async def delete_many(
+        self,
+        collection_name: str,
+        doc_ids: Sequence[str],
+    ) -> None:
+        await asyncio.to_thread(self._delete, collection_name, list(doc_ids))
+
+    async def clear(self, collection_name: str) -> None:
+        await asyncio.to_thread(self._delete, collection_name, None)
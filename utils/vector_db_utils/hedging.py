@@ -0,0 +1,61 @@
+from collections import deque
+
+
+class LatencyTracker:
+    def __init__(self, window_size: int = 512, min_samples: int = 20) -> None:
+        """
+        记录最近 `window_size` 次请求的延迟, 用于计算对冲请求的等待时间
+
+        Args:
+            window_size (int, optional): 保留的延迟样本数. Defaults to 512.
+            min_samples (int, optional): 样本数少于该值时不计算分位数.
+                Defaults to 20.
+
+        """
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=window_size)
+
+    def record(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def percentile(self, p: float) -> float | None:
+        """延迟的 `p` 分位数 (0 < p < 1), 样本不足时返回 None"""
+        if len(self._latencies) < self.min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+
+class HedgeBudget:
+    def __init__(self, ratio: float = 0.05, max_tokens: float = 10) -> None:
+        """
+        对冲请求的额度, 每个请求增加 `ratio` 个令牌, 每次对冲消耗一个令牌,
+        对冲请求数最多约为总请求数的 `ratio` 倍
+
+        Args:
+            ratio (float, optional): 对冲请求占总请求的最大比例. Defaults to 0.05.
+            max_tokens (float, optional): 最多积攒的令牌数. Defaults to 10.
+
+        """
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = 0.0
+        self.hedged = 0
+        self.hedge_won = 0
+
+    def deposit(self) -> None:
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        self.hedged += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "tokens": self._tokens,
+            "hedged": self.hedged,
+            "hedge_won": self.hedge_won,
+        }
@@ -0,0 +1,140 @@
+import asyncio
+import importlib.util
+import logging
+from typing import Any
+
+import httpx
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class VectorDBHttpClient:
+    def __init__(self) -> None:
+        """
+        向量数据库的 httpx 客户端, 由 app lifespan 管理生命周期
+
+        连接池大小, keepalive, HTTP/2 等通过 `VDB_*` 配置;
+        未调用 `startup()` 时, 第一次请求会按配置自动创建客户端
+
+        """
+        self._client: httpx.AsyncClient | None = None
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._total_requests = 0
+
+    @staticmethod
+    def _http2_enabled() -> bool:
+        if not config.VDB_HTTP2:
+            return False
+        if importlib.util.find_spec("h2") is None:
+            logger.warning("VDB_HTTP2 is set but `h2` is not installed")
+            return False
+        return True
+
+    def _create_client(
+        self,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=config.VDB_BASE_URL.strip("/"),
+            timeout=httpx.Timeout(
+                config.VDB_TIMEOUT_SECONDS,
+                pool=config.VDB_POOL_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=config.VDB_MAX_CONNECTIONS,
+                max_keepalive_connections=config.VDB_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.VDB_KEEPALIVE_EXPIRY,
+            ),
+            http2=self._http2_enabled(),
+            transport=transport,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    async def startup(
+        self,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        """
+        创建客户端并预热连接
+
+        Args:
+            transport (httpx.AsyncBaseTransport | None, optional):
+                自定义 transport, 如测试时使用 `httpx.ASGITransport`.
+                Defaults to None.
+
+        """
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = self._create_client(transport=transport)
+        await self.prewarm(config.VDB_PREWARM_CONNECTIONS)
+
+    async def prewarm(self, connections: int) -> None:
+        """
+        并发发送 `connections` 个请求建立连接 (TLS 握手), 响应内容忽略.
+        HTTP/2 下所有请求复用同一个连接, 只需要一个请求
+        """
+        if connections <= 0:
+            return
+        if self._http2_enabled():
+            connections = 1
+
+        async def ping():
+            try:
+                await self.client.head("/")
+            except httpx.HTTPError as e:
+                logger.warning(f"prewarm vector db failed: {type(e)}, {e}")
+
+        await asyncio.gather(*[ping() for _ in range(connections)])
+        logger.info(f"prewarm {connections} vector db connections")
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        **kw: Any,
+    ) -> httpx.Response:
+        """发送请求, `endpoint` 为相对 `VDB_BASE_URL` 的路径"""
+        self._in_flight += 1
+        self._total_requests += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            return await self.client.request(method, endpoint, **kw)
+        finally:
+            self._in_flight -= 1
+
+    def stats(self) -> dict:
+        """连接池使用情况, `saturation` 为进行中请求数 / 最大连接数"""
+        pool = getattr(
+            getattr(self._client, "_transport", None),
+            "_pool",
+            None,
+        )
+        connections = getattr(pool, "connections", None)
+        return {
+            "started": self._client is not None,
+            "http2": self._http2_enabled(),
+            "max_connections": config.VDB_MAX_CONNECTIONS,
+            "connections": len(connections)
+            if connections is not None
+            else None,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "total_requests": self._total_requests,
+            "saturation": self._in_flight / config.VDB_MAX_CONNECTIONS,
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+vector_db_http_client = VectorDBHttpClient()
@@ -0,0 +1,380 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import threading
+from collections.abc import Callable
+from typing import Any
+
+from .schemas import VectorDBStatusCode
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]|[a-zA-Z0-9_]+")
+_HTML_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+# BM25 参数
+_K1 = 1.2
+_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    """英文数字按单词切分, 中文按单字切分"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class HashingEmbedder:
+    def __init__(self, dim: int = 256) -> None:
+        """
+        基于特征哈希的词袋向量, 不需要模型, 仅用于本地测试和压测
+
+        Args:
+            dim (int, optional): 向量维度. Defaults to 256.
+
+        """
+        self.dim = dim
+
+    def _bucket(self, token: str) -> tuple[int, float]:
+        digest = hashlib.md5(token.encode()).digest()
+        idx = int.from_bytes(digest[:4], "little") % self.dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        return idx, sign
+
+    def __call__(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                idx, sign = self._bucket(token)
+                vectors[row, idx] += sign
+        return vectors
+
+
+def _match_filter(properties: dict, item: dict) -> bool:
+    value = properties.get(item["field_name"])
+    expected = item["value"]
+    if not isinstance(expected, list):
+        expected = [expected]
+    values = value if isinstance(value, list) else [value]
+
+    if item.get("operator", "equal") == "equal":
+        return all(v in values for v in expected)
+    return any(v in values for v in expected)
+
+
+class _LocalCollection:
+    def __init__(self, name: str, extra_fields: list[dict]) -> None:
+        self.name = name
+        self.extra_fields = extra_fields
+        self.docs: dict[str, dict] = {}
+        self.vectors: dict[str, np.ndarray] = {}
+        # 倒排索引: term -> {doc_id: 词频}
+        self.inverted_index: dict[str, dict[str, int]] = {}
+        self.doc_lengths: dict[str, int] = {}
+        self.doc_terms: dict[str, set[str]] = {}
+
+        # 查询时按需重建的向量矩阵
+        self._matrix: np.ndarray | None = None
+        self._matrix_ids: list[str] = []
+
+    def upsert(self, properties: dict, text: str, vector: np.ndarray) -> None:
+        doc_id = properties["doc_id"]
+        if doc_id in self.docs:
+            self.remove(doc_id)
+
+        norm = np.linalg.norm(vector)
+        self.docs[doc_id] = properties
+        self.vectors[doc_id] = vector / norm if norm > 0 else vector
+
+        tokens = tokenize(text)
+        self.doc_lengths[doc_id] = len(tokens)
+        self.doc_terms[doc_id] = set(tokens)
+        for token in tokens:
+            postings = self.inverted_index.setdefault(token, {})
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+        self._matrix = None
+
+    def remove(self, doc_id: str) -> None:
+        if self.docs.pop(doc_id, None) is None:
+            return
+        self.vectors.pop(doc_id)
+        self.doc_lengths.pop(doc_id)
+        for token in self.doc_terms.pop(doc_id):
+            postings = self.inverted_index.get(token)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                self.inverted_index.pop(token)
+        self._matrix = None
+
+    def filter_ids(self, filters: list[dict]) -> list[str]:
+        return [
+            doc_id
+            for doc_id, properties in self.docs.items()
+            if all(_match_filter(properties, item) for item in filters)
+        ]
+
+    def semantic_scores(self, query_vector: np.ndarray) -> dict[str, float]:
+        if self._matrix is None:
+            self._matrix_ids = list(self.vectors)
+            self._matrix = (
+                np.vstack([self.vectors[i] for i in self._matrix_ids])
+                if self._matrix_ids
+                else np.zeros((0, query_vector.shape[0]), dtype=np.float32)
+            )
+
+        norm = np.linalg.norm(query_vector)
+        if norm > 0:
+            query_vector = query_vector / norm
+        scores = self._matrix @ query_vector
+        return dict(zip(self._matrix_ids, scores.tolist(), strict=True))
+
+    def bm25_scores(self, query: str) -> dict[str, float]:
+        if not self.docs:
+            return {}
+
+        avg_length = sum(self.doc_lengths.values()) / len(self.docs) or 1
+        scores: dict[str, float] = {}
+        for token in set(tokenize(query)):
+            postings = self.inverted_index.get(token)
+            if not postings:
+                continue
+            doc_num = len(self.docs)
+            idf = math.log(
+                1 + (doc_num - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for doc_id, tf in postings.items():
+                length = self.doc_lengths[doc_id] / avg_length
+                weight = tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * length))
+                scores[doc_id] = scores.get(doc_id, 0) + idf * weight
+        return scores
+
+
+def _plain_text(properties: dict, type_: str = "text") -> str:
+    text = str(properties.get("text", ""))
+    if type_ == "text_html":
+        text = _HTML_TAG_PATTERN.sub(" ", text)
+    return text
+
+
+def _response(
+    code: VectorDBStatusCode = VectorDBStatusCode.success,
+    msg: str = "success",
+    data: Any = None,
+) -> dict:
+    res: dict = {"code": code.value, "msg": msg}
+    if data is not None:
+        res["data"] = data
+    return res
+
+
+class LocalVectorDB:
+    def __init__(
+        self,
+        embed: Callable[[list[str]], np.ndarray] | None = None,
+        embedding_dim: int = 256,
+    ) -> None:
+        """
+        进程内的向量数据库, 实现与远程向量数据库相同的接口和响应格式,
+        用于 CI, 压测, 以及不需要网络请求的小型热点 collection
+
+        - semantic_search: NumPy 向量化的暴力余弦相似度
+        - full_text_search: 倒排索引 + BM25
+        - hybrid_search: `alpha * semantic + (1 - alpha) * 归一化的 BM25`
+
+        向量化和打分在线程中执行, 不阻塞事件循环, 请求之间串行执行.
+        需要安装 numpy (`poetry install -E local`)
+
+        Args:
+            embed (Callable[[list[str]], np.ndarray] | None, optional):
+                文本向量化函数, 默认使用 `HashingEmbedder`. Defaults to None.
+            embedding_dim (int, optional): 默认向量化函数的维度. Defaults to 256.
+
+        """
+        if np is None:
+            raise ImportError("LocalVectorDB requires `numpy` installed")
+
+        self._embed = embed or HashingEmbedder(dim=embedding_dim)
+        self._collections: dict[str, _LocalCollection] = {}
+        self._lock = threading.Lock()
+        self._handlers: dict[str, Callable[[dict, Any], dict]] = {
+            "/collection/create": self._create_collection,
+            "/collection/delete": self._delete_collection,
+            "/documents/create": self._create_documents,
+            "/documents/update": self._update_documents,
+            "/documents/search": self._search_documents,
+            "/documents/delete": self._delete_documents,
+        }
+
+    async def request(
+        self,
+        method: str,
+        endpoint: str,
+        headers: dict,
+        json_body: Any,
+    ) -> dict:
+        """与 `_RequestLimiter.request_vector_db` 参数相同, 返回响应 json"""
+        handler = self._handlers.get(endpoint)
+        if handler is None:
+            return _response(
+                VectorDBStatusCode.data_error, f"unknown endpoint: {endpoint}"
+            )
+        return await asyncio.to_thread(self._call, handler, headers, json_body)
+
+    def _call(
+        self,
+        handler: Callable[[dict, Any], dict],
+        headers: dict,
+        json_body: Any,
+    ) -> dict:
+        with self._lock:
+            return handler(headers, json_body)
+
+    def _get_collection(self, headers: dict) -> _LocalCollection | None:
+        return self._collections.get(headers.get("collection-name", ""))
+
+    def _create_collection(self, headers: dict, json_body: dict) -> dict:
+        name = json_body["collection_name"]
+        if name in self._collections:
+            return _response(
+                VectorDBStatusCode.data_error, f"collection {name} exists"
+            )
+        self._collections[name] = _LocalCollection(
+            name=name,
+            extra_fields=json_body.get("extra_field_schemas", []),
+        )
+        return _response()
+
+    def _delete_collection(self, headers: dict, json_body: dict) -> dict:
+        if self._collections.pop(json_body["collection_name"], None) is None:
+            return _response(
+                VectorDBStatusCode.data_error, "collection not exists"
+            )
+        return _response()
+
+    def _upsert(
+        self,
+        collection: _LocalCollection,
+        type_: str,
+        items: list[dict],
+    ) -> None:
+        texts = [_plain_text(properties, type_) for properties in items]
+        vectors = self._embed(texts)
+        for properties, text, vector in zip(items, texts, vectors, strict=True):
+            collection.upsert(properties, text, vector)
+
+    def _create_documents(self, headers: dict, json_body: dict) -> dict:
+        collection = self._get_collection(headers)
+        if collection is None:
+            return _response(
+                VectorDBStatusCode.data_error, "collection not exists"
+            )
+
+        items = [item["properties"] for item in json_body["data"]]
+        duplicate_ids = [
+            item["doc_id"]
+            for item in items
+            if item["doc_id"] in collection.docs
+        ]
+        # 有重复 id 时整批拒绝
+        if duplicate_ids:
+            return _response(
+                VectorDBStatusCode.data_duplication,
+                "duplicate doc_id",
+                {"duplicate_ids": duplicate_ids},
+            )
+
+        self._upsert(collection, json_body.get("type", "text"), items)
+        return _response()
+
+    def _update_documents(self, headers: dict, json_body: dict) -> dict:
+        collection = self._get_collection(headers)
+        if collection is None:
+            return _response(
+                VectorDBStatusCode.data_error, "collection not exists"
+            )
+
+        items: list[dict] = json_body["data"]
+        failed_ids = [
+            item["doc_id"]
+            for item in items
+            if item["doc_id"] not in collection.docs
+        ]
+        self._upsert(
+            collection,
+            json_body.get("type", "text"),
+            [item for item in items if item["doc_id"] in collection.docs],
+        )
+        if failed_ids:
+            return _response(
+                VectorDBStatusCode.data_error,
+                "doc_id not exists",
+                {"failed_ids": failed_ids},
+            )
+        return _response()
+
+    def _search_documents(self, headers: dict, json_body: dict) -> dict:
+        collection = self._get_collection(headers)
+        if collection is None:
+            return _response(
+                VectorDBStatusCode.data_error, "collection not exists"
+            )
+
+        retrieval_config = json_body.get("retrieval_config", {})
+        method = retrieval_config.get("search_method", "semantic_search")
+        query = json_body["query"]
+        candidates = collection.filter_ids(json_body.get("filters", []))
+
+        if method == "full_text_search":
+            scores = collection.bm25_scores(query)
+        else:
+            scores = collection.semantic_scores(self._embed([query])[0])
+            distance = retrieval_config.get("distance")
+            if distance is not None:
+                scores = {k: v for k, v in scores.items() if 1 - v <= distance}
+
+        if method == "hybrid_search":
+            alpha = retrieval_config.get("alpha", 0.5)
+            bm25 = collection.bm25_scores(query)
+            max_bm25 = max(bm25.values(), default=0) or 1
+            scores = {
+                doc_id: alpha * score
+                + (1 - alpha) * bm25.get(doc_id, 0) / max_bm25
+                for doc_id, score in scores.items()
+            }
+
+        hits = sorted(
+            (
+                (doc_id, scores[doc_id])
+                for doc_id in candidates
+                if doc_id in scores
+            ),
+            key=lambda x: x[1],
+            reverse=True,
+        )
+        offset = int(retrieval_config.get("offset") or 0)
+        limit = retrieval_config.get("limit", 10)
+        data = [
+            {"properties": collection.docs[doc_id], "score": score}
+            for doc_id, score in hits[offset : offset + limit]
+        ]
+        return _response(data=data)
+
+    def _delete_documents(self, headers: dict, json_body: dict) -> dict:
+        collection = self._get_collection(headers)
+        if collection is None:
+            return _response(
+                VectorDBStatusCode.data_error, "collection not exists"
+            )
+
+        for doc_id in collection.filter_ids(json_body.get("filters", [])):
+            collection.remove(doc_id)
+        return _response()
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import logging
+from typing import TYPE_CHECKING
+
+from utils.lru_cache import LRUCache
+
+from .schemas import QueryParam
+
+if TYPE_CHECKING:
+    from utils.redis_utils import AsyncRedisClient
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_query_key(query_param: QueryParam) -> str:
+    """
+    将 `QueryParam` 规范化后计算哈希, 条件相同但顺序不同的查询得到相同的 key
+
+    - filters 按 (field_name, operator, value) 排序, list 类型的 value 排序去重
+    - retrieval_config 去掉 None 字段
+
+    """
+    filters = []
+    for item in query_param.filters:
+        value = item.value
+        if isinstance(value, list):
+            value = sorted(set(value))
+        filters.append([item.field_name, item.operator, value])
+    filters.sort(key=lambda x: json.dumps(x, ensure_ascii=False))
+
+    data = {
+        "query": query_param.query,
+        "filters": filters,
+        "retrieval_config": query_param.retrieval_config.model_dump(
+            exclude_none=True
+        ),
+    }
+    s = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(s.encode()).hexdigest()
+
+
+class QueryCache:
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 60,
+        redis_client: AsyncRedisClient | None = None,
+    ) -> None:
+        """
+        `VectorDBOperator.query_record` 的结果缓存
+
+        缓存 key 中包含 collection 的版本号, 写入该 collection 时版本号加一,
+        旧的缓存不会再被命中, 最终由 LRU/TTL 淘汰.
+        查询过程中发生写入时, 结果会写到旧版本号下, 同样不会被命中.
+
+        - 只使用进程内缓存时, 版本号保存在进程内, 其他 worker 的缓存最多延迟
+          `ttl` 秒失效
+        - 传入 `redis_client` 时, 版本号保存在 redis 中, 所有 worker 同时失效,
+          结果同时写入 redis 作为二级缓存
+
+        Args:
+            maxsize (int, optional): 进程内缓存的最大条目数. Defaults to 1024.
+            ttl (float, optional): 缓存过期秒数. Defaults to 60.
+            redis_client (AsyncRedisClient | None, optional): 二级缓存.
+                Defaults to None.
+
+        """
+        self.ttl = ttl
+        self._local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._redis = redis_client
+        self._versions: dict[str, int] = {}
+
+    @staticmethod
+    def _version_key(collection_name: str) -> str:
+        return f"vdb_query_cache:version:{collection_name}"
+
+    async def _get_version(self, collection_name: str) -> int:
+        if self._redis is None:
+            return self._versions.get(collection_name, 0)
+
+        try:
+            res = await self._redis.get(self._version_key(collection_name))
+        except Exception as e:
+            logger.warning(f"get query cache version failed: {type(e)}, {e}")
+            return -1
+        return int(res) if res is not None else 0
+
+    async def make_key(
+        self,
+        collection_name: str,
+        query_param: QueryParam,
+    ) -> str | None:
+        """生成缓存 key, 获取版本号失败时返回 None, 不使用缓存"""
+        version = await self._get_version(collection_name)
+        if version < 0:
+            return None
+        return (
+            f"vdb_query_cache:{collection_name}:{version}:"
+            f"{canonical_query_key(query_param)}"
+        )
+
+    async def get(self, key: str) -> list[dict] | None:
+        value = self._local.get(key)
+        if value is not None:
+            return copy.deepcopy(value)
+        if self._redis is None:
+            return None
+
+        try:
+            value = await self._redis.get_value(key)
+        except Exception as e:
+            logger.warning(f"get query cache failed: {type(e)}, {e}")
+            return None
+        if not isinstance(value, list):
+            # 不存在, 或者是没有编码头的旧数据
+            return None
+
+        self._local.set(key, value)
+        return copy.deepcopy(value)
+
+    async def set(self, key: str, value: list[dict]) -> None:
+        value = copy.deepcopy(value)
+        self._local.set(key, value)
+        if self._redis is None:
+            return
+
+        try:
+            await self._redis.set_value(key, value, ex=max(1, int(self.ttl)))
+        except Exception as e:
+            logger.warning(f"set query cache failed: {type(e)}, {e}")
+
+    async def invalidate(self, collection_name: str) -> None:
+        """使该 collection 的所有查询缓存失效"""
+        if self._redis is None:
+            self._versions[collection_name] = (
+                self._versions.get(collection_name, 0) + 1
+            )
+            return
+
+        try:
+            await self._redis.incr(self._version_key(collection_name))
+        except Exception as e:
+            logger.error(
+                f"invalidate query cache of {collection_name} failed: "
+                f"{type(e)}, {e}"
+            )
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from collections.abc import Collection, Iterator, Sequence
+from typing import Any, overload
+
+from .schemas import RecordPropertyABC
+
+_CREATE_SEGMENTATION = (
+    b'{"chunk_size":0,"chunk_overlap":0,"separators":["(?!)"]}'
+)
+
+
+def encode_properties(properties: dict) -> bytes:
+    """`RecordPropertyABC.properties()` 的紧凑 json 编码, key 排序"""
+    return json.dumps(
+        properties,
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    ).encode()
+
+
+class RecordBatch:
+    __slots__ = ("records", "doc_ids", "encoded")
+
+    def __init__(self, records: Sequence[RecordPropertyABC] = ()) -> None:
+        """
+        一批要写入向量数据库的记录, 每条记录的 `properties()` 只编码一次,
+        请求体由已编码的字节拼接, 重试和分片只是切片, 不再重新编码
+
+        Args:
+            records (Sequence[RecordPropertyABC], optional): 记录.
+                Defaults to ().
+
+        """
+        self.records: list[RecordPropertyABC] = list(records)
+        self.doc_ids: list[str] = [item.doc_id for item in self.records]
+        self.encoded: list[bytes] = [
+            encode_properties(item.properties()) for item in self.records
+        ]
+
+    @classmethod
+    def _from_columns(
+        cls,
+        records: list[RecordPropertyABC],
+        doc_ids: list[str],
+        encoded: list[bytes],
+    ) -> RecordBatch:
+        batch = cls.__new__(cls)
+        batch.records = records
+        batch.doc_ids = doc_ids
+        batch.encoded = encoded
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __bool__(self) -> bool:
+        return bool(self.records)
+
+    def __iter__(self) -> Iterator[RecordPropertyABC]:
+        return iter(self.records)
+
+    @overload
+    def __getitem__(self, index: int) -> RecordPropertyABC: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> RecordBatch: ...
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return self._from_columns(
+                self.records[index],
+                self.doc_ids[index],
+                self.encoded[index],
+            )
+        return self.records[index]
+
+    def compress(self, selectors: Sequence[bool]) -> RecordBatch:
+        """保留 `selectors` 对应位置为 True 的记录"""
+        return self._from_columns(
+            [
+                item
+                for item, k in zip(self.records, selectors, strict=True)
+                if k
+            ],
+            [
+                item
+                for item, k in zip(self.doc_ids, selectors, strict=True)
+                if k
+            ],
+            [
+                item
+                for item, k in zip(self.encoded, selectors, strict=True)
+                if k
+            ],
+        )
+
+    def select(self, doc_ids: Collection[str]) -> RecordBatch:
+        """只保留 `doc_ids` 中的记录, `doc_ids` 应为 set"""
+        return self.compress([doc_id in doc_ids for doc_id in self.doc_ids])
+
+    def exclude(self, doc_ids: Collection[str]) -> RecordBatch:
+        """去掉 `doc_ids` 中的记录, `doc_ids` 应为 set"""
+        return self.compress([doc_id not in doc_ids for doc_id in self.doc_ids])
+
+    def fingerprints(self) -> dict[str, str]:
+        """每条记录编码后的哈希, 内容不变时结果不变, 用于 `FingerprintStore`"""
+        return {
+            doc_id: hashlib.blake2b(encoded, digest_size=16).hexdigest()
+            for doc_id, encoded in zip(self.doc_ids, self.encoded, strict=True)
+        }
+
+    def create_body(self, type_: str) -> bytes:
+        """`/documents/create` 的请求体"""
+        data = b",".join(
+            b'{"properties":' + encoded + b"}" for encoded in self.encoded
+        )
+        return (
+            b'{"type":'
+            + json.dumps(type_).encode()
+            + b',"data":['
+            + data
+            + b'],"segmentation":'
+            + _CREATE_SEGMENTATION
+            + b"}"
+        )
+
+    def update_body(self, type_: str) -> bytes:
+        """`/documents/update` 的请求体"""
+        return (
+            b'{"type":'
+            + json.dumps(type_).encode()
+            + b',"data":['
+            + b",".join(self.encoded)
+            + b"]}"
+        )
@@ -0,0 +1,100 @@
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Literal
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30,
+    ) -> None:
+        """
+        熔断器, 连续失败 `failure_threshold` 次后打开, 打开期间直接拒绝请求.
+        打开 `recovery_timeout` 秒后进入半开状态, 放行一个探测请求,
+        探测成功则关闭, 失败则重新打开
+
+        Args:
+            failure_threshold (int, optional): 打开熔断的连续失败次数.
+                Defaults to 5.
+            recovery_timeout (float, optional): 打开后多久放行探测请求 (秒).
+                Defaults to 30.
+
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state: CircuitState = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        """是否允许发送请求"""
+        if self.state == "closed":
+            return True
+
+        # 打开或半开时, 每 recovery_timeout 秒放行一个探测请求,
+        # 探测请求没有结果 (如被丢弃) 时也能继续探测
+        now = time.monotonic()
+        if now - self._opened_at >= self.recovery_timeout:
+            self.state = "half_open"
+            self._opened_at = now
+            return True
+        return False
+
+    def on_success(self) -> None:
+        self._failures = 0
+        self.state = "closed"
+
+    def on_failure(self) -> None:
+        self._failures += 1
+        if (
+            self.state == "half_open"
+            or self._failures >= self.failure_threshold
+        ):
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+def backoff_delay(
+    attempt: int,
+    base_delay: float,
+    max_delay: float,
+    retry_after: float | None = None,
+) -> float:
+    """
+    指数退避 + full jitter 的重试等待时间, 有 `retry_after` 时至少等待该时间
+
+    Args:
+        attempt (int): 第几次重试, 从 0 开始
+        base_delay (float): 第一次重试的最大等待秒数
+        max_delay (float): 最大等待秒数
+        retry_after (float | None, optional): 服务端要求的等待秒数.
+            Defaults to None.
+
+    """
+    delay = random.uniform(0, min(max_delay, base_delay * 2**attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_delay))
+    return delay
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """解析 `Retry-After` 响应头, 支持秒数和 http 日期格式"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
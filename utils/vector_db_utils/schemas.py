@@ -113,3 +113,16 @@ class QueryParam(BaseModel):
             doc_id_filter_num <= 100
         ), f"`doc_id` filters must <= 100 ({doc_id_filter_num})"
         return self
+
+
+class IngestProgress(BaseModel):
+    """`VectorDBOperator.add_records_stream` 每完成一个分片返回一次"""
+
+    chunk_index: int  # 分片序号
+    offset: int  # 分片第一条记录在输入流中的位置
+    results: list[bool]  # 分片内每条记录是否添加成功
+    failed_ids: list[str]
+    done_records: int  # 已完成的记录数 (含失败)
+    failed_records: int  # 已失败的记录数
+    # 该位置之前的记录都已完成, 失败后从这里恢复 (`start_offset=checkpoint`)
+    checkpoint: int
@@ -1,35 +1,83 @@
 import asyncio
+import copy
 import json
 import logging
 import time
-from collections.abc import Coroutine
+from asyncio import Future
+from collections import deque
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Iterable,
+)
 from typing import Any, Literal, TypeVar
 
 import httpx
 
 from config import config
-from utils.task_queue import TaskQueue
+from utils.async_utils import SingleFlight, TaskGroup
+from utils.redis_utils import redis_client
+from utils.task_queue import (
+    AIMDController,
+    LimiterBackend,
+    MmapTokenBucket,
+    RedisTokenBucket,
+    TaskDeadlineExceededError,
+    TaskPriority,
+    TaskQueue,
+    TaskQueueFullError,
+)
 
-from .exceptions import VectorDBError
+from .batch_writer import BatchWriter
+from .doc_id_index import BloomDocIdIndex, DocIdIndex, RedisDocIdIndex
+from .exceptions import (
+    VectorDBCircuitOpenError,
+    VectorDBError,
+    VectorDBRequestError,
+)
+from .fingerprint import (
+    FingerprintStore,
+    RedisFingerprintStore,
+    SQLFingerprintStore,
+)
+from .hedging import HedgeBudget, LatencyTracker
+from .http_client import vector_db_http_client
+from .local_backend import LocalVectorDB
+from .query_cache import QueryCache, canonical_query_key
+from .record_batch import RecordBatch
+from .resilience import CircuitBreaker, backoff_delay, parse_retry_after
 from .schemas import (
     Collection,
     Filter,
+    IngestProgress,
     QueryParam,
     RecordPropertyABC,
     VectorDBStatusCode,
 )
+from .write_spool import (
+    SpoolDrainer,
+    SpooledRecord,
+    WriteSpool,
+    encode_delete_entry,
+    encode_write_entry,
+)
 
 logger = logging.getLogger(__name__)
 
 
-VECTOR_DB_ASYNC_CLIENT = httpx.AsyncClient(timeout=config.VDB_TIMEOUT_SECONDS)
-
 RecordProperty = TypeVar("RecordProperty", bound=RecordPropertyABC)
 
 _RECORD_LIMIT = 100
+# 创建时返回 duplicate_ids 后, 剩余记录重新创建的最大次数
+_DUPLICATE_RETRIES = 3
 
 
 def short_msg(data: Any, length: int = 256) -> str:
+    if isinstance(data, bytes):
+        s = data[:length].decode(errors="ignore")
+        return s + "..." if len(data) > length else s
     s = json.dumps(data, ensure_ascii=False)
     if len(s) > length:
         s = s[:length] + "..."
@@ -49,15 +97,221 @@ def _error_log(res: dict) -> str | None:
     return error_msg
 
 
+async def _aiter_chunks(
+    items: Iterable | AsyncIterable,
+    size: int,
+    skip: int = 0,
+) -> AsyncIterator[tuple[int, list]]:
+    """把 (异步) 可迭代对象切分为长度为 `size` 的分片, 跳过前 `skip` 个元素"""
+
+    async def _aiter() -> AsyncIterator:
+        if isinstance(items, AsyncIterable):
+            async for item in items:
+                yield item
+        else:
+            for item in items:
+                yield item
+
+    offset = 0
+    chunk: list = []
+    async for item in _aiter():
+        offset += 1
+        if offset <= skip:
+            continue
+        chunk.append(item)
+        if len(chunk) == size:
+            yield offset - size, chunk
+            chunk = []
+    if chunk:
+        yield offset - len(chunk), chunk
+
+
+def _hit_doc_id(hit: dict) -> str:
+    """查询结果中的 doc_id, 没有时用整条结果作为去重依据"""
+    doc_id = hit.get("doc_id")
+    if doc_id is None:
+        doc_id = hit.get("properties", {}).get("doc_id")
+    if doc_id is None:
+        doc_id = json.dumps(hit, ensure_ascii=False, sort_keys=True)
+    return doc_id
+
+
+def reciprocal_rank_fusion(
+    results: list[list[dict]],
+    k: int = 60,
+) -> list[dict]:
+    """
+    使用 RRF 合并多个查询结果, 按 doc_id 去重
+
+    每条结果的得分为 `sum(1 / (k + rank))`, rank 为该结果在每个列表中的
+    排名 (从 1 开始), 得分写入 `rrf_score` 字段
+
+    """
+    scores: dict[str, float] = {}
+    hits: dict[str, dict] = {}
+    for result in results:
+        for rank, hit in enumerate(result, start=1):
+            doc_id = _hit_doc_id(hit)
+            scores[doc_id] = scores.get(doc_id, 0) + 1 / (k + rank)
+            hits.setdefault(doc_id, hit)
+
+    merged = [
+        {**hits[doc_id], "rrf_score": score} for doc_id, score in scores.items()
+    ]
+    merged.sort(key=lambda x: x["rrf_score"], reverse=True)
+    return merged
+
+
+def _filter_doc_ids(filters: list[Filter]) -> list[str] | None:
+    """
+    筛选条件限定的 doc_id 范围, 没有 doc_id 条件时返回 None (可能是任意记录)
+    """
+    doc_ids: set[str] | None = None
+    for item in filters:
+        if item.field_name != "doc_id":
+            continue
+        values = set(
+            item.value if isinstance(item.value, list) else [item.value]
+        )
+        if item.operator == "equal" and len(values) > 1:
+            # 单值字段不可能同时等于多个值
+            return []
+        doc_ids = values if doc_ids is None else doc_ids & values
+    return sorted(doc_ids) if doc_ids is not None else None
+
+
+def _is_retryable(e: Exception) -> bool:
+    """超时, 连接失败, 429 和 5xx 可以重试"""
+    if isinstance(e, httpx.TransportError):
+        return True
+    return isinstance(e, VectorDBRequestError) and (
+        e.code == 429 or e.code >= 500
+    )
+
+
+def _is_rate_limited(e: Exception) -> bool:
+    """429, 请求未被处理, 非幂等请求也可以重试"""
+    return isinstance(e, VectorDBRequestError) and e.code == 429
+
+
+def _create_limiter_backend() -> LimiterBackend | None:
+    """
+    根据配置创建跨进程共享的限流后端, `local` 或不限速
+    (`VDB_REQUEST_RATE` 不大于 0, 或没有设置 `VDB_REQUEST_RATE`
+    且 `VDB_REQUEST_INTERVAL` 为 0) 时返回 None
+    """
+    if config.VDB_LIMITER_BACKEND == "local":
+        return None
+
+    # 与 TaskQueue 一致, 速率或间隔不大于 0 表示不限速
+    rate = config.VDB_REQUEST_RATE
+    if rate is None:
+        if config.VDB_REQUEST_INTERVAL <= 0:
+            return None
+        rate = 1 / config.VDB_REQUEST_INTERVAL
+    if rate <= 0:
+        return None
+    if config.VDB_LIMITER_BACKEND == "redis":
+        return RedisTokenBucket(
+            client=redis_client,
+            key="vector_db_limiter",
+            rate=rate,
+            burst=config.VDB_REQUEST_BURST,
+        )
+    return MmapTokenBucket(
+        path=config.VDB_LIMITER_MMAP_PATH,
+        rate=rate,
+        burst=config.VDB_REQUEST_BURST,
+    )
+
+
+def _create_concurrency_controller(
+    task_queue: TaskQueue,
+) -> AIMDController | None:
+    """开启自适应并发时, 创建 AIMD 控制器并接管 `task_queue.max_in_flight`"""
+    if not config.VDB_ADAPTIVE_CONCURRENCY:
+        return None
+
+    def on_limit_change(limit: int):
+        logger.info(f"vector db concurrency limit changed: {limit}")
+        task_queue.max_in_flight = limit
+
+    controller = AIMDController(
+        initial_limit=config.VDB_ADAPTIVE_INITIAL_LIMIT,
+        min_limit=config.VDB_ADAPTIVE_MIN_LIMIT,
+        max_limit=config.VDB_ADAPTIVE_MAX_LIMIT,
+        latency_target=config.VDB_ADAPTIVE_LATENCY_TARGET,
+        on_limit_change=on_limit_change,
+    )
+    task_queue.max_in_flight = controller.limit
+    return controller
+
+
 class _RequestLimiter:
-    _task_queue = TaskQueue(interval=config.VDB_REQUEST_INTERVAL)
+    _task_queue = TaskQueue(
+        interval=config.VDB_REQUEST_INTERVAL,
+        size=config.VDB_QUEUE_SIZE,
+        rate=config.VDB_REQUEST_RATE,
+        burst=config.VDB_REQUEST_BURST,
+        max_in_flight=config.VDB_MAX_IN_FLIGHT,
+        limiter=_create_limiter_backend(),
+    )
+    _concurrency_controller = _create_concurrency_controller(_task_queue)
+    _latency_tracker = LatencyTracker()
+    _hedge_budget = HedgeBudget(ratio=config.VDB_HEDGE_BUDGET_RATIO)
+    _circuit_breakers: dict[str, CircuitBreaker] = {}
+
+    @classmethod
+    def _get_circuit_breaker(cls, endpoint: str) -> CircuitBreaker:
+        if endpoint not in cls._circuit_breakers:
+            cls._circuit_breakers[endpoint] = CircuitBreaker(
+                failure_threshold=config.VDB_CIRCUIT_FAILURE_THRESHOLD,
+                recovery_timeout=config.VDB_CIRCUIT_RECOVERY_TIMEOUT,
+            )
+        return cls._circuit_breakers[endpoint]
+
+    @classmethod
+    def set_limiter_backend(cls, limiter: LimiterBackend | None) -> None:
+        """替换限流后端, 用于测试或在运行时切换到共享限流"""
+        cls._task_queue.limiter = limiter
+
+    @classmethod
+    def metrics(cls) -> dict:
+        """限流器当前状态, 开启自适应并发时包含并发上限及其变化记录"""
+        controller = cls._concurrency_controller
+        return {
+            "max_in_flight": cls._task_queue.max_in_flight,
+            "queue": cls._task_queue.stats(),
+            "adaptive": controller.stats() if controller else None,
+            "http_pool": vector_db_http_client.stats(),
+            "hedge": cls._hedge_budget.stats(),
+            "circuit_breakers": {
+                endpoint: breaker.state
+                for endpoint, breaker in cls._circuit_breakers.items()
+            },
+        }
 
     @classmethod
-    def _schedule_task(cls, coro: Coroutine):
+    async def _schedule_task(
+        cls,
+        coro: Coroutine,
+        priority: TaskPriority = TaskPriority.normal,
+        fairness_key: str | None = None,
+        deadline: float | None = None,
+    ) -> Future:
         if not cls._task_queue.running:
             cls._task_queue.schedule()
 
-        return cls._task_queue.add_task(coro)
+        if deadline is None and config.VDB_QUEUE_DEADLINE_SECONDS is not None:
+            deadline = time.monotonic() + config.VDB_QUEUE_DEADLINE_SECONDS
+
+        return await cls._task_queue.add_task_wait(
+            coro,
+            priority=priority,
+            fairness_key=fairness_key,
+            deadline=deadline,
+            timeout=config.VDB_QUEUE_PUT_TIMEOUT,
+        )
 
     @classmethod
     async def request_vector_db(
@@ -66,6 +320,11 @@ class _RequestLimiter:
         endpoint: str,
         headers: dict,
         json_body: Any,
+        priority: TaskPriority = TaskPriority.normal,
+        deadline: float | None = None,
+        hedge: bool = False,
+        idempotent: bool = False,
+        content: bytes | None = None,
     ) -> dict:
         """
         请求向量数据库
@@ -75,12 +334,44 @@ class _RequestLimiter:
             json (Any):
             collection_name (str):
             method (Literal["post", "get", "delete", "put"]):
+            priority (TaskPriority): 排队优先级, 查询使用 high, 批量写入使用 low,
+                同一优先级内按 `collection-name` 轮流执行
+            deadline (float | None): 截止时间 (`time.monotonic()`),
+                排队超过截止时间未开始的请求抛出 `TaskDeadlineExceededError`,
+                默认使用 `VDB_QUEUE_DEADLINE_SECONDS`
+            hedge (bool): 是否使用对冲请求, 只能用于只读请求.
+                超过最近延迟的 `VDB_HEDGE_PERCENTILE` 分位数仍未返回时,
+                再发送一个相同的请求, 使用先返回的结果
+            idempotent (bool): 请求是否幂等. 幂等请求在超时, 连接失败, 429, 5xx 时
+                按指数退避重试 `VDB_RETRY_TIMES` 次, 优先使用 `Retry-After`.
+                429 代表请求未被处理, 非幂等请求也会重试
+            content (bytes | None): 已编码的 json 请求体, 设置后忽略 `json_body`,
+                重试时不再重新编码
 
         Returns:
             dict: 响应体json
 
         """
 
+        if _local_vector_db is not None:
+            return await _local_vector_db.request(
+                method=method,
+                endpoint=endpoint,
+                headers=headers,
+                json_body=json_body if content is None else json.loads(content),
+            )
+
+        body = json_body if content is None else content
+        if content is None:
+            request_kw: dict[str, Any] = {"headers": headers, "json": json_body}
+        else:
+            request_kw = {
+                "headers": {**headers, "content-type": "application/json"},
+                "content": content,
+            }
+
+        breaker = cls._get_circuit_breaker(endpoint)
+
         async def operation():
             """发送请求"""
             url = f"{config.VDB_BASE_URL.strip('/')}{endpoint}"
@@ -89,46 +380,236 @@ class _RequestLimiter:
 
             req_start_time = time.time()
             try:
-                res = await VECTOR_DB_ASYNC_CLIENT.request(
+                res = await vector_db_http_client.request(
                     method=method,
-                    url=url,
-                    headers=headers,
-                    json=json_body,
-                    timeout=300,
+                    endpoint=endpoint,
+                    **request_kw,
                 )
             except httpx.TimeoutException as e:
                 req_timeout_time = time.time()
+                breaker.on_failure()
+                if cls._concurrency_controller is not None:
+                    cls._concurrency_controller.on_failure("timeout")
                 logger.warning(
                     f"error: {type(e), e}, "
                     f"cost: {req_timeout_time - req_start_time} seconds"
                 )
                 raise e
+            except httpx.TransportError:
+                breaker.on_failure()
+                raise
+
+            # 429 和其他 4xx 不能说明服务恢复, 不计入熔断器的成功
+            if res.status_code >= 500:
+                breaker.on_failure()
+                if cls._concurrency_controller is not None:
+                    cls._concurrency_controller.on_failure("server_error")
+            elif res.status_code < 400:
+                breaker.on_success()
 
             if res.status_code != 200:
                 logger.error(
                     f"request vector db failed\n"
                     f"url: {url}\n"
                     f"headers: {headers}\n"
-                    f"json: {short_msg(json_body)}\n"
+                    f"json: {short_msg(body)}\n"
                     f"status_code: [{res.status_code}], {res.content}\n"
                 )
 
-                raise Exception("request vector db failed")
+                raise VectorDBRequestError(
+                    f"request vector db failed, status_code: {res.status_code}",
+                    code=res.status_code,
+                    retry_after=parse_retry_after(
+                        res.headers.get("Retry-After")
+                    ),
+                )
             json_data = res.json()
 
-            logger.info(
-                f"url: {url}\n"
-                f"headers: {headers}\n"
-                f"json: {short_msg(json_body)}\n"
-                f"response json res: {short_msg(json_data)}\n"
-            )
+            if cls._concurrency_controller is not None:
+                if json_data.get("code") == VectorDBStatusCode.internal_error:
+                    cls._concurrency_controller.on_failure("internal_error")
+                else:
+                    cls._concurrency_controller.on_success(
+                        time.time() - req_start_time
+                    )
+
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    f"url: {url}\n"
+                    f"headers: {headers}\n"
+                    f"json: {short_msg(body)}\n"
+                    f"response json res: {short_msg(json_data)}\n"
+                )
             return json_data
 
-        res: dict = await cls._schedule_task(operation())
-        return res
+        async def schedule() -> Future:
+            return await cls._schedule_task(
+                operation(),
+                priority=priority,
+                fairness_key=headers.get("collection-name"),
+                deadline=deadline,
+            )
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise VectorDBCircuitOpenError(
+                    f"circuit breaker of {endpoint} is open", code=503
+                )
+
+            try:
+                if hedge:
+                    return await cls._hedged_request(schedule)
+
+                future = await schedule()
+                res: dict = await future
+                return res
+            except (httpx.TransportError, VectorDBRequestError) as e:
+                if attempt >= config.VDB_RETRY_TIMES or not (
+                    _is_retryable(e) if idempotent else _is_rate_limited(e)
+                ):
+                    raise
+
+                delay = backoff_delay(
+                    attempt,
+                    base_delay=config.VDB_RETRY_BASE_DELAY,
+                    max_delay=config.VDB_RETRY_MAX_DELAY,
+                    retry_after=getattr(e, "retry_after", None),
+                )
+                logger.warning(
+                    f"request {endpoint} failed: {type(e)}, {e}, "
+                    f"retry after {delay:.2f} seconds ({attempt + 1})"
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    @classmethod
+    async def _hedged_request(
+        cls,
+        schedule: Callable[[], Coroutine[Any, Any, Future]],
+    ) -> dict:
+        """
+        发送请求, 超过延迟分位数仍未返回且对冲额度足够时, 再发送一个相同请求.
+        两个请求都经过限流队列, 使用先成功返回的结果, 取消另一个
+        """
+        cls._hedge_budget.deposit()
+        start_time = time.monotonic()
+
+        primary = await schedule()
+        pending: set[Future] = {primary}
+        error: BaseException | None = None
+        # 等待期间调用者被取消时, 也要取消已经发出的请求
+        try:
+            delay = cls._latency_tracker.percentile(config.VDB_HEDGE_PERCENTILE)
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and cls._hedge_budget.try_spend():
+                    logger.debug(f"send hedged request after {delay} seconds")
+                    pending.add(await schedule())
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    if future.exception() is not None:
+                        error = future.exception()
+                        continue
+
+                    if future is not primary:
+                        cls._hedge_budget.hedge_won += 1
+                    cls._latency_tracker.record(time.monotonic() - start_time)
+                    return future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+        assert error is not None
+        raise error
+
+
+def _create_local_vector_db() -> LocalVectorDB | None:
+    """`VDB_BACKEND=local` 时, 所有请求由进程内的向量数据库处理"""
+    if config.VDB_BACKEND != "local":
+        return None
+    return LocalVectorDB(embedding_dim=config.VDB_LOCAL_EMBEDDING_DIM)
+
+
+_local_vector_db = _create_local_vector_db()
+
+
+def _create_query_cache() -> QueryCache | None:
+    if not config.VDB_QUERY_CACHE_ENABLED:
+        return None
+
+    return QueryCache(
+        maxsize=config.VDB_QUERY_CACHE_SIZE,
+        ttl=config.VDB_QUERY_CACHE_TTL,
+        redis_client=redis_client if config.VDB_QUERY_CACHE_REDIS else None,
+    )
+
+
+_query_cache = _create_query_cache()
+_query_single_flight = SingleFlight()
+# 本进程中每个 collection 完成的写操作次数, 写入后发起的查询不与之前的查询合并
+_write_generations: dict[str, int] = {}
+
+
+def _create_fingerprint_store() -> FingerprintStore | None:
+    if config.VDB_FINGERPRINT_STORE == "redis":
+        return RedisFingerprintStore(redis_client)
+    if config.VDB_FINGERPRINT_STORE == "postgres":
+        return SQLFingerprintStore()
+    return None
+
+
+_fingerprint_store = _create_fingerprint_store()
+
+
+def _create_doc_id_index() -> DocIdIndex | None:
+    if config.VDB_DOC_ID_INDEX == "bloom":
+        return BloomDocIdIndex(
+            capacity=config.VDB_DOC_ID_INDEX_CAPACITY,
+            error_rate=config.VDB_DOC_ID_INDEX_ERROR_RATE,
+        )
+    if config.VDB_DOC_ID_INDEX == "redis":
+        return RedisDocIdIndex(redis_client)
+    return None
+
+
+_doc_id_index = _create_doc_id_index()
+
+
+def get_limiter_metrics() -> dict:
+    """向量数据库请求限流器的监控指标"""
+    return {
+        **_RequestLimiter.metrics(),
+        "fingerprint": _fingerprint_store.stats()
+        if _fingerprint_store is not None
+        else None,
+        "doc_id_index": _doc_id_index.stats()
+        if _doc_id_index is not None
+        else None,
+        "spool": _spool_drainer.stats() if _spool_drainer is not None else None,
+        "orphan_spools": [
+            drainer.stats() for drainer in _orphan_spool_drainers
+        ],
+    }
 
 
 class VectorDBOperator:
+    @staticmethod
+    async def _request_write(collection_name: str, **kw) -> dict:
+        """发送写请求, 结束后 (包括失败) 使该 collection 的查询缓存失效"""
+        try:
+            return await _RequestLimiter.request_vector_db(**kw)
+        finally:
+            _write_generations[collection_name] = (
+                _write_generations.get(collection_name, 0) + 1
+            )
+            if _query_cache is not None:
+                await _query_cache.invalidate(collection_name)
+
     @staticmethod
     async def create_collection(collection: Collection) -> None:
         json_res = await _RequestLimiter.request_vector_db(
@@ -142,7 +623,8 @@ class VectorDBOperator:
 
     @staticmethod
     async def delete_collection(collection_name: str) -> None:
-        json_res = await _RequestLimiter.request_vector_db(
+        json_res = await VectorDBOperator._request_write(
+            collection_name,
             method="post",
             endpoint="/collection/delete",
             headers={},
@@ -151,12 +633,19 @@ class VectorDBOperator:
         if json_res["code"] != VectorDBStatusCode.success:
             raise Exception(json_res)
 
+        if _fingerprint_store is not None:
+            await _fingerprint_store.forget(collection_name)
+        if _doc_id_index is not None:
+            await _doc_id_index.forget(collection_name)
+
     @staticmethod
     async def add_records(
         type_: Literal["text", "text_json", "text_html"],
-        records: list[RecordProperty],
+        records: list[RecordProperty] | RecordBatch,
         collection_name: str,
         retry_times: int = 2,
+        skip_unchanged: bool = True,
+        spool: bool = False,
     ) -> list[bool]:
         """
         添加记录到向量数据库
@@ -164,10 +653,16 @@ class VectorDBOperator:
         Args:
             type_ (Literal["text", "text_json", "text_html"]):
                 请求的 body 中的 `type` 字段
-            records (list[RecordProperty]): 要添加的向量数据库的记录
+            records (list[RecordProperty] | RecordBatch): 要添加的向量数据库的记录,
+                每条记录只编码一次, 分片和重试时复用
             collection_name (CollectionName):
             retry_times (int, optional): 失败重试次数, 会去掉对应的失败id后再重试.
                 Defaults to 2.
+            skip_unchanged (bool, optional): 配置了 `VDB_FINGERPRINT_STORE` 时,
+                跳过内容哈希与上次写入相同的记录, 跳过的记录视为成功.
+                Defaults to True.
+            spool (bool, optional): 配置了 `VDB_SPOOL_DIR` 时, 写入本地 spool
+                后立即返回 (全部为 True), 由后台按限流速度回放. Defaults to False.
 
         Returns:
             list[bool]: 返回添加状态, 是否成功
@@ -175,16 +670,29 @@ class VectorDBOperator:
         """
         global _RECORD_LIMIT
 
-        if len(records) > _RECORD_LIMIT:
+        batch = (
+            records
+            if isinstance(records, RecordBatch)
+            else RecordBatch(records)
+        )
+        if spool and config.VDB_SPOOL_DIR:
+            await _spool_write(
+                encode_write_entry("add", collection_name, type_, batch)
+            )
+            return [True] * len(batch)
+
+        if len(batch) > _RECORD_LIMIT:
             idx = 0
             task_list: list[asyncio.Task[list[bool]]] = []
-            while idx < len(records):
+            while idx < len(batch):
                 task_list.append(
                     asyncio.create_task(
                         VectorDBOperator.add_records(
                             type_=type_,
-                            records=records[idx : idx + _RECORD_LIMIT],
+                            records=batch[idx : idx + _RECORD_LIMIT],
                             collection_name=collection_name,
+                            retry_times=retry_times,
+                            skip_unchanged=skip_unchanged,
                         )
                     )
                 )
@@ -195,45 +703,272 @@ class VectorDBOperator:
 
             return results
 
-        if not records:
+        if not batch:
             return []
 
-        failed_ids = []
-        req_records = records.copy()
+        req_batch = batch
+        fingerprints: dict[str, str] = {}
+        if _fingerprint_store is not None:
+            fingerprints = batch.fingerprints()
+        if _fingerprint_store is not None and skip_unchanged:
+            fingerprints = await _fingerprint_store.filter_changed(
+                collection_name, fingerprints
+            )
+            req_batch = batch.select(fingerprints)
+            skipped = len(batch) - len(req_batch)
+            if skipped:
+                logger.info(
+                    f"skip {skipped}/{len(batch)} unchanged records "
+                    f"of {collection_name}"
+                )
+            if not req_batch:
+                return [True] * len(batch)
+
+        failed_ids: set[str] = set()
         for i in range(retry_times + 1):
             logger.debug(f"add doc to {collection_name}, times index: {i}")
 
-            _failed_ids = await VectorDBOperator._try_add_records(
+            _failed_ids = await VectorDBOperator._try_upsert_records(
                 collection_name=collection_name,
                 type_=type_,
-                records=req_records,
+                records=req_batch,
             )
-            if _failed_ids == []:
+            if not _failed_ids:
                 break
 
-            failed_ids.extend(_failed_ids)
+            failed_ids.update(_failed_ids)
 
             # 更新records, 去掉失败id, 在下一次循环重试
-            req_records = [
-                item for item in req_records if item.doc_id not in _failed_ids
+            req_batch = req_batch.exclude(failed_ids)
+
+        if _fingerprint_store is not None and fingerprints:
+            await _fingerprint_store.commit(
+                collection_name,
+                {
+                    doc_id: fingerprint
+                    for doc_id, fingerprint in fingerprints.items()
+                    if doc_id not in failed_ids
+                },
+            )
+        if _doc_id_index is not None:
+            await _doc_id_index.record(collection_name, req_batch.doc_ids)
+
+        return [doc_id not in failed_ids for doc_id in batch.doc_ids]
+
+    @staticmethod
+    async def add_records_stream(
+        type_: Literal["text", "text_json", "text_html"],
+        records: Iterable[RecordProperty] | AsyncIterable[RecordProperty],
+        collection_name: str,
+        max_in_flight_chunks: int = 4,
+        start_offset: int = 0,
+        retry_times: int = 2,
+    ) -> AsyncIterator[IngestProgress]:
+        """
+        流式添加记录, 按 100 条切分, 最多同时写入 `max_in_flight_chunks` 个分片,
+        内存中只保留正在写入的分片
+
+        Usage
+        ```python
+            checkpoint = 0
+            try:
+                async for progress in VectorDBOperator.add_records_stream(
+                    "text", read_records(), "collection"
+                ):
+                    checkpoint = progress.checkpoint
+            except Exception:
+                # 重新读取同一个流, 从 checkpoint 开始恢复
+                ...
+        ```
+
+        Args:
+            type_ (Literal["text", "text_json", "text_html"]):
+                请求的 body 中的 `type` 字段
+            records (Iterable | AsyncIterable): 要添加的记录
+            collection_name (str):
+            max_in_flight_chunks (int, optional): 同时写入的最大分片数.
+                Defaults to 4.
+            start_offset (int, optional): 跳过流中前 `start_offset` 条记录,
+                用于从 `IngestProgress.checkpoint` 恢复. Defaults to 0.
+            retry_times (int, optional): 每个分片的失败重试次数. Defaults to 2.
+
+        Yields:
+            IngestProgress: 每完成一个分片返回一次, 按完成顺序
+
+        Raises:
+            ValueError: `max_in_flight_chunks` 不大于 0
+
+        """
+        global _RECORD_LIMIT
+
+        if max_in_flight_chunks <= 0:
+            raise ValueError(
+                f"max_in_flight_chunks must > 0 ({max_in_flight_chunks})"
+            )
+
+        pending: dict[asyncio.Task[list[bool]], tuple[int, int, list]] = {}
+        # 已完成分片: offset -> 分片结束位置, 用于推进 checkpoint
+        finished: dict[int, int] = {}
+        checkpoint = start_offset
+        done_records = 0
+        failed_records = 0
+
+        def collect(task: asyncio.Task[list[bool]]) -> IngestProgress:
+            nonlocal checkpoint, done_records, failed_records
+
+            chunk_index, offset, chunk = pending.pop(task)
+            results = task.result()
+            failed_ids = [
+                record.doc_id
+                for record, success in zip(chunk, results, strict=True)
+                if not success
             ]
+            done_records += len(chunk)
+            failed_records += len(failed_ids)
+
+            finished[offset] = offset + len(chunk)
+            while checkpoint in finished:
+                checkpoint = finished.pop(checkpoint)
+
+            return IngestProgress(
+                chunk_index=chunk_index,
+                offset=offset,
+                results=results,
+                failed_ids=failed_ids,
+                done_records=done_records,
+                failed_records=failed_records,
+                checkpoint=checkpoint,
+            )
+
+        async def wait_first() -> list[IngestProgress]:
+            done, _ = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            return [collect(task) for task in done]
+
+        try:
+            chunk_index = 0
+            async for offset, chunk in _aiter_chunks(
+                records, _RECORD_LIMIT, skip=start_offset
+            ):
+                while len(pending) >= max_in_flight_chunks:
+                    for progress in await wait_first():
+                        yield progress
+
+                task = asyncio.create_task(
+                    VectorDBOperator.add_records(
+                        type_=type_,
+                        records=chunk,
+                        collection_name=collection_name,
+                        retry_times=retry_times,
+                    )
+                )
+                pending[task] = (chunk_index, offset, chunk)
+                chunk_index += 1
+
+            while pending:
+                for progress in await wait_first():
+                    yield progress
+        finally:
+            # 发生异常或调用者提前退出时, 取消未完成的分片
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def add_records_batched(
+        type_: Literal["text", "text_json", "text_html"],
+        records: list[RecordProperty],
+        collection_name: str,
+    ) -> list[bool]:
+        """
+        与其他调用者的记录合并后批量添加, 适用于频繁的少量写入.
+        按 (collection_name, type_) 凑满 100 条或等待 `VDB_BATCH_MAX_LINGER`
+        秒后写入
+
+        Args:
+            type_ (Literal["text", "text_json", "text_html"]):
+                请求的 body 中的 `type` 字段
+            records (list[RecordProperty]): 要添加的向量数据库的记录
+            collection_name (str):
+
+        Returns:
+            list[bool]: 返回添加状态, 是否成功
+
+        """
+        return await _add_batch_writer.submit(
+            type_=type_,
+            records=records,
+            collection_name=collection_name,
+        )
+
+    @staticmethod
+    async def _try_upsert_records(
+        collection_name: str,
+        type_: Literal["text", "text_json", "text_html"],
+        records: RecordBatch,
+    ) -> list[str]:
+        """
+        配置了 `VDB_DOC_ID_INDEX` 时, 先按索引把记录分为更新和创建,
+        索引误判的记录退回 `_try_add_records` 的流程
+
+        Returns:
+            list[str]: 返回失败 id
 
-        return [item.doc_id not in failed_ids for item in records]
+        """
+        if _doc_id_index is None or not records:
+            return await VectorDBOperator._try_add_records(
+                collection_name=collection_name,
+                type_=type_,
+                records=records,
+            )
+
+        exists = await _doc_id_index.lookup(collection_name, records.doc_ids)
+        updates = records.compress(exists)
+        missing_ids: set[str] = set()
+        if updates:
+            # 更新失败的记录可能并不存在 (误判), 改为创建
+            missing_ids = set(
+                await VectorDBOperator._try_update_record(
+                    type_=type_,
+                    collection_name=collection_name,
+                    records=updates,
+                )
+            )
+            _doc_id_index.false_positives += len(missing_ids)
+
+        return await VectorDBOperator._try_add_records(
+            collection_name=collection_name,
+            type_=type_,
+            records=records.compress(
+                [
+                    not exist or doc_id in missing_ids
+                    for doc_id, exist in zip(
+                        records.doc_ids, exists, strict=True
+                    )
+                ]
+            ),
+        )
 
     @staticmethod
     async def _try_add_records(
         collection_name: str,
         type_: Literal["text", "text_json", "text_html"],
-        records: list[RecordProperty],
+        records: RecordBatch,
+        retries: int = _DUPLICATE_RETRIES,
     ) -> list[str]:
         """
-        尝试添加记录, 已存在记录会尝试调用更新接口
+        尝试添加记录, 已存在记录会尝试调用更新接口.
+        返回 `duplicate_ids` 时, 重复的记录改为更新, 其余记录重新创建,
+        重新创建最多 `retries` 次, 批次没有缩小 (`duplicate_ids` 不在批次中)
+        或次数用完时, 剩余记录视为失败
 
         Args:
             collection_name (str): 数据库名
             type_ (Literal["text", "text_json", "text_html"]):
                 请求的 body 中的 `type` 字段
-            records (list[RecordProperty]): 请求的 body 中的 `data` 字段
+            records (RecordBatch): 请求的 body 中的 `data` 字段
+            retries (int, optional): 剩余的重新创建次数.
+                Defaults to _DUPLICATE_RETRIES.
 
         Returns:
             list[str]: 返回失败 id
@@ -242,20 +977,14 @@ class VectorDBOperator:
         if not records:
             return []
 
-        _data = [{"properties": record.properties()} for record in records]
-        json_res = await _RequestLimiter.request_vector_db(
+        json_res = await VectorDBOperator._request_write(
+            collection_name,
             method="post",
             endpoint="/documents/create",
             headers={"collection-name": collection_name},
-            json_body={
-                "type": type_,
-                "data": _data,
-                "segmentation": {
-                    "chunk_size": 0,
-                    "chunk_overlap": 0,
-                    "separators": ["(?!)"],
-                },
-            },
+            priority=TaskPriority.low,
+            json_body=None,
+            content=records.create_body(type_),
         )
         if json_res["code"] == VectorDBStatusCode.success:
             return []
@@ -264,15 +993,26 @@ class VectorDBOperator:
         if "duplicate_ids" in json_res.get("data", {}):
             msg = _error_log(json_res)
 
-            failed_ids = await VectorDBOperator._try_update_record(
-                type_=type_,
-                collection_name=collection_name,
-                records=[
-                    item
-                    for item in records
-                    if item.doc_id not in json_res["data"]["duplicate_ids"]
-                ],
-            )
+            duplicate_ids = set(json_res["data"]["duplicate_ids"])
+            duplicates = records.select(duplicate_ids)
+            remaining = records.exclude(duplicate_ids)
+            failed_ids = []
+            if duplicates:
+                failed_ids += await VectorDBOperator._try_update_record(
+                    type_=type_,
+                    collection_name=collection_name,
+                    records=duplicates,
+                )
+            if not duplicates or retries <= 0:
+                # 批次没有缩小或次数用完, 不再重试, 避免同一批次无限重发
+                failed_ids += remaining.doc_ids
+            elif remaining:
+                failed_ids += await VectorDBOperator._try_add_records(
+                    collection_name=collection_name,
+                    type_=type_,
+                    records=remaining,
+                    retries=retries - 1,
+                )
 
         # 去除失败 id 然后重试
         elif "failed_ids" in json_res.get("data", {}):
@@ -302,11 +1042,50 @@ class VectorDBOperator:
             list[dict]: 响应的 data 字段
 
         """
+        cache_key = None
+        if _query_cache is not None:
+            cache_key = await _query_cache.make_key(
+                collection_name, query_param
+            )
+        if cache_key is not None:
+            cached_data = await _query_cache.get(cache_key)
+            if cached_data is not None:
+                return cached_data
+
+        if not config.VDB_QUERY_COALESCE:
+            return await VectorDBOperator._query_record(
+                collection_name, query_param, cache_key
+            )
+
+        # 相同的查询并发时共享同一个请求. key 中带上写入次数和缓存 key
+        # (含 collection 的版本号), 写入之后发起的查询不会拿到写入前的结果
+        data, shared = await _query_single_flight.do(
+            (
+                collection_name,
+                _write_generations.get(collection_name, 0),
+                cache_key or canonical_query_key(query_param),
+            ),
+            lambda: VectorDBOperator._query_record(
+                collection_name, query_param, cache_key
+            ),
+        )
+        return copy.deepcopy(data) if shared else data
+
+    @staticmethod
+    async def _query_record(
+        collection_name: str,
+        query_param: QueryParam,
+        cache_key: str | None,
+        priority: TaskPriority = TaskPriority.high,
+    ) -> list[dict]:
         json_data = await _RequestLimiter.request_vector_db(
             method="post",
             endpoint="/documents/search",
             headers={"collection-name": collection_name},
+            priority=priority,
             json_body=query_param.model_dump(exclude_none=True),
+            hedge=config.VDB_HEDGE_ENABLED,
+            idempotent=True,
         )
 
         if json_data.get("code") != VectorDBStatusCode.success:
@@ -317,14 +1096,155 @@ class VectorDBOperator:
                 f"json_data: {json_data}\n"
             )
 
+        if cache_key is not None and _query_cache is not None:
+            await _query_cache.set(cache_key, json_data["data"])
         return json_data["data"]
 
+    @staticmethod
+    async def query_many(
+        collection_name: str,
+        query_params: list[QueryParam],
+        concurrency: int = 8,
+        merge: bool = False,
+        rrf_k: int = 60,
+    ) -> list[list[dict] | Exception] | list[dict]:
+        """
+        批量查询, 最多同时执行 `concurrency` 个查询
+
+        Args:
+            collection_name (str):
+            query_params (list[QueryParam]): 查询列表
+            concurrency (int, optional): 最大并发查询数. Defaults to 8.
+            merge (bool, optional): 是否合并结果. Defaults to False.
+            rrf_k (int, optional): 合并时 RRF 的常数 k. Defaults to 60.
+
+        Returns:
+            list[list[dict] | Exception] | list[dict]:
+                `merge=False` 时, 与 `query_params` 一一对应,
+                失败的查询对应位置为异常;
+                `merge=True` 时, 返回按 doc_id 去重, RRF 合并排序后的结果,
+                失败的查询会被忽略, 全部失败时抛出第一个异常
+
+        Raises:
+            ValueError: `concurrency` 小于 1
+
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must >= 1 ({concurrency})")
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def query(query_param: QueryParam) -> list[dict]:
+            async with semaphore:
+                return await VectorDBOperator.query_record(
+                    collection_name=collection_name,
+                    query_param=query_param,
+                )
+
+        task_group = TaskGroup([query(item) for item in query_params])
+        results: list = await task_group.get_noexcept()
+        if not merge:
+            return results
+
+        succeeded = [res for res in results if not isinstance(res, Exception)]
+        errors = [res for res in results if isinstance(res, Exception)]
+        for error in errors:
+            logger.warning(f"query_many failed: {type(error)}, {error}")
+        if errors and not succeeded:
+            raise errors[0]
+
+        return reciprocal_rank_fusion(succeeded, k=rrf_k)
+
+    @staticmethod
+    async def scroll_records(
+        collection_name: str,
+        filters: list[Filter] | None = None,
+        query: str = " ",
+        search_method: Literal[
+            "semantic_search",
+            "full_text_search",
+            "hybrid_search",
+        ] = "semantic_search",
+        page_size: int = _RECORD_LIMIT - 1,
+        prefetch: int = 1,
+    ) -> AsyncIterator[dict]:
+        """
+        按页遍历整个 collection (或 `filters` 筛选的部分), 逐条返回查询结果.
+        处理当前页时预取后面 `prefetch` 页, 内存中最多
+        `(prefetch + 1) * page_size` 条结果
+
+        接口只支持 offset 分页, 遍历期间的写入/删除可能导致漏掉或重复部分记录,
+        导出/一致性检查等需要准确结果时应避免并发写入, 或按 doc_id 去重.
+        不经过查询缓存, 以低优先级排队, 不影响在线查询
+
+        Args:
+            collection_name (str):
+            filters (list[Filter] | None, optional): 筛选条件. Defaults to None.
+            query (str, optional): 查询内容, 需要能匹配所有记录.
+                Defaults to " ".
+            search_method (str, optional): 检索方式.
+                Defaults to "semantic_search".
+            page_size (int, optional): 每页条数, 最大 99. Defaults to 99.
+            prefetch (int, optional): 预取页数, 0 为不预取. Defaults to 1.
+
+        Yields:
+            dict: 查询结果, 同 `query_record`
+
+        """
+        next_offset = 0
+        pending: deque[asyncio.Task[list[dict]]] = deque()
+
+        def fetch_next() -> None:
+            nonlocal next_offset
+            query_param = QueryParam(
+                query=query,
+                filters=filters or [],
+                retrieval_config={
+                    "search_method": search_method,
+                    "limit": page_size,
+                    "offset": next_offset,
+                },
+            )
+            pending.append(
+                asyncio.create_task(
+                    VectorDBOperator._query_record(
+                        collection_name,
+                        query_param,
+                        cache_key=None,
+                        priority=TaskPriority.low,
+                    )
+                )
+            )
+            next_offset += page_size
+
+        fetch_next()
+        try:
+            while pending:
+                page = await pending.popleft()
+                if len(page) < page_size:
+                    # 最后一页, 之后预取的页都是空的
+                    for hit in page:
+                        yield hit
+                    break
+                # 第一页满了才开始预取, 只有一页的 collection 不多发请求
+                while len(pending) < prefetch:
+                    fetch_next()
+                for hit in page:
+                    yield hit
+                if not pending:
+                    # 不预取时, 当前页处理完再请求下一页
+                    fetch_next()
+        finally:
+            for task in pending:
+                task.cancel()
+
     @staticmethod
     async def update_record(
         type_: Literal["text", "text_json", "text_html"],
-        records: list[RecordProperty],
+        records: list[RecordProperty] | RecordBatch,
         collection_name: str,
         retry_times: int = 2,
+        spool: bool = False,
     ) -> list[bool]:
         """
         编辑飞书同步记录
@@ -335,20 +1255,33 @@ class VectorDBOperator:
             record (RecordProperty | None): 要编辑的记录
             req_type (Literal["text", "text_json"]  | None):
                 表示 `record.text` 是 `普通字符串` 还是 `json字符串`
+            spool (bool, optional): 同 `add_records`. Defaults to False.
 
         """
         global _RECORD_LIMIT
 
-        if len(records) > _RECORD_LIMIT:
+        batch = (
+            records
+            if isinstance(records, RecordBatch)
+            else RecordBatch(records)
+        )
+        if spool and config.VDB_SPOOL_DIR:
+            await _spool_write(
+                encode_write_entry("update", collection_name, type_, batch)
+            )
+            return [True] * len(batch)
+
+        if len(batch) > _RECORD_LIMIT:
             idx = 0
             task_list: list[asyncio.Task[list[bool]]] = []
-            while idx < len(records):
+            while idx < len(batch):
                 task_list.append(
                     asyncio.create_task(
                         VectorDBOperator.update_record(
                             type_=type_,
-                            records=records[idx : idx + _RECORD_LIMIT],
+                            records=batch[idx : idx + _RECORD_LIMIT],
                             collection_name=collection_name,
+                            retry_times=retry_times,
                         )
                     )
                 )
@@ -358,42 +1291,79 @@ class VectorDBOperator:
                 result.extend(await task)
             return result
 
-        failed_ids = []
-        req_records = records.copy()
+        failed_ids: set[str] = set()
+        req_batch = batch
         for i in range(retry_times + 1):
             logger.debug(f"update to {collection_name}, times index {i}")
 
             _failed_ids = await VectorDBOperator._try_update_record(
                 type_=type_,
-                records=req_records,
+                records=req_batch,
                 collection_name=collection_name,
             )
-            if _failed_ids == []:
+            if not _failed_ids:
                 break
 
-            failed_ids.extend(_failed_ids)
+            failed_ids.update(_failed_ids)
 
             # 更新records, 去掉失败id, 在下一次循环重试
-            req_records = [
-                item for item in req_records if item.doc_id not in _failed_ids
-            ]
+            req_batch = req_batch.exclude(failed_ids)
+
+        if _fingerprint_store is not None:
+            await _fingerprint_store.commit(
+                collection_name,
+                {
+                    doc_id: fingerprint
+                    for doc_id, fingerprint in batch.fingerprints().items()
+                    if doc_id not in failed_ids
+                },
+            )
+        if _doc_id_index is not None:
+            await _doc_id_index.record(collection_name, req_batch.doc_ids)
 
-        return [item.doc_id not in failed_ids for item in records]
+        return [doc_id not in failed_ids for doc_id in batch.doc_ids]
+
+    @staticmethod
+    async def update_record_batched(
+        type_: Literal["text", "text_json", "text_html"],
+        records: list[RecordProperty],
+        collection_name: str,
+    ) -> list[bool]:
+        """
+        与其他调用者的记录合并后批量更新, 同 `add_records_batched`,
+        与添加的批次分开收集
+
+        Args:
+            type_ (Literal["text", "text_json", "text_html"]):
+                请求的 body 中的 `type` 字段
+            records (list[RecordProperty]): 要更新的向量数据库的记录
+            collection_name (str):
+
+        Returns:
+            list[bool]: 返回更新状态, 是否成功
+
+        """
+        return await _update_batch_writer.submit(
+            type_=type_,
+            records=records,
+            collection_name=collection_name,
+        )
 
     @staticmethod
     async def _try_update_record(
         type_: Literal["text", "text_json", "text_html"],
         collection_name: str,
-        records: list[RecordProperty],
+        records: RecordBatch,
     ) -> list[str]:
-        json_res = await _RequestLimiter.request_vector_db(
+        json_res = await VectorDBOperator._request_write(
+            collection_name,
             method="post",
             endpoint="/documents/update",
             headers={"collection-name": collection_name},
-            json_body={
-                "type": type_,
-                "data": [item.properties() for item in records],
-            },
+            priority=TaskPriority.low,
+            idempotent=True,
+            json_body=None,
+            content=records.update_body(type_),
         )
 
         if json_res.get("code") == VectorDBStatusCode.success:
@@ -417,6 +1387,7 @@ class VectorDBOperator:
     async def delete_record(
         collection_name: str,
         filters: list[Filter],
+        spool: bool = False,
     ):
         """
         删除记录
@@ -424,11 +1395,282 @@ class VectorDBOperator:
         Args:
             collection_name (str):
             filters (list[Filter]): 筛选条件
+            spool (bool, optional): 同 `add_records`, 与之前写入 spool 的操作
+                按顺序回放. Defaults to False.
 
         """
-        await _RequestLimiter.request_vector_db(
+        if spool and config.VDB_SPOOL_DIR:
+            await _spool_write(
+                encode_delete_entry(
+                    collection_name, [item.model_dump() for item in filters]
+                )
+            )
+            return
+
+        await VectorDBOperator._request_write(
+            collection_name,
             method="post",
             endpoint="/documents/delete",
             headers={"collection-name": collection_name},
+            idempotent=True,
             json_body={"filters": [item.model_dump() for item in filters]},
         )
+
+        doc_ids = _filter_doc_ids(filters)
+        if _fingerprint_store is not None:
+            await _fingerprint_store.forget(collection_name, doc_ids)
+        if _doc_id_index is not None:
+            await _doc_id_index.forget(collection_name, doc_ids)
+
+    @staticmethod
+    async def bulk_delete_records(
+        collection_name: str,
+        doc_ids: Iterable[str] | AsyncIterable[str],
+        filters: list[Filter] | None = None,
+        chunk_size: int = _RECORD_LIMIT - 1,
+        concurrency: int = 4,
+        spool: bool = False,
+    ) -> int:
+        """
+        按 doc_id 批量删除记录, 自动切分为每片 `chunk_size` 个 doc_id 的
+        `delete_record`, 最多同时执行 `concurrency` 个.
+        `doc_ids` 可以是 `scroll_records` 等异步迭代器, 边读边删
+
+        Args:
+            collection_name (str):
+            doc_ids (Iterable[str] | AsyncIterable[str]): 要删除的 doc_id
+            filters (list[Filter] | None, optional): 附加的筛选条件, 与 doc_id
+                条件同时满足才删除. Defaults to None.
+            chunk_size (int, optional): 每个请求的 doc_id 数, 最大 99.
+                Defaults to 99.
+            concurrency (int, optional): 最大并发请求数. Defaults to 4.
+            spool (bool, optional): 同 `delete_record`. Defaults to False.
+
+        Returns:
+            int: 删除请求成功的 doc_id 数
+
+        Raises:
+            ValueError: `concurrency` 小于 1
+            Exception: 所有分片执行完后, 有分片失败时抛出第一个异常
+
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must >= 1 ({concurrency})")
+
+        running: set[asyncio.Task[int]] = set()
+        errors: list[BaseException] = []
+        deleted = 0
+
+        async def delete(chunk: list[str]) -> int:
+            await VectorDBOperator.delete_record(
+                collection_name,
+                [
+                    *(filters or []),
+                    Filter(
+                        field_name="doc_id",
+                        value=chunk,
+                        operator="contains_any",
+                    ),
+                ],
+                spool=spool,
+            )
+            return len(chunk)
+
+        def collect(done: set[asyncio.Task[int]]) -> None:
+            nonlocal deleted
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    deleted += task.result()
+                else:
+                    logger.warning(
+                        f"bulk delete from {collection_name} failed: "
+                        f"{type(error)}, {error}"
+                    )
+                    errors.append(error)
+
+        try:
+            async for _, chunk in _aiter_chunks(doc_ids, chunk_size):
+                if len(running) >= concurrency:
+                    done, running = await asyncio.wait(
+                        running, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    collect(done)
+                running.add(asyncio.create_task(delete(chunk)))
+            if running:
+                done, running = await asyncio.wait(running)
+                collect(done)
+        finally:
+            for task in running:
+                task.cancel()
+
+        if errors:
+            raise errors[0]
+        return deleted
+
+    @staticmethod
+    async def rebuild_doc_id_index(
+        collection_name: str,
+        doc_ids: Iterable[str] | AsyncIterable[str],
+    ) -> int:
+        """
+        用 collection 中实际存在的 doc_id 重建 `VDB_DOC_ID_INDEX`,
+        如进程重启后的布隆过滤器, 或与向量数据库不一致时.
+        `doc_ids` 可以是异步迭代器, 如从 `scroll_records` 的结果中取 doc_id,
+        边遍历边写入索引
+
+        Usage
+        ```python
+            await VectorDBOperator.rebuild_doc_id_index(
+                "collection",
+                (
+                    hit["properties"]["doc_id"]
+                    async for hit in VectorDBOperator.scroll_records(
+                        "collection"
+                    )
+                ),
+            )
+        ```
+
+        Returns:
+            int: 写入索引的 doc_id 数, 未配置索引时为 0
+
+        """
+        if _doc_id_index is None:
+            return 0
+        return await _doc_id_index.rebuild(collection_name, doc_ids)
+
+
+_add_batch_writer = BatchWriter(
+    write=VectorDBOperator.add_records,
+    max_batch_size=_RECORD_LIMIT,
+    max_linger=config.VDB_BATCH_MAX_LINGER,
+)
+_update_batch_writer = BatchWriter(
+    write=VectorDBOperator.update_record,
+    max_batch_size=_RECORD_LIMIT,
+    max_linger=config.VDB_BATCH_MAX_LINGER,
+)
+
+
+_spool_drainer: SpoolDrainer | None = None
+# 接管的其他 worker 目录, 回放完后自动关闭
+_orphan_spool_drainers: list[SpoolDrainer] = []
+
+
+def _is_transient(e: Exception) -> bool:
+    """向量数据库暂时不可用, 恢复后可以成功, 回放 spool 时不计入失败次数"""
+    return _is_retryable(e) or isinstance(
+        e,
+        VectorDBCircuitOpenError
+        | TaskQueueFullError
+        | TaskDeadlineExceededError,
+    )
+
+
+async def _apply_spooled_op(op: dict) -> dict | None:
+    """
+    回放 spool 中的一个操作, 返回重试后仍失败的记录组成的操作,
+    由 `SpoolDrainer` 写入 dead letter
+    """
+    if op["op"] == "delete":
+        await VectorDBOperator.delete_record(
+            op["collection"], [Filter(**item) for item in op["filters"]]
+        )
+        return None
+
+    batch = RecordBatch([SpooledRecord(item) for item in op["records"]])
+    write = (
+        VectorDBOperator.add_records
+        if op["op"] == "add"
+        else VectorDBOperator.update_record
+    )
+    results = await write(op["type"], batch, op["collection"])
+    if all(results):
+        return None
+    return {
+        **op,
+        "records": [
+            item
+            for item, ok in zip(op["records"], results, strict=True)
+            if not ok
+        ],
+    }
+
+
+def _get_spool_drainer() -> SpoolDrainer:
+    """第一次使用时打开本进程的 spool 目录, 并启动后台回放"""
+    global _spool_drainer
+
+    if _spool_drainer is None:
+        assert config.VDB_SPOOL_DIR is not None
+        spool = WriteSpool.open_worker_dir(
+            config.VDB_SPOOL_DIR,
+            segment_size=config.VDB_SPOOL_SEGMENT_SIZE,
+            fsync=config.VDB_SPOOL_FSYNC,
+        )
+        logger.info(f"open vector db write spool: {spool.directory}")
+        _spool_drainer = SpoolDrainer(
+            spool,
+            apply=_apply_spooled_op,
+            max_entries=config.VDB_SPOOL_DRAIN_ENTRIES,
+            max_attempts=config.VDB_SPOOL_MAX_ATTEMPTS,
+            is_transient=_is_transient,
+        )
+        _spool_drainer.start()
+
+        for orphan in WriteSpool.open_orphan_dirs(
+            config.VDB_SPOOL_DIR,
+            segment_size=config.VDB_SPOOL_SEGMENT_SIZE,
+            fsync=config.VDB_SPOOL_FSYNC,
+        ):
+            logger.info(
+                f"drain orphan vector db write spool: {orphan.directory}"
+            )
+            drainer = SpoolDrainer(
+                orphan,
+                apply=_apply_spooled_op,
+                max_entries=config.VDB_SPOOL_DRAIN_ENTRIES,
+                max_attempts=config.VDB_SPOOL_MAX_ATTEMPTS,
+                is_transient=_is_transient,
+                stop_when_empty=True,
+            )
+            drainer.start()
+            _orphan_spool_drainers.append(drainer)
+    return _spool_drainer
+
+
+async def _spool_write(payload: bytes) -> None:
+    drainer = _get_spool_drainer()
+    await drainer.spool.append_async(payload)
+    drainer.notify()
+
+
+async def init_vector_db() -> None:
+    """
+    在 app 启动时调用, 创建 http 客户端并预热连接;
+    配置了 `VDB_SPOOL_DIR` 时, 开始回放上次退出时未回放完的 spool
+    """
+    await vector_db_http_client.startup()
+    if config.VDB_SPOOL_DIR:
+        _get_spool_drainer()
+
+
+async def close_vector_db() -> None:
+    """
+    在 app 退出时调用, 写入尚未发送的批次, 停止 spool 回放 (未回放的留到下次启动),
+    关闭 http 客户端
+    """
+    global _spool_drainer
+
+    await _add_batch_writer.flush()
+    await _update_batch_writer.flush()
+    if _spool_drainer is not None:
+        await _spool_drainer.stop(timeout=config.VDB_TIMEOUT_SECONDS)
+        _spool_drainer.spool.close()
+        _spool_drainer = None
+    for drainer in _orphan_spool_drainers:
+        await drainer.stop(timeout=config.VDB_TIMEOUT_SECONDS)
+        drainer.spool.close()
+    _orphan_spool_drainers.clear()
+    await vector_db_http_client.aclose()
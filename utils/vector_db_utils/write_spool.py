@@ -0,0 +1,628 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from .record_batch import RecordBatch
+from .schemas import RecordPropertyABC
+
+logger = logging.getLogger(__name__)
+
+# 每条记录: payload 长度 (uint32), payload 的 crc32 (uint32), payload
+_HEADER_FORMAT = "<II"
+_HEADER_SIZE = struct.calcsize(_HEADER_FORMAT)
+_SEGMENT_SUFFIX = ".log"
+_OFFSET_FILE = "offset"
+_LOCK_FILE = "lock"
+# 多次回放仍失败的记录, 格式与 segment 相同
+_DEAD_LETTER_FILE = "dead_letter"
+_WORKER_DIR_PREFIX = "worker-"
+
+# (segment 序号, segment 内的字节位置)
+SpoolOffset = tuple[int, int]
+
+
+def _segment_name(segment_id: int) -> str:
+    return f"{segment_id:012d}{_SEGMENT_SUFFIX}"
+
+
+def _fsync_dir(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SpooledRecord(RecordPropertyABC):
+    def __init__(self, properties: dict) -> None:
+        """从 spool 中读出的记录, 原样返回写入时的 `properties()`"""
+        super().__init__(properties["doc_id"], properties.get("text", ""))
+        self._properties = properties
+
+    def properties(self) -> dict:
+        return self._properties
+
+
+def encode_write_entry(
+    op: str,
+    collection_name: str,
+    type_: str,
+    records: RecordBatch,
+) -> bytes:
+    """add/update 操作, 直接拼接 `RecordBatch` 中已编码的记录"""
+    return (
+        b'{"op":'
+        + json.dumps(op).encode()
+        + b',"collection":'
+        + json.dumps(collection_name, ensure_ascii=False).encode()
+        + b',"type":'
+        + json.dumps(type_).encode()
+        + b',"records":['
+        + b",".join(records.encoded)
+        + b"]}"
+    )
+
+
+def encode_delete_entry(collection_name: str, filters: list[dict]) -> bytes:
+    return json.dumps(
+        {"op": "delete", "collection": collection_name, "filters": filters},
+        ensure_ascii=False,
+    ).encode()
+
+
+class WriteSpool:
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 64 * 1024 * 1024,
+        fsync: bool = True,
+    ) -> None:
+        """
+        向量数据库写操作的追加写日志, 按 segment 文件切分
+
+        - 每条记录带长度和 crc32, 崩溃时写了一半的记录在下次打开时截掉
+        - 已回放的位置保存在 `offset` 文件, 通过 写临时文件 + rename 原子更新;
+          回放后, 保存 offset 前崩溃的记录会被再次回放 (至少一次)
+        - offset 之前的 segment 文件会被删除
+        - 目录通过 `flock` 独占, 同一目录只能被一个进程使用
+        - 多次回放仍失败的记录移到 `dead_letter` 文件, 不再回放
+
+        Args:
+            directory (str): spool 目录, 不存在时自动创建
+            segment_size (int, optional): 单个 segment 文件的大小上限 (字节).
+                Defaults to 64MB.
+            fsync (bool, optional): 每次追加后是否 fsync. Defaults to True.
+
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+
+        self._write_lock = threading.Lock()
+        self._lock_file = None
+        self._writer = None
+        self._write_segment = 0
+        self._write_pos = 0
+        self._offset: SpoolOffset = (0, 0)
+
+        self.appended = 0
+        self.appended_bytes = 0
+
+    @classmethod
+    def open_worker_dir(cls, base_dir: str, **kw: Any) -> WriteSpool:
+        """
+        在 `base_dir` 下依次尝试 `worker-0`, `worker-1`, ... 目录,
+        使用第一个未被其他进程占用的目录. 重启后会接管之前未回放完的目录
+        """
+        os.makedirs(base_dir, exist_ok=True)
+        idx = 0
+        while True:
+            spool = cls(
+                os.path.join(base_dir, f"{_WORKER_DIR_PREFIX}{idx}"), **kw
+            )
+            if spool.open(blocking=False):
+                return spool
+            idx += 1
+
+    @classmethod
+    def open_orphan_dirs(cls, base_dir: str, **kw: Any) -> list[WriteSpool]:
+        """
+        打开 `base_dir` 下未被其他进程占用且还有未回放记录的 `worker-N` 目录.
+        进程数减少后, 多出来的目录不会再被 `open_worker_dir` 使用,
+        由其他进程接管回放
+        """
+        spools = []
+        for name in sorted(os.listdir(base_dir)):
+            directory = os.path.join(base_dir, name)
+            if not (
+                name.startswith(_WORKER_DIR_PREFIX) and os.path.isdir(directory)
+            ):
+                continue
+            spool = cls(directory, **kw)
+            if not spool.open(blocking=False):
+                continue
+            if spool.pending_bytes():
+                spools.append(spool)
+            else:
+                spool.close()
+        return spools
+
+    def open(self, blocking: bool = True) -> bool:
+        """
+        加锁并打开 spool, 截掉末尾不完整的记录
+
+        Returns:
+            bool: `blocking=False` 且目录已被其他进程占用时返回 False
+
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, _LOCK_FILE), "wb")
+        try:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+
+        self._offset = self._load_offset()
+        segments = self._segments()
+        if segments:
+            self._write_segment = segments[-1]
+            self._write_pos = self._valid_length(segments[-1])
+        else:
+            self._write_segment = max(1, self._offset[0])
+            self._write_pos = 0
+        self._open_writer()
+        return True
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, _segment_name(segment_id))
+
+    def _segments(self) -> list[int]:
+        return sorted(
+            int(name[: -len(_SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(_SEGMENT_SUFFIX)
+        )
+
+    def _load_offset(self) -> SpoolOffset:
+        try:
+            with open(os.path.join(self.directory, _OFFSET_FILE)) as f:
+                segment_id, pos = f.read().split()
+            return int(segment_id), int(pos)
+        except FileNotFoundError:
+            return (0, 0)
+
+    def _valid_length(self, segment_id: int) -> int:
+        """segment 中完整记录的总长度, 并截掉末尾不完整的记录"""
+        path = self._path(segment_id)
+        pos = 0
+        with open(path, "rb") as f:
+            while self._read_entry(f) is not None:
+                pos = f.tell()
+        if pos != os.path.getsize(path):
+            logger.warning(
+                f"truncate torn write of spool {path}: "
+                f"{os.path.getsize(path)} -> {pos}"
+            )
+            os.truncate(path, pos)
+        return pos
+
+    def _open_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = open(self._path(self._write_segment), "ab")
+        if self.fsync:
+            _fsync_dir(self.directory)
+
+    @staticmethod
+    def _read_entry(f) -> bytes | None:
+        header = f.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE:
+            return None
+        length, crc = struct.unpack(_HEADER_FORMAT, header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return None
+        return payload
+
+    def append(self, payload: bytes) -> None:
+        """追加一条记录, 返回时已写入 (`fsync=True` 时已落盘)"""
+        if self._writer is None:
+            raise RuntimeError("spool is not opened")
+
+        data = struct.pack(_HEADER_FORMAT, len(payload), zlib.crc32(payload))
+        with self._write_lock:
+            if 0 < self._write_pos and (
+                self._write_pos + len(data) + len(payload) > self.segment_size
+            ):
+                self._write_segment += 1
+                self._write_pos = 0
+                self._open_writer()
+
+            self._writer.write(data + payload)
+            self._writer.flush()
+            if self.fsync:
+                os.fsync(self._writer.fileno())
+            self._write_pos += len(data) + len(payload)
+            self.appended += 1
+            self.appended_bytes += len(data) + len(payload)
+
+    async def append_async(self, payload: bytes) -> None:
+        await asyncio.to_thread(self.append, payload)
+
+    def dead_letter(self, payload: bytes) -> None:
+        """把一条回放失败的记录追加到 `dead_letter` 文件"""
+        path = os.path.join(self.directory, _DEAD_LETTER_FILE)
+        data = struct.pack(_HEADER_FORMAT, len(payload), zlib.crc32(payload))
+        with open(path, "ab") as f:
+            f.write(data + payload)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def read_dead_letters(self) -> list[bytes]:
+        path = os.path.join(self.directory, _DEAD_LETTER_FILE)
+        entries = []
+        try:
+            with open(path, "rb") as f:
+                while (payload := self._read_entry(f)) is not None:
+                    entries.append(payload)
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def read(
+        self,
+        offset: SpoolOffset | None = None,
+        max_entries: int = 1000,
+    ) -> tuple[list[bytes], SpoolOffset]:
+        """
+        从 `offset` (默认为已提交的位置) 开始读取最多 `max_entries` 条记录
+
+        Returns:
+            tuple[list[bytes], SpoolOffset]: 记录, 以及最后一条记录之后的位置
+        """
+        segment_id, pos = offset if offset is not None else self._offset
+        with self._write_lock:
+            write_end = (self._write_segment, self._write_pos)
+
+        entries: list[bytes] = []
+        for seg in self._segments():
+            if seg < segment_id:
+                continue
+            if seg > segment_id:
+                segment_id, pos = seg, 0
+
+            end = write_end[1] if seg == write_end[0] else None
+            with open(self._path(seg), "rb") as f:
+                f.seek(pos)
+                while len(entries) < max_entries:
+                    if end is not None and f.tell() >= end:
+                        break
+                    payload = self._read_entry(f)
+                    if payload is None:
+                        break
+                    entries.append(payload)
+                    pos = f.tell()
+            if len(entries) >= max_entries or seg >= write_end[0]:
+                break
+        return entries, (segment_id, pos)
+
+    def commit(self, offset: SpoolOffset) -> None:
+        """保存已回放的位置, 删除此前的 segment 文件"""
+        path = os.path.join(self.directory, _OFFSET_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{offset[0]} {offset[1]}")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        if self.fsync:
+            _fsync_dir(self.directory)
+        self._offset = offset
+
+        for seg in self._segments():
+            if seg < offset[0]:
+                os.remove(self._path(seg))
+
+    @property
+    def offset(self) -> SpoolOffset:
+        return self._offset
+
+    def pending_bytes(self) -> int:
+        """尚未回放的字节数"""
+        total = 0
+        with self._write_lock:
+            write_end = (self._write_segment, self._write_pos)
+        for seg in self._segments():
+            if seg < self._offset[0]:
+                continue
+            size = write_end[1] if seg == write_end[0] else None
+            if size is None:
+                size = os.path.getsize(self._path(seg))
+            total += size - (self._offset[1] if seg == self._offset[0] else 0)
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "segments": len(self._segments()),
+            "pending_bytes": self.pending_bytes(),
+            "appended": self.appended,
+            "appended_bytes": self.appended_bytes,
+            "offset": list(self._offset),
+        }
+
+
+def compact_entries(entries: list[dict]) -> list[dict]:
+    """
+    合并一段连续的操作, 同一 collection 中同一 doc_id 只保留最后一次写入.
+    delete 操作作为分界, 不与前后的写入合并.
+    add 之后的 update 合并为 add (`add_records` 会处理已存在的记录)
+
+    Returns:
+        list[dict]: 合并后的操作, 同一 (op, collection, type) 的记录合并为一个
+    """
+    ops: list[dict] = []
+    # (collection, doc_id) -> (op, type, properties), 按最后写入的顺序
+    pending: dict[tuple[str, str], tuple[str, str, dict]] = {}
+
+    def flush():
+        groups: dict[tuple[str, str, str], list[dict]] = {}
+        for (collection, _), (op, type_, properties) in pending.items():
+            groups.setdefault((op, collection, type_), []).append(properties)
+        for (op, collection, type_), records in groups.items():
+            ops.append(
+                {
+                    "op": op,
+                    "collection": collection,
+                    "type": type_,
+                    "records": records,
+                }
+            )
+        pending.clear()
+
+    for entry in entries:
+        if entry["op"] == "delete":
+            flush()
+            ops.append(entry)
+            continue
+
+        for properties in entry["records"]:
+            key = (entry["collection"], properties["doc_id"])
+            old = pending.pop(key, None)
+            op = entry["op"]
+            if old is not None and old[0] == "add":
+                op = "add"
+            pending[key] = (op, entry["type"], properties)
+    flush()
+    return ops
+
+
+class SpoolDrainer:
+    def __init__(
+        self,
+        spool: WriteSpool,
+        apply: Callable[[dict], Awaitable[dict | None]],
+        max_entries: int = 1000,
+        idle_interval: float = 0.5,
+        max_backoff: float = 30,
+        max_attempts: int = 5,
+        is_transient: Callable[[Exception], bool] | None = None,
+        stop_when_empty: bool = False,
+    ) -> None:
+        """
+        后台回放 spool, 每次读取最多 `max_entries` 条记录, 合并后依次调用 `apply`.
+        全部成功后才提交 offset; `apply` 抛出异常时退避重试同一段记录.
+
+        同一段记录连续失败 `max_attempts` 次后, 改为逐条回放这段记录,
+        单条记录再失败 `max_attempts` 次后移到 dead letter 文件并跳过,
+        避免一直失败的操作 (如 4xx) 阻塞后面的记录.
+        `is_transient` 判断为暂时性的错误 (如向量数据库不可用) 不计入次数.
+        `apply` 返回的部分失败的记录同样写入 dead letter
+
+        Args:
+            spool (WriteSpool):
+            apply (Callable[[dict], Awaitable[dict | None]]): 执行一个合并后的
+                操作, 返回重试后仍失败的记录组成的操作 (格式同 spool 中的记录),
+                全部成功时返回 None
+            max_entries (int, optional): 每次读取的记录数. Defaults to 1000.
+            idle_interval (float, optional): 没有新记录时的轮询间隔.
+                Defaults to 0.5.
+            max_backoff (float, optional): 失败重试的最大间隔. Defaults to 30.
+            max_attempts (int, optional): 移到 dead letter 前的失败次数.
+                Defaults to 5.
+            is_transient (Callable[[Exception], bool] | None, optional):
+                判断错误是否为暂时性的, None 时所有错误都计入次数.
+                Defaults to None.
+            stop_when_empty (bool, optional): 回放完后停止并关闭 spool,
+                用于接管其他进程留下的目录. Defaults to False.
+
+        """
+        self.spool = spool
+        self._apply = apply
+        self.max_entries = max_entries
+        self.idle_interval = idle_interval
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self._is_transient = is_transient
+        self.stop_when_empty = stop_when_empty
+
+        # 失败的那段记录的起止位置和连续失败次数
+        self._failing_offset: SpoolOffset | None = None
+        self._isolate_until: SpoolOffset | None = None
+        self._attempts = 0
+
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+        self.drained_entries = 0
+        self.drained_records = 0
+        self.superseded_records = 0
+        self.dropped_records = 0
+        self.dead_letters = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    def notify(self) -> None:
+        """有新记录写入, 立即开始回放"""
+        self._wakeup.set()
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """等待当前这段记录回放结束后停止, 未回放的记录留在 spool 中"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("stop spool drainer timeout, cancel it")
+        finally:
+            self._task = None
+
+    async def drain_once(self) -> int:
+        """
+        回放一段记录
+
+        Returns:
+            int: 回放的记录条数, 0 代表 spool 已空
+        """
+        start = self.spool.offset
+        if start != self._failing_offset:
+            self._failing_offset, self._attempts = start, 0
+        # 逐条回放之前连续失败的那段记录, 找出一直失败的记录
+        isolate = (
+            self._isolate_until is not None and start < self._isolate_until
+        )
+        payloads, offset = await asyncio.to_thread(
+            self.spool.read, None, 1 if isolate else self.max_entries
+        )
+        if not payloads:
+            return 0
+
+        failed_ops: list[dict] = []
+        try:
+            entries = [json.loads(payload) for payload in payloads]
+            ops = compact_entries(entries)
+            for op in ops:
+                failed_op = await self._apply(op)
+                if failed_op:
+                    failed_ops.append(failed_op)
+        except Exception as e:
+            if self._is_transient is not None and self._is_transient(e):
+                raise
+            self._attempts += 1
+            if self._attempts < self.max_attempts:
+                raise
+            if not isolate:
+                self._isolate_until = offset
+                self._attempts = 0
+                raise
+
+            await asyncio.to_thread(self.spool.dead_letter, payloads[0])
+            self.dead_letters += 1
+            logger.error(
+                f"move spool entry to dead letter after {self._attempts} "
+                f"attempts: {type(e)}, {e}, entry: {payloads[0][:256]!r}"
+            )
+            entries, ops = [], []
+
+        # 先写入 dead letter 再提交 offset, 崩溃时最多重复写入
+        for failed_op in failed_ops:
+            await asyncio.to_thread(
+                self.spool.dead_letter,
+                json.dumps(failed_op, ensure_ascii=False).encode(),
+            )
+            self.dead_letters += 1
+            self.dropped_records += len(failed_op.get("records", ()))
+            logger.error(
+                f"move {len(failed_op.get('records', ()))} failed "
+                f"{failed_op['op']} records of {failed_op['collection']} "
+                "to dead letter"
+            )
+        await asyncio.to_thread(self.spool.commit, offset)
+
+        records = sum(len(e.get("records", ())) for e in entries)
+        self.drained_entries += len(entries)
+        self.drained_records += records
+        self.superseded_records += records - sum(
+            len(op.get("records", ())) for op in ops
+        )
+        return len(payloads)
+
+    async def _run(self) -> None:
+        try:
+            await self._drain_loop()
+        finally:
+            if self.stop_when_empty:
+                self.spool.close()
+
+    async def _drain_loop(self) -> None:
+        backoff = 0.0
+        while not self._stopping:
+            try:
+                drained = await self.drain_once()
+                backoff = 0.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                backoff = min(self.max_backoff, max(1.0, backoff * 2))
+                logger.warning(
+                    f"drain spool failed: {type(e)}, {e}, "
+                    f"retry after {backoff} seconds"
+                )
+                drained = 0
+
+            if drained and not backoff:
+                continue
+            if self.stop_when_empty and not backoff:
+                logger.info(f"spool {self.spool.directory} is drained")
+                return
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(),
+                    timeout=backoff or self.idle_interval,
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            **self.spool.stats(),
+            "drained_entries": self.drained_entries,
+            "drained_records": self.drained_records,
+            "superseded_records": self.superseded_records,
+            "dropped_records": self.dropped_records,
+            "dead_letters": self.dead_letters,
+            "errors": self.errors,
+        }